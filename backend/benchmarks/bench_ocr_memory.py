@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Peak memory benchmark for PDF page rendering before OCR
+
+Generates a synthetic N-page PDF (500 by default) and measures the peak
+RSS of:
+- eager: convert_from_bytes(file_content, dpi=200), all pages at once
+  (previous behavior of the upload path)
+- streaming: rag.ocr_processor.iter_pdf_page_images, a bounded window of
+  pages at a time
+
+Each mode runs in its own process so the peaks don't mix. Pass --ocr to
+also run OCRProcessor on every streamed page (slow, needs EasyOCR models).
+
+Requires poppler (pdftoppm/pdfinfo) as for the backend itself.
+
+Usage:
+  python benchmarks/bench_ocr_memory.py
+  python benchmarks/bench_ocr_memory.py --pages 500 --dpi 200 --window 4
+"""
+import argparse
+import multiprocessing
+import resource
+import sys
+import time
+from pathlib import Path
+
+# Allow importing the rag package from backend/
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+
+def make_synthetic_pdf(n_pages: int) -> bytes:
+    """Build an N-page text PDF (maintenance-manual-like lines) without extra dependencies"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages tree, filled once the page ids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+
+    for page in range(1, n_pages + 1):
+        lines = [
+            f"Manuel de maintenance - page {page}",
+            f"Pompe P-{page % 40:02d} : verifier la pression et le filtre d'aspiration.",
+            "Arret machine obligatoire avant toute intervention sur le moteur.",
+            f"Intervalle de graissage : {250 + page % 7 * 50} heures de fonctionnement.",
+        ]
+        text_ops = "".join(f"({line}) Tj 0 -28 Td " for line in lines)
+        stream = f"BT /F1 16 Tf 60 760 Td {text_ops}ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+
+    kids = b" ".join(b"%d 0 R" % pid for pid in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, n_pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for obj_id, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (obj_id, body)
+
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, xref_offset
+    )
+    return bytes(out)
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of the current process (MB, Linux kB units)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_eager(pdf_bytes: bytes, args, queue):
+    import numpy as np
+    from pdf2image import convert_from_bytes
+
+    start = time.perf_counter()
+    images = convert_from_bytes(pdf_bytes, dpi=args.dpi)
+    pages = 0
+    for image in images:
+        np.array(image)
+        pages += 1
+    queue.put((pages, time.perf_counter() - start, peak_rss_mb()))
+
+
+def run_streaming(pdf_bytes: bytes, args, queue):
+    from rag.ocr_processor import iter_pdf_page_images
+
+    ocr = None
+    if args.ocr:
+        from rag.ocr_processor import OCRProcessor
+        ocr = OCRProcessor(languages=['fr', 'en'], gpu=False)
+
+    start = time.perf_counter()
+    pages = 0
+    for page_number, image in iter_pdf_page_images(pdf_bytes, dpi=args.dpi, window=args.window):
+        if ocr is not None:
+            ocr.extract_text_from_pdf_page(image, preprocess=True)
+        pages += 1
+    queue.put((pages, time.perf_counter() - start, peak_rss_mb()))
+
+
+def measure(label: str, target, pdf_bytes: bytes, args):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=target, args=(pdf_bytes, args, queue))
+    process.start()
+    pages, elapsed, peak = queue.get()
+    process.join()
+    print(f"{label:<10} pages={pages:<5} time={elapsed:7.1f}s   peak RSS={peak:8.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR rendering memory benchmark")
+    parser.add_argument("--pages", type=int, default=500, help="Pages in the synthetic PDF")
+    parser.add_argument("--dpi", type=int, default=200, help="Rendering resolution")
+    parser.add_argument("--window", type=int, default=4, help="Pages per render window (streaming)")
+    parser.add_argument("--ocr", action="store_true", help="Also OCR each streamed page")
+    parser.add_argument("--skip-eager", action="store_true",
+                        help="Skip the eager mode (it may be OOM-killed on small hosts)")
+    args = parser.parse_args()
+
+    pdf_bytes = make_synthetic_pdf(args.pages)
+    print(f"Synthetic PDF: {args.pages} pages, {len(pdf_bytes) / 1024:.0f} KB, dpi={args.dpi}\n")
+
+    if not args.skip_eager:
+        measure("eager", run_eager, pdf_bytes, args)
+    measure("streaming", run_streaming, pdf_bytes, args)
+
+
+if __name__ == "__main__":
+    main()
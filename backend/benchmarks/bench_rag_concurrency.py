@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for /api/v1/rag/query
+
+Measures requests per second (RPS) of the RAG query endpoint under
+concurrent load, before (blocking stages run inline on the event loop)
+and after (embedding/rerank offloaded to a bounded thread pool, LLM call
+awaited on the async client).
+
+Two modes:
+- app (default): imports the real FastAPI app (main.py) in-process and
+  sends requests through httpx's ASGI transport, so routing, auth, the
+  query cache, hybrid search, reranking and citations all run as in
+  production. Only the external pieces are replaced:
+    * embedding model and cross-encoder: stand-ins doing a fixed amount of
+      CPU work per text/pair (NumPy matmuls, which release the GIL like
+      torch; --burn python for GIL-bound work), calibrated to
+      --embed-ms / --rerank-ms on an idle core
+    * Mistral: a fake client waiting --llm-ms (network wait)
+    * Supabase client and EasyOCR: not created
+  The index is seeded with synthetic chunks in a temporary directory.
+  "before" runs the same app with run_blocking() bypassed (stages called
+  inline in the handler) and a blocking LLM call, as the endpoint did before
+  the thread pool; "after" is the app unchanged.
+- live: fires real requests at a running backend (after state only).
+
+Every request uses a distinct query so the result caches don't hide the work.
+
+Usage:
+  python benchmarks/bench_rag_concurrency.py --requests 200 --concurrency 50
+  python benchmarks/bench_rag_concurrency.py --burn python --batch-window-ms 3
+  python benchmarks/bench_rag_concurrency.py --url http://127.0.0.1:8000 --token <jwt>
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import types
+import zlib
+from pathlib import Path
+
+# One BLAS thread per call, like a torch worker thread (set before importing NumPy)
+for _var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(_var, "1")
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+JWT_SECRET = "bench-secret"
+USER_ID = "bench-user"
+EMBEDDING_DIM = 384
+
+VOCABULARY = (
+    "pompe moteur roulement vanne filtre joint courroie compresseur capteur pression "
+    "température vibration fuite huile graissage alignement arbre palier accouplement "
+    "remplacement inspection démontage serrage couple préventive corrective défaillance "
+    "usure surchauffe bruit débit étanchéité réducteur ventilateur disjoncteur câble"
+).split()
+
+
+class CpuBurner:
+    """Fixed amount of CPU work per unit (text or pair), calibrated on an idle core"""
+
+    def __init__(self, unit_ms: float, mode: str):
+        self.mode = mode
+        self.enabled = True
+        self._a = np.random.default_rng(0).standard_normal((128, 128)).astype(np.float32)
+        steps = 200
+        start = time.perf_counter()
+        for _ in range(steps):
+            self._step()
+        per_step = (time.perf_counter() - start) / steps
+        self.steps_per_unit = max(1, int(unit_ms / 1000 / per_step))
+
+    def _step(self):
+        if self.mode == "numpy":
+            self._a @ self._a
+        else:
+            sum(i * i for i in range(2000))
+
+    def burn(self, units: int):
+        if self.enabled:
+            for _ in range(self.steps_per_unit * units):
+                self._step()
+
+
+def word_vector(word: str) -> np.ndarray:
+    return np.random.default_rng(zlib.crc32(word.encode("utf-8"))).standard_normal(EMBEDDING_DIM)
+
+
+def make_stand_ins(args):
+    """Embedding function and CrossEncoder classes burning CPU like the real models"""
+    try:
+        from chromadb.api.types import EmbeddingFunction
+    except ImportError:
+        EmbeddingFunction = object
+
+    embed_burner = CpuBurner(args.embed_ms, args.burn)
+    rerank_burner = CpuBurner(args.rerank_ms, args.burn)
+
+    class BurnEmbeddingFunction(EmbeddingFunction):
+        """Bag-of-words hash embeddings (similar texts stay close)"""
+
+        def __init__(self, model_name: str = "", **kwargs):
+            self.model_name = model_name
+
+        def __call__(self, input):
+            embed_burner.burn(len(input))
+            embeddings = []
+            for text in input:
+                vector = sum((word_vector(w) for w in text.lower().split()), np.zeros(EMBEDDING_DIM))
+                embeddings.append((vector / (np.linalg.norm(vector) or 1.0)).tolist())
+            return embeddings
+
+    class BurnCrossEncoder:
+        """Word overlap scores"""
+
+        def __init__(self, model_name: str = "", **kwargs):
+            self.model_name = model_name
+
+        def predict(self, pairs, batch_size: int = 32, show_progress_bar: bool = False):
+            rerank_burner.burn(len(pairs))
+            return [len(set(q.lower().split()) & set(d.lower().split())) / 10 for q, d in pairs]
+
+    return BurnEmbeddingFunction, BurnCrossEncoder, embed_burner
+
+
+class FakeMistral:
+    """chat.complete_async returning a fixed answer after --llm-ms"""
+
+    def __init__(self, latency: float, blocking: bool):
+        self.latency = latency
+        self.blocking = blocking
+        self.chat = self
+
+    async def complete_async(self, **kwargs):
+        if self.blocking:
+            # Synchronous client: the socket wait blocks the event loop
+            time.sleep(self.latency)
+        else:
+            await asyncio.sleep(self.latency)
+        message = types.SimpleNamespace(content="Selon la documentation [1], vérifier le serrage [2].")
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+
+def load_app(args, workdir: str):
+    """Import main.py with stand-in models, fake credentials and its data in workdir"""
+    os.environ.update({
+        "SUPABASE_JWT_SECRET": JWT_SECRET,
+        "SUPABASE_URL": "http://localhost",
+        "SUPABASE_SERVICE_KEY": "bench",
+        "MISTRAL_API_KEY": "bench",
+        "RAG_WARMUP": "false",
+        "OCR_WORKERS": "1",
+        "RAG_CACHE_ANSWERS": "false",
+        "RAG_BATCH_WINDOW_MS": str(args.batch_window_ms),
+        "RAG_EXECUTOR_WORKERS": str(args.workers),
+        "RAG_VECTOR_BACKEND": args.vector_backend,
+    })
+
+    embedding_cls, cross_encoder_cls, embed_burner = make_stand_ins(args)
+
+    import supabase
+    from chromadb.utils import embedding_functions
+    import rag.reranker
+    import rag.ocr_processor
+
+    supabase.create_client = lambda url, key: None
+    embedding_functions.SentenceTransformerEmbeddingFunction = embedding_cls
+    rag.reranker.CrossEncoder = cross_encoder_cls
+    rag.ocr_processor.easyocr = types.SimpleNamespace(Reader=lambda *a, **k: None)
+
+    # main.py writes its databases relative to the working directory
+    os.chdir(workdir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import main
+
+    # Seed the user's index (embedding cost not counted)
+    rng = random.Random(0)
+    chunks = [" ".join(rng.choices(VOCABULARY, k=80)) for _ in range(args.chunks)]
+    metadatas = [
+        {"document_name": f"manuel_{i // 40}.pdf", "page_number": i % 40 + 1, "chunk_index": i}
+        for i in range(args.chunks)
+    ]
+    embed_burner.enabled = False
+    main.chroma_manager.add_documents(
+        USER_ID, chunks, metadatas, ids=[f"bench-{i}" for i in range(args.chunks)]
+    )
+    embed_burner.enabled = True
+    return main
+
+
+def auth_headers() -> dict:
+    from jose import jwt
+
+    token = jwt.encode({"sub": USER_ID, "aud": "authenticated"}, JWT_SECRET, algorithm="HS256")
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def run_load(make_request, n_requests: int, concurrency: int):
+    """Run n_requests with at most `concurrency` in flight; return (elapsed, latencies)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        # Latency includes queueing time, as seen by the client
+        start = time.perf_counter()
+        async with semaphore:
+            await make_request(i)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n_requests)))
+    return time.perf_counter() - start, latencies
+
+
+def report(label: str, n_requests: int, elapsed: float, latencies: list):
+    """Print RPS and latency percentiles"""
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(
+        f"{label:<12} {n_requests / elapsed:8.2f} RPS   "
+        f"p50={p50 * 1000:8.1f} ms   p95={p95 * 1000:8.1f} ms   total={elapsed:.1f}s"
+    )
+
+
+async def inline_blocking(func, *args, **kwargs):
+    """run_blocking before the thread pool: the stage runs on the event loop"""
+    return func(*args, **kwargs)
+
+
+async def in_process(args):
+    import httpx
+
+    workdir = tempfile.mkdtemp(prefix="bench_rag_")
+    main = load_app(args, workdir)
+    offloaded = main.run_blocking
+    headers = auth_headers()
+
+    print(f"In-process app ({args.vector_backend}, {args.chunks} chunks): "
+          f"embed={args.embed_ms:.0f}ms/text, rerank={args.rerank_ms:.0f}ms/pair ({args.burn}), "
+          f"llm={args.llm_ms:.0f}ms")
+    print(f"{args.requests} requests, concurrency {args.concurrency}, "
+          f"{args.workers} executor threads, batch window {args.batch_window_ms}ms\n")
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers, timeout=600) as client:
+        for label, blocking in (("before", True), ("after", False)):
+            main.run_blocking = inline_blocking if blocking else offloaded
+            main.mistral_client = FakeMistral(args.llm_ms / 1000, blocking=blocking)
+
+            async def make_request(i: int):
+                # Distinct query per request: no retrieval/rerank cache hits
+                query = f"{args.query} {VOCABULARY[i % len(VOCABULARY)]} ({label} {i})"
+                response = await client.post("/api/v1/rag/query", json={"query": query})
+                response.raise_for_status()
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                elapsed, latencies = await run_load(make_request, args.requests, args.concurrency)
+            report(label, args.requests, elapsed, latencies)
+
+
+async def live(args):
+    import httpx
+
+    headers = {"Authorization": f"Bearer {args.token}"}
+    async with httpx.AsyncClient(base_url=args.url, headers=headers, timeout=120) as client:
+
+        async def make_request(i: int):
+            response = await client.post("/api/v1/rag/query", json={"query": f"{args.query} ({i})"})
+            response.raise_for_status()
+
+        print(f"Live benchmark against {args.url}: {args.requests} requests, "
+              f"concurrency {args.concurrency}\n")
+        elapsed, latencies = await run_load(make_request, args.requests, args.concurrency)
+        report("live", args.requests, elapsed, latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RAG query concurrency benchmark")
+    parser.add_argument("--requests", type=int, default=100, help="Total number of requests")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent requests in flight")
+    parser.add_argument("--workers", type=int, default=4, help="RAG_EXECUTOR_WORKERS of the app")
+    parser.add_argument("--batch-window-ms", type=float, default=0.0,
+                        help="RAG_BATCH_WINDOW_MS of the app (0 isolates the thread pool effect)")
+    parser.add_argument("--vector-backend", choices=["chroma", "numpy", "faiss"], default="chroma",
+                        help="RAG_VECTOR_BACKEND of the app")
+    parser.add_argument("--chunks", type=int, default=2000, help="Chunks seeded in the benchmark index")
+    parser.add_argument("--embed-ms", type=float, default=15.0, help="CPU time per embedded text")
+    parser.add_argument("--rerank-ms", type=float, default=6.0, help="CPU time per reranked pair")
+    parser.add_argument("--llm-ms", type=float, default=1200.0, help="Mistral response time")
+    parser.add_argument("--burn", choices=["numpy", "python"], default="numpy",
+                        help="numpy releases the GIL (like torch), python holds it")
+    parser.add_argument("--url", help="Backend base URL (live mode)")
+    parser.add_argument("--token", help="Supabase JWT (live mode)")
+    parser.add_argument("--query", default="Comment remplacer le filtre de la pompe ?",
+                        help="Query sent (suffixed to keep each request distinct)")
+    args = parser.parse_args()
+
+    if args.url:
+        if not args.token:
+            parser.error("--token is required with --url")
+        asyncio.run(live(args))
+    else:
+        asyncio.run(in_process(args))
+
+
+if __name__ == "__main__":
+    main()
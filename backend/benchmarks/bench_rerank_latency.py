@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark for CrossEncoderReranker
+
+Reranks N synthetic candidates (maintenance-manual-like chunks, 20 by
+default, as in /api/v1/rag/query) for a set of queries and reports p50/p95
+latency for each configuration:
+- baseline: model.predict(pairs) with default settings (previous behavior)
+- torch: batched predict (--batch-size)
+- torch-int8: batched predict, dynamically quantized Linear layers
+- onnx-int8: ONNX Runtime with the quantized export (needs
+  sentence-transformers with the onnx backend + optimum/onnxruntime)
+- cached: torch, second pass over the same queries (score cache hits)
+
+Downloads the cross-encoder model on first run.
+
+Usage:
+  python benchmarks/bench_rerank_latency.py
+  python benchmarks/bench_rerank_latency.py --candidates 20 --queries 30 --batch-size 32
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Allow importing the rag package from backend/
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+QUERIES = [
+    "Comment remplacer le filtre d'aspiration de la pompe ?",
+    "Quel est l'intervalle de graissage du moteur ?",
+    "Procédure d'arrêt machine avant intervention",
+    "Pression nominale du circuit hydraulique",
+    "Que faire en cas de surchauffe du roulement ?",
+]
+
+
+def make_candidates(n: int, offset: int = 0):
+    """Synthetic candidate chunks (~800 characters, as produced by SmartChunker)"""
+    sentences = [
+        "Vérifier la pression du circuit hydraulique avant chaque démarrage.",
+        "Le filtre d'aspiration doit être remplacé toutes les 500 heures.",
+        "Arrêt machine obligatoire avant toute intervention sur le moteur.",
+        "Contrôler la température des roulements à l'aide d'une sonde.",
+        "Le graissage s'effectue avec une graisse au lithium de grade 2.",
+    ]
+    candidates = []
+    for i in range(n):
+        k = offset + i
+        text = " ".join(sentences[(k + j) % len(sentences)] for j in range(12))
+        candidates.append({
+            "id": f"chunk-{k}",
+            "document": f"Section {k}. {text}",
+            "score": 1.0 / (i + 1),
+            "metadata": {"source": "manuel.pdf", "page": k % 40 + 1}
+        })
+    return candidates
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def run(label, rerank, workload):
+    latencies = []
+    for query, candidates in workload:
+        start = time.perf_counter()
+        rerank(query, candidates)
+        latencies.append((time.perf_counter() - start) * 1000)
+    print(
+        f"{label:<12} p50={percentile(latencies, 0.5):7.1f} ms   "
+        f"p95={percentile(latencies, 0.95):7.1f} ms   mean={statistics.mean(latencies):7.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-encoder rerank latency benchmark")
+    parser.add_argument("--candidates", type=int, default=20, help="Candidates per query")
+    parser.add_argument("--queries", type=int, default=30, help="Queries per configuration")
+    parser.add_argument("--batch-size", type=int, default=32, help="Pairs per forward pass")
+    parser.add_argument("--skip-onnx", action="store_true", help="Skip the ONNX Runtime configuration")
+    args = parser.parse_args()
+
+    from rag.reranker import CrossEncoderReranker
+
+    # Distinct candidate ids per query so the cache only helps the "cached" pass
+    workload = [
+        (QUERIES[i % len(QUERIES)], make_candidates(args.candidates, offset=i * args.candidates))
+        for i in range(args.queries)
+    ]
+    print(f"{args.queries} queries x {args.candidates} candidates, batch_size={args.batch_size}\n")
+
+    baseline = CrossEncoderReranker(MODEL_NAME, cache_size=0)
+    run("baseline", lambda q, c: baseline.model.predict([[q, x["document"]] for x in c]), workload)
+
+    torch_reranker = CrossEncoderReranker(MODEL_NAME, batch_size=args.batch_size)
+    run("torch", torch_reranker.rerank, workload)
+    run("cached", torch_reranker.rerank, workload)
+
+    int8 = CrossEncoderReranker(MODEL_NAME, batch_size=args.batch_size, quantize=True, cache_size=0)
+    run("torch-int8", int8.rerank, workload)
+
+    if not args.skip_onnx:
+        onnx = CrossEncoderReranker(
+            MODEL_NAME, batch_size=args.batch_size, backend="onnx", quantize=True, cache_size=0
+        )
+        if onnx.backend == "onnx":
+            run("onnx-int8", onnx.rerank, workload)
+        else:
+            print("onnx-int8    skipped (ONNX backend unavailable)")
+
+
+if __name__ == "__main__":
+    main()
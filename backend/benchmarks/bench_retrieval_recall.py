@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Retrieval recall / latency benchmark (candidate budgets and fusion alpha)
+
+Builds a synthetic maintenance corpus in a temporary ChromaDB (like
+test_rag_pipeline.py): one chunk per (equipment, fact) - greasing interval,
+nominal pressure, tightening torque, filter change, bearing temperature,
+lockout procedure - surrounded by generic filler sentences, plus filler-only
+noise chunks. Each labelled query paraphrases one fact (plurals, missing
+accents), its fact chunk being the relevant answer.
+
+Sweeps the retrieval stages of /api/v1/rag/query, each query of each
+configuration going through rag.retrieval.retrieve_candidates (the function
+the endpoint calls, without its result cache) and the cross-encoder:
+- vector candidates (ChromaDB n_results, RAG_VECTOR_CANDIDATES)
+- BM25 candidates (search_lexical n_results, RAG_BM25_CANDIDATES)
+- HybridSearcher.alpha (RAG_HYBRID_ALPHA)
+- fused candidates sent to the reranker (RAG_FUSION_TOP_K)
+and reports per configuration:
+- cand: share of queries whose answer is among the fused candidates
+- recall@k / MRR@k of the final list (reranked top --top-k, RAG_RERANK_TOP_K)
+- p50/p95 latency of each stage and of the whole retrieval
+
+Downloads the embedding and cross-encoder models on first run.
+
+Usage:
+  python benchmarks/bench_retrieval_recall.py
+  python benchmarks/bench_retrieval_recall.py --vector 5,10,20 --bm25 10,20,40 --alpha 0.3,0.5,0.7 --fusion 5,10,20
+  python benchmarks/bench_retrieval_recall.py --no-rerank --equipment 50 --noise-chunks 5000 --csv results.csv
+"""
+import argparse
+import csv
+import itertools
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Allow importing the rag package from backend/
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+USER_ID = "bench_user"
+
+EQUIPMENT_TYPES = [
+    ("pompe centrifuge", "P"),
+    ("compresseur à vis", "C"),
+    ("moteur asynchrone", "M"),
+    ("convoyeur à bande", "CV"),
+    ("ventilateur d'extraction", "V"),
+    ("réducteur", "R"),
+    ("vérin hydraulique", "H"),
+    ("échangeur thermique", "E"),
+]
+
+# (fact name, chunk sentence, query paraphrases, value choices)
+FACTS = [
+    (
+        "graissage",
+        "Le graissage des roulements du {equipment} {tag} s'effectue toutes les {value} heures "
+        "avec une graisse au lithium de grade 2.",
+        ["Quel est l'intervalle de graissage du {equipment} {tag} ?",
+         "tous les combien graisser les roulements {tag}"],
+        [250, 500, 1000, 2000],
+    ),
+    (
+        "pression",
+        "La pression nominale de service du {equipment} {tag} est de {value} bar ; "
+        "ne jamais dépasser le tarage de la soupape de sécurité.",
+        ["Pression nominale du {equipment} {tag}",
+         "quelle pression de service pour le {tag} ?"],
+        [4, 6, 8, 10, 16],
+    ),
+    (
+        "serrage",
+        "Serrer les boulons de fixation du {equipment} {tag} au couple de {value} N.m "
+        "après chaque démontage.",
+        ["couple de serrage des boulons du {tag}",
+         "A quel couple serrer la fixation du {equipment} {tag} ?"],
+        [25, 40, 60, 85, 120],
+    ),
+    (
+        "filtre",
+        "Remplacer la cartouche filtrante du {equipment} {tag} (référence FLT-{value}) "
+        "à chaque révision ou en cas de colmatage.",
+        ["Quand changer les filtres du {equipment} {tag} ?",
+         "reference cartouche filtrante {tag}"],
+        list(range(100, 1000, 37)),
+    ),
+    (
+        "temperature",
+        "La température maximale admissible des paliers du {equipment} {tag} est de {value} °C ; "
+        "au-delà, arrêter la machine et contrôler l'alignement.",
+        ["temperature max des paliers du {tag}",
+         "Que faire si les paliers du {equipment} {tag} surchauffent ?"],
+        [70, 80, 90, 105],
+    ),
+    (
+        "consignation",
+        "Avant toute intervention sur le {equipment} {tag}, consigner l'alimentation au "
+        "sectionneur Q{value} et vérifier l'absence de tension.",
+        ["procedure de consignation du {equipment} {tag}",
+         "Quel sectionneur ouvrir avant d'intervenir sur le {tag} ?"],
+        list(range(1, 60)),
+    ),
+]
+
+FILLER = [
+    "Porter les équipements de protection individuelle adaptés.",
+    "Consigner toute anomalie dans le registre de maintenance.",
+    "Les pièces de rechange doivent être d'origine constructeur.",
+    "Nettoyer la zone de travail après l'intervention.",
+    "Vérifier le bon état des flexibles et des raccords.",
+    "Contrôler visuellement l'absence de fuite d'huile.",
+    "Le personnel doit être habilité pour ce type d'opération.",
+    "Respecter les préconisations du constructeur en toutes circonstances.",
+    "Les vibrations anormales doivent être signalées au responsable.",
+    "Une inspection visuelle est recommandée à chaque prise de poste.",
+    "Les carters de protection doivent être remis en place avant le redémarrage.",
+    "Noter les valeurs relevées sur la fiche de suivi de l'équipement.",
+]
+
+
+def build_corpus(rng: random.Random, equipment_per_type: int, noise_chunks: int, n_queries: int):
+    """Returns (chunks, metadatas, ids, queries) with queries = [(text, {relevant ids})]"""
+    chunks, metadatas, ids, labelled = [], [], [], []
+
+    for (equipment, prefix), number in itertools.product(EQUIPMENT_TYPES, range(equipment_per_type)):
+        tag = f"{prefix}-{101 + number}"
+        document_name = f"manuel_{tag}.pdf"
+        for page, (fact, sentence, queries, values) in enumerate(FACTS, 1):
+            body = [sentence.format(equipment=equipment, tag=tag, value=rng.choice(values))]
+            body += rng.sample(FILLER, rng.randint(3, 6))
+            rng.shuffle(body)
+            chunk_id = f"{tag}-{fact}"
+            chunks.append(f"{equipment.capitalize()} {tag}. " + " ".join(body))
+            metadatas.append({"document_name": document_name, "page_number": page, "chunk_index": 0})
+            ids.append(chunk_id)
+            labelled.append((chunk_id, [q.format(equipment=equipment, tag=tag) for q in queries]))
+
+    for i in range(noise_chunks):
+        chunks.append(" ".join(rng.sample(FILLER, rng.randint(4, 8))))
+        metadatas.append({"document_name": f"consignes_{i // 20}.pdf", "page_number": i % 20 + 1, "chunk_index": 0})
+        ids.append(f"noise-{i}")
+
+    queries = [
+        (rng.choice(paraphrases), {chunk_id})
+        for chunk_id, paraphrases in rng.sample(labelled, min(n_queries, len(labelled)))
+    ]
+    return chunks, metadatas, ids, queries
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def recall_and_rr(ranked_ids, relevant, k):
+    """(recall@k, reciprocal rank of the first relevant id within k)"""
+    top = ranked_ids[:k]
+    recall = len(relevant.intersection(top)) / len(relevant)
+    rr = next((1.0 / rank for rank, doc_id in enumerate(top, 1) if doc_id in relevant), 0.0)
+    return recall, rr
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def int_list(value):
+    return [int(v) for v in value.split(",")]
+
+
+def float_list(value):
+    return [float(v) for v in value.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval recall / latency benchmark")
+    parser.add_argument("--equipment", type=int, default=25, help="Equipments per type (x8 types x6 facts chunks)")
+    parser.add_argument("--noise-chunks", type=int, default=2000, help="Filler-only chunks")
+    parser.add_argument("--queries", type=int, default=100, help="Labelled queries")
+    parser.add_argument("--vector", type=int_list, default=[5, 10, 20], help="Vector candidate budgets")
+    parser.add_argument("--bm25", type=int_list, default=[10, 20, 40], help="BM25 candidate budgets")
+    parser.add_argument("--alpha", type=float_list, default=[0.3, 0.5, 0.7], help="HybridSearcher.alpha values")
+    parser.add_argument("--fusion", type=int_list, default=[5, 10, 20], help="Fused candidates sent to the reranker")
+    parser.add_argument("--top-k", type=int, default=5, help="Final results (recall@k / MRR@k)")
+    parser.add_argument("--no-rerank", action="store_true", help="Evaluate the fused ranking without cross-encoder")
+    parser.add_argument("--embedding-model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--csv", help="Also write the results to this CSV file")
+    args = parser.parse_args()
+
+    from rag.chroma_manager import ChromaManager
+    from rag.hybrid_search import HybridSearcher
+    from rag.retrieval import retrieve_candidates
+    from rag.text_analysis import analyze
+
+    rng = random.Random(args.seed)
+    chunks, metadatas, ids, queries = build_corpus(rng, args.equipment, args.noise_chunks, args.queries)
+    print(f"Corpus: {len(chunks)} chunks, {len(queries)} labelled queries")
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_retrieval_"))
+    try:
+        chroma = ChromaManager(persist_directory=str(workdir / "chroma_db"), embedding_model=args.embedding_model)
+        start = time.perf_counter()
+        for i in range(0, len(chunks), 512):
+            chroma.add_documents(
+                USER_ID, chunks[i:i + 512], metadatas[i:i + 512], ids[i:i + 512],
+                tokens=[analyze(chunk) for chunk in chunks[i:i + 512]]
+            )
+        print(f"Indexed in {time.perf_counter() - start:.1f}s")
+
+        reranker = None
+        if not args.no_rerank:
+            from rag.reranker import CrossEncoderReranker
+            # No score cache: every configuration pays the real rerank cost
+            reranker = CrossEncoderReranker(RERANK_MODEL, cache_size=0)
+
+        # Warm-up (model loading, BM25 matrix build)
+        chroma.query(USER_ID, queries[0][0], n_results=max(args.vector))
+        chroma.search_lexical(USER_ID, queries[0][0], n_results=max(args.bm25))
+
+        rows = []
+        for vector_k, bm25_k, alpha, fusion_k in itertools.product(args.vector, args.bm25, args.alpha, args.fusion):
+            searcher = HybridSearcher(alpha=alpha)
+            stage_ms = {"vector": [], "bm25_fusion": [], "rerank": [], "total": []}
+            cand_hits, recalls, rrs = 0, [], []
+
+            for query, relevant in queries:
+                # Same path as the endpoint (no result cache: ChromaManager built without one)
+                timings = {}
+                _, fused = retrieve_candidates(
+                    chroma, searcher, USER_ID, query,
+                    vector_candidates=vector_k, bm25_candidates=bm25_k, fusion_top_k=fusion_k,
+                    timings=timings
+                )
+                vector_ms = timings["vector_query"] * 1000
+                bm25_fusion_ms = timings.get("bm25_fusion", 0.0) * 1000
+                final, rerank_ms = fused[:args.top_k], 0.0
+                if reranker is not None:
+                    final, rerank_ms = timed(reranker.rerank, query, fused, top_k=args.top_k)
+
+                cand_hits += bool(relevant.intersection(r["id"] for r in fused))
+                recall, rr = recall_and_rr([r["id"] for r in final], relevant, args.top_k)
+                recalls.append(recall)
+                rrs.append(rr)
+                for stage, ms in (("vector", vector_ms), ("bm25_fusion", bm25_fusion_ms), ("rerank", rerank_ms)):
+                    stage_ms[stage].append(ms)
+                stage_ms["total"].append(vector_ms + bm25_fusion_ms + rerank_ms)
+
+            row = {
+                "vector": vector_k, "bm25": bm25_k, "alpha": alpha, "fusion": fusion_k,
+                "cand": cand_hits / len(queries),
+                "recall": sum(recalls) / len(recalls),
+                "mrr": sum(rrs) / len(rrs),
+            }
+            for stage, values in stage_ms.items():
+                row[f"{stage}_p50"] = percentile(values, 0.5)
+                row[f"{stage}_p95"] = percentile(values, 0.95)
+            rows.append(row)
+
+        print(
+            f"\n{'vec':>4} {'bm25':>4} {'alpha':>5} {'fus':>4} | {'cand':>5} {f'R@{args.top_k}':>5} {'MRR':>5} | "
+            f"{'vector p50/p95':>15} {'bm25+fusion p50/p95':>20} {'rerank p50/p95':>15} {'total p50/p95':>15}"
+        )
+        for row in rows:
+            print(
+                f"{row['vector']:>4} {row['bm25']:>4} {row['alpha']:>5.2f} {row['fusion']:>4} | "
+                f"{row['cand']:>5.2f} {row['recall']:>5.2f} {row['mrr']:>5.2f} | "
+                f"{row['vector_p50']:>7.1f}/{row['vector_p95']:<7.1f} "
+                f"{row['bm25_fusion_p50']:>9.1f}/{row['bm25_fusion_p95']:<10.1f} {row['rerank_p50']:>7.1f}/{row['rerank_p95']:<7.1f} "
+                f"{row['total_p50']:>7.1f}/{row['total_p95']:<7.1f}"
+            )
+
+        # Cheapest configuration within 1 point of the best recall
+        best_recall = max(row["recall"] for row in rows)
+        good = [row for row in rows if row["recall"] >= best_recall - 0.01]
+        pick = min(good, key=lambda row: (row["total_p95"], -row["mrr"]))
+        print(
+            f"\nSuggested: RAG_VECTOR_CANDIDATES={pick['vector']} RAG_BM25_CANDIDATES={pick['bm25']} "
+            f"RAG_HYBRID_ALPHA={pick['alpha']} RAG_FUSION_TOP_K={pick['fusion']} "
+            f"(R@{args.top_k}={pick['recall']:.2f}, MRR={pick['mrr']:.2f}, p95={pick['total_p95']:.1f} ms)"
+        )
+
+        if args.csv:
+            with open(args.csv, "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
+            print(f"Results written to {args.csv}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,31 @@
+# --- LANCEMENT PAR `python main.py` ---
+# Délègue à serve.py avant toute initialisation : les workers OCR ("spawn") ré-exécutent
+# le script de lancement dans chaque processus, qui rechargeraient sinon les modèles et
+# les clients Supabase/Mistral/ChromaDB définis plus bas.
+if __name__ == "__main__":
+    import os.path
+    import runpy
+    runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), "serve.py"), run_name="__main__")
+    raise SystemExit(0)
+
 # --- IMPORTATIONS STANDARD ET DE BIBLIOTHÈQUES TIERCES ---
 import pytesseract
-import uvicorn
 import os
 import re # Pour le découpage (chunking)
-from io import BytesIO
+import asyncio
+import functools
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse, Response
+from starlette.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from pydantic import BaseModel
-from pdf2image import convert_from_bytes
-from pypdf import PdfReader
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -22,11 +35,18 @@ from mistralai import Mistral
 
 # --- IMPORTATIONS DES MODULES RAG ---
 from rag.chroma_manager import ChromaManager
+from rag.numpy_store import NumpyVectorStore
 from rag.chunking import SmartChunker
 from rag.hybrid_search import HybridSearcher
+from rag.retrieval import retrieve_candidates as rag_retrieve_candidates
 from rag.reranker import CrossEncoderReranker
 from rag.citation_tracker import CitationTracker
-from rag.ocr_processor import OCRProcessor
+from rag.ocr_processor import OCRProcessor, ParallelOCREngine
+from rag.query_cache import QueryResultCache
+from rag.ingestion import IngestionPipeline, IngestionError
+from rag.ingestion_jobs import IngestionJobStore, IngestionJobQueue
+from rag.store_lock import StoreLock
+from rag.metrics import time_stage, render_latest, RAG_QUERIES, RAG_STAGE_SECONDS
 
 # --- CHARGEMENT DES SECRETS DEPUIS backend/.env ---
 load_dotenv()
@@ -47,6 +67,11 @@ SUPABASE_SERVICE_KEY = os.environ.get("SUPABASE_SERVICE_KEY")
 # Secret pour l'API Mistral (pour la génération de réponse)
 MISTRAL_API_KEY = os.environ.get("MISTRAL_API_KEY")
 
+# Administrateurs (IDs Supabase séparés par des virgules) : seuls à voir les statistiques globales du RAG
+RAG_ADMIN_USER_IDS = {
+    user_id.strip() for user_id in os.environ.get("RAG_ADMIN_USER_IDS", "").split(",") if user_id.strip()
+}
+
 # Vérification que toutes les clés nécessaires sont présentes
 if not all([SUPABASE_JWT_SECRET, SUPABASE_URL, SUPABASE_SERVICE_KEY, MISTRAL_API_KEY]):
     raise ValueError("Erreurs de configuration: veuillez vérifier le fichier .env (Supabase ET Mistral)")
@@ -63,16 +88,66 @@ except Exception as e:
 
 # 2. RAG Pipeline Components
 try:
+    # Cache des résultats de recherche par utilisateur (invalidé à chaque ajout/suppression)
+    query_cache = QueryResultCache(
+        max_entries_per_user=256,
+        ttl_seconds=float(os.environ.get("RAG_CACHE_TTL", "600"))
+    )
+    # Fenêtre de micro-batching (ms) : embeddings de requêtes et re-ranking des requêtes concurrentes
+    rag_batch_window_ms = float(os.environ.get("RAG_BATCH_WINDOW_MS", "3"))
+    # Paramètres HNSW des nouvelles collections (search_ef s'applique aussi aux existantes,
+    # les autres via scripts/rebuild_vector_index.py)
+    hnsw_config = {
+        "space": os.environ.get("RAG_HNSW_SPACE"),
+        "construction_ef": int(os.environ["RAG_HNSW_CONSTRUCTION_EF"]) if os.environ.get("RAG_HNSW_CONSTRUCTION_EF") else None,
+        "search_ef": int(os.environ["RAG_HNSW_SEARCH_EF"]) if os.environ.get("RAG_HNSW_SEARCH_EF") else None,
+        "M": int(os.environ["RAG_HNSW_M"]) if os.environ.get("RAG_HNSW_M") else None,
+    }
+    # Backend vectoriel : chroma (défaut), numpy ou faiss (matrices float32 mappées en mémoire,
+    # un shard par utilisateur : pas de verrou d'écriture SQLite partagé pendant l'ingestion)
+    # L'index BM25 et le manifeste suivent le backend (./vector_store_bm25...) : après un changement
+    # de backend ils sont reconstruits et les documents doivent être ré-ingérés. Le cache d'embeddings
+    # (./chroma_db_embeddings, ou RAG_EMBEDDING_CACHE_DIR) est commun : la ré-ingestion ne ré-encode rien
+    vector_backend = os.environ.get("RAG_VECTOR_BACKEND", "chroma").lower()
+    vector_store = None
+    if vector_backend in ("numpy", "faiss"):
+        vector_store = NumpyVectorStore(
+            persist_directory="./vector_store",
+            space=os.environ.get("RAG_HNSW_SPACE") or "l2",
+            use_faiss=vector_backend == "faiss"
+        )
+    elif vector_backend != "chroma":
+        raise ValueError(f"RAG_VECTOR_BACKEND inconnu : {vector_backend} (chroma, numpy ou faiss)")
     chroma_manager = ChromaManager(
         persist_directory="./chroma_db",
-        embedding_model="all-MiniLM-L6-v2"
+        embedding_model="all-MiniLM-L6-v2",
+        embedding_cache_directory=os.environ.get("RAG_EMBEDDING_CACHE_DIR") or None,
+        query_cache=query_cache,
+        batch_window_ms=rag_batch_window_ms,
+        hnsw_config=None if vector_store else {key: value for key, value in hnsw_config.items() if value is not None},
+        vector_store=vector_store
+    )
+    # Pris au démarrage (voir acquire_store_lock)
+    store_lock = StoreLock(str(chroma_manager.lock_path))
+    # Découpage en phrases : full (modèle spaCy complet, défaut), fast (sentencizer) ou rules (regex).
+    # Changer de mode modifie les frontières et ids des chunks des documents ré-indexés.
+    smart_chunker = SmartChunker(
+        chunk_size=800, chunk_overlap=100, language='fr',
+        segmentation=os.environ.get("RAG_SEGMENTATION", "full")
+    )
+    # Poids sémantique vs mot-clé de la fusion RRF (0.5 = égal)
+    hybrid_searcher = HybridSearcher(alpha=float(os.environ.get("RAG_HYBRID_ALPHA", "0.5")))
+    # RERANK_BACKEND=onnx + RERANK_QUANTIZE=true : variante int8 ONNX Runtime pour serveurs CPU
+    reranker = CrossEncoderReranker(
+        model_name="cross-encoder/ms-marco-MiniLM-L-6-v2",
+        batch_size=int(os.environ.get("RERANK_BATCH_SIZE", "32")),
+        backend=os.environ.get("RERANK_BACKEND", "torch"),
+        quantize=os.environ.get("RERANK_QUANTIZE", "false").lower() == "true",
+        batch_window_ms=rag_batch_window_ms
     )
-    smart_chunker = SmartChunker(chunk_size=800, chunk_overlap=100, language='fr')
-    hybrid_searcher = HybridSearcher(alpha=0.5)  # Equal weight semantic + keyword
-    reranker = CrossEncoderReranker(model_name="cross-encoder/ms-marco-MiniLM-L-6-v2")
     citation_tracker = CitationTracker()
     ocr_processor = OCRProcessor(languages=['fr', 'en'], gpu=False)
-    print("RAG Pipeline initialisé (ChromaDB + Hybrid Search + Reranker + OCR).")
+    print(f"RAG Pipeline initialisé ({chroma_manager.store.name} + Hybrid Search + Reranker + OCR).")
 except Exception as e:
     print(f"Erreur d'initialisation du pipeline RAG: {e}")
     exit(1)
@@ -84,6 +159,49 @@ try:
 except Exception as e:
     print(f"Erreur d'initialisation du client Mistral: {e}")
     exit(1)
+
+# 4. Pipeline d'ingestion + file de jobs en arrière-plan (table SQLite locale)
+try:
+    # OCR page-parallèle : un lecteur EasyOCR par processus (OCR_WORKERS=1 pour désactiver).
+    # Par défaut la moitié des cœurs (4 max) : chaque worker charge ses propres modèles EasyOCR
+    # et l'API garde des cœurs pour les requêtes. Les workers sont lancés en mode "spawn" :
+    # démarrer avec `python serve.py` ou `uvicorn main:app` (voir serve.py).
+    default_ocr_workers = min(4, max(1, (os.cpu_count() or 1) // 2))
+    ocr_workers = int(os.environ.get("OCR_WORKERS", str(default_ocr_workers)))
+    ocr_engine = ParallelOCREngine(languages=['fr', 'en'], gpu=False, max_workers=ocr_workers) if ocr_workers > 1 else None
+    ingestion_pipeline = IngestionPipeline(
+        chroma_manager=chroma_manager,
+        chunker=smart_chunker,
+        ocr_processor=ocr_processor,
+        ocr_engine=ocr_engine,
+        pdf_storage_dir=str(PDF_STORAGE_DIR)
+    )
+    ingestion_jobs = IngestionJobStore(db_path="./ingestion_jobs.db")
+    ingestion_queue = IngestionJobQueue(
+        pipeline=ingestion_pipeline,
+        store=ingestion_jobs,
+        spool_dir="./ingestion_spool",
+        max_workers=int(os.environ.get("INGESTION_WORKERS", "2"))
+    )
+    print("File d'ingestion initialisée.")
+except Exception as e:
+    print(f"Erreur d'initialisation de la file d'ingestion: {e}")
+    exit(1)
+
+# Mise en cache optionnelle de la réponse Mistral complète (RAG_CACHE_ANSWERS=true)
+RAG_CACHE_ANSWERS = os.environ.get("RAG_CACHE_ANSWERS", "false").lower() == "true"
+
+# Budgets de candidats par étape (à régler avec benchmarks/bench_retrieval_recall.py)
+RAG_VECTOR_CANDIDATES = int(os.environ.get("RAG_VECTOR_CANDIDATES", "10"))  # Résultats ChromaDB
+RAG_BM25_CANDIDATES = int(os.environ.get("RAG_BM25_CANDIDATES", "20"))  # Résultats BM25
+RAG_FUSION_TOP_K = int(os.environ.get("RAG_FUSION_TOP_K", "10"))  # Candidats envoyés au re-ranking
+RAG_RERANK_TOP_K = int(os.environ.get("RAG_RERANK_TOP_K", "5"))  # Passages gardés pour le contexte
+
+# 5. Pool de threads borné pour les étapes bloquantes du RAG (embedding, ChromaDB, CrossEncoder)
+# Avec le micro-batching, les threads attendent surtout le lot commun : on peut en ouvrir davantage
+RAG_EXECUTOR_WORKERS = int(os.environ.get("RAG_EXECUTOR_WORKERS", "16" if rag_batch_window_ms > 0 else "4"))
+rag_executor = ThreadPoolExecutor(max_workers=RAG_EXECUTOR_WORKERS, thread_name_prefix="rag")
+print(f"Pool RAG initialisé ({RAG_EXECUTOR_WORKERS} threads).")
 # --- FIN DES INITIALISATIONS ---
 
 
@@ -103,6 +221,56 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"], # Important : autorise l'en-tête "Authorization"
 )
+
+@app.on_event("startup")
+def acquire_store_lock():
+    """
+    Verrou exclusif sur le stockage RAG (partagé avec scripts/bulk_ingest_pdfs.py) :
+    deux écrivains écraseraient mutuellement l'index BM25, le manifeste et les shards.
+    Le démarrage échoue si une ingestion en masse tourne sur le même stockage.
+    """
+    store_lock.acquire(owner="api")
+
+@app.on_event("startup")
+def recover_ingestion_jobs():
+    """ Relance les jobs d'ingestion interrompus par un redémarrage. """
+    recovered = ingestion_queue.recover()
+    if recovered:
+        print(f"🔁 {recovered} job(s) d'ingestion relancé(s)")
+
+@app.on_event("startup")
+def warmup_vector_indexes():
+    """
+    Charge en mémoire les index HNSW/BM25 des plus grosses collections (en arrière-plan),
+    pour que la première requête après un redémarrage ne paie pas la lecture disque.
+    RAG_WARMUP=false pour désactiver, RAG_WARMUP_MAX_COLLECTIONS pour borner.
+    """
+    if os.environ.get("RAG_WARMUP", "true").lower() != "true":
+        return
+    max_collections = int(os.environ.get("RAG_WARMUP_MAX_COLLECTIONS", "20"))
+
+    def run():
+        start = time.perf_counter()
+        try:
+            timings = chroma_manager.warmup(max_collections=max_collections)
+            print(f"🔥 {len(timings)} collection(s) préchargée(s) en {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            print(f"⚠️ Préchargement des index impossible: {e}")
+
+    threading.Thread(target=run, name="rag-warmup", daemon=True).start()
+
+@app.on_event("shutdown")
+def shutdown_rag_executor():
+    """ Libère les pools (RAG, ingestion, OCR) à l'arrêt du serveur. """
+    rag_executor.shutdown(wait=False)
+    ingestion_queue.shutdown(wait=False)
+    if ocr_engine is not None:
+        ocr_engine.shutdown(wait=False)
+    if chroma_manager.query_batcher is not None:
+        chroma_manager.query_batcher.shutdown()
+    if reranker.batcher is not None:
+        reranker.batcher.shutdown()
+    store_lock.release()
 # ---
 
 # --- SCHÉMAS DE DONNÉES Pydantic ---
@@ -181,6 +349,15 @@ async def get_current_user(token: str = Depends(get_token_from_request)) -> User
         return UserTokenData(sub=user_id, aud=aud)
     except JWTError:
         raise credentials_exception
+
+async def get_admin_user(current_user: UserTokenData = Depends(get_current_user)) -> UserTokenData:
+    """
+    Dépendance FastAPI : réservé aux utilisateurs listés dans RAG_ADMIN_USER_IDS
+    (routes exposant des chiffres de tout le processus, tous utilisateurs confondus).
+    """
+    if current_user.sub not in RAG_ADMIN_USER_IDS:
+        raise HTTPException(status_code=403, detail="Accès réservé aux administrateurs")
+    return current_user
 # ---
 
 # --- FONCTION UTILITAIRE : DÉCOUPAGE (Legacy - kept for compatibility) ---
@@ -206,6 +383,150 @@ def chunk_text(text: str, chunk_size: int = 800, overlap: int = 100) -> list[str
     return chunks
 # ---
 
+# --- PIPELINE RAG : ÉTAPES BLOQUANTES (exécutées dans rag_executor) ---
+RAG_SYSTEM_PROMPT = """Tu es un assistant expert en maintenance industrielle. 
+Réponds à la question en te basant STRICTEMENT sur le contexte fourni. 
+Cite tes sources en utilisant [1], [2], etc. qui correspondent aux numéros dans le contexte.
+Sois concis et précis. Si l'information n'est pas dans le contexte, dis-le clairement."""
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Exécute une fonction synchrone (CPU ou I/O bloquant) dans le pool borné
+    rag_executor, sans bloquer la boucle d'événements d'uvicorn.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(rag_executor, functools.partial(func, *args, **kwargs))
+
+def retrieve_candidates(user_id: str, query: str) -> tuple[dict, list]:
+    """
+    Étapes 1 et 2 du pipeline : recherche vectorielle (embedding de la requête)
+    puis fusion avec le BM25 de l'utilisateur. Retourne (vector_results, hybrid_results).
+    Même fonction que benchmarks/bench_retrieval_recall.py (rag.retrieval).
+    """
+    print("1️⃣ Recherche vectorielle ChromaDB + 2️⃣ fusion hybride (sémantique + mot-clé)...")
+    vector_results, hybrid_results = rag_retrieve_candidates(
+        chroma_manager,
+        hybrid_searcher,
+        user_id,
+        query,
+        vector_candidates=RAG_VECTOR_CANDIDATES,  # Fetch more for reranking
+        bm25_candidates=RAG_BM25_CANDIDATES,
+        fusion_top_k=RAG_FUSION_TOP_K
+    )
+    if vector_results['documents'][0]:
+        print(f"✅ Trouvé {len(vector_results['documents'][0])} résultats vectoriels, {len(hybrid_results)} résultats fusionnés")
+
+    return vector_results, hybrid_results
+
+def build_llm_context(reranked_results: list) -> str:
+    """ Construit le contexte numéroté [1], [2]... envoyé au LLM. """
+    context_parts = []
+    for i, result in enumerate(reranked_results, 1):
+        doc_name = result['metadata'].get('document_name', 'Unknown')
+        page_num = result['metadata'].get('page_number', 0)
+        content = result['document']
+        context_parts.append(f"[{i}] Source: {doc_name} (page {page_num})\n{content}")
+
+    return "\n\n---\n\n".join(context_parts)
+
+def extract_answer_text(chat_response) -> str:
+    """ Extrait le texte de la réponse Mistral (str ou liste de morceaux). """
+    generated_answer = ""
+    if chat_response and getattr(chat_response, "choices", None):
+        msg = chat_response.choices[0].message.content
+        if isinstance(msg, str):
+            generated_answer = msg
+        elif isinstance(msg, list):
+            parts = []
+            for item in msg:
+                if isinstance(item, str):
+                    parts.append(item)
+                elif isinstance(item, dict) and item.get("text"):
+                    parts.append(item.get("text"))
+                else:
+                    parts.append(str(item))
+            generated_answer = " ".join(parts)
+        else:
+            generated_answer = str(msg)
+    return generated_answer
+
+def build_llm_messages(query: str, reranked_results: list) -> list:
+    """ Messages système + utilisateur (contexte numéroté) envoyés à Mistral. """
+    context = build_llm_context(reranked_results)
+    user_prompt = f"Contexte:\n{context}\n\nQuestion: {query}\n\nRéponse:"
+    return [
+        {"role": "system", "content": RAG_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt},
+    ]
+
+async def retrieve_and_rerank(user_id: str, query: str, cache_version: int) -> tuple[dict, bool]:
+    """
+    Étapes 1 à 3 (recherche vectorielle, fusion BM25, re-ranking), servies depuis
+    le cache de l'utilisateur si possible. Retourne (retrieval, cache_hit).
+    """
+    retrieval = query_cache.get(user_id, "retrieval", query)
+    if retrieval is not None:
+        print("⚡ Résultats de recherche servis depuis le cache")
+        return retrieval, True
+
+    # --- 1-2. RECHERCHE VECTORIELLE + FUSION HYBRIDE (pool de threads) ---
+    vector_results, hybrid_results = await run_blocking(retrieve_candidates, user_id, query)
+
+    # --- 3. RE-RANKING AVEC CROSSENCODER (pool de threads) ---
+    reranked_results = []
+    if vector_results['documents'][0]:
+        print("3️⃣ Re-ranking avec CrossEncoder...")
+        with time_stage("rerank"):
+            reranked_results = await run_blocking(
+                reranker.rerank,
+                query=query,
+                candidates=hybrid_results,
+                top_k=RAG_RERANK_TOP_K  # Passages gardés pour le contexte
+            )
+        print(f"✅ {len(reranked_results)} résultats re-classés")
+
+    retrieval = {
+        "vector_results": vector_results,
+        "hybrid_results": hybrid_results,
+        "reranked_results": reranked_results
+    }
+    query_cache.set(user_id, "retrieval", query, retrieval, version=cache_version)
+    return retrieval, False
+
+def empty_retrieval_answer(retrieval: dict):
+    """ Réponse à renvoyer quand la recherche ne donne aucun contexte (None sinon). """
+    if not retrieval["vector_results"]['documents'][0]:
+        print("❌ Aucun document trouvé dans ChromaDB")
+        return "Désolé, je n'ai trouvé aucune information pertinente dans les documents indexés."
+    if not retrieval["reranked_results"]:
+        return "Aucun résultat pertinent après re-ranking."
+    return None
+
+def extract_citations(reranked_results: list, answer: str) -> tuple[list, list]:
+    """ Citations avec positions précises + sources au format simplifié (legacy). """
+    print("5️⃣ Extraction des citations...")
+    with time_stage("citations"):
+        citations = citation_tracker.create_citation_objects(
+            cited_chunks=reranked_results,
+            response_text=answer
+        )
+    print(f"✅ {len(citations)} citations extraites")
+
+    sources_for_frontend = [
+        {
+            "document_name": c["document_name"],
+            "page_number": c["page_number"],
+            "content_preview": c["text"][:150] + "..."
+        }
+        for c in citations
+    ]
+    return citations, sources_for_frontend
+
+def sse_event(event: str, data) -> str:
+    """ Formate un événement Server-Sent Events (données JSON sur une ligne). """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+# ---
+
 # --- ROUTES DE L'API ---
 
 @app.get("/")
@@ -217,11 +538,14 @@ def read_root():
 @app.post("/api/v1/ocr/upload")
 async def ocr_and_ingest_document(
     file: UploadFile = File(...),
+    background: bool = Query(False), # True = retourne un job_id immédiatement
     current_user: UserTokenData = Depends(get_current_user) # Route protégée
 ):
     """
     Reçoit un PDF, extrait le texte (OCR), le découpe, crée des embeddings,
-    et sauvegarde le tout dans Supabase (DB + Storage).
+    l'indexe dans ChromaDB et sauvegarde le PDF en local.
+    Avec ?background=true, l'ingestion est confiée à la file de jobs et
+    l'avancement se suit via /api/v1/ocr/jobs/{job_id}.
     """
     print(f"Traitement du fichier: {file.filename} pour l'utilisateur: {current_user.sub}")
 
@@ -230,145 +554,85 @@ async def ocr_and_ingest_document(
 
     file_content = await file.read() # Lire le contenu binaire une seule fois
 
-    # --- 1. EXTRACTION DE TEXTE (OCR Enhanced) ---
-    full_text = ""
-    pages_text = []  # Store text per page for metadata
-    
-    try:
-        # Try digital extraction first
-        pdf_reader = PdfReader(BytesIO(file_content))
-        print(f"PDF contient {len(pdf_reader.pages)} pages (Extraction numérique).")
-        for page_num, page in enumerate(pdf_reader.pages):
-            page_text = page.extract_text()
-            if page_text and len(page_text.strip()) > 50:
-                pages_text.append((page_text, page_num + 1))  # Tuple: (text, page_number)
-                full_text += page_text + "\n\n"
-        
-        # Force OCR if extraction is too short
-        if len(full_text.strip()) < 100:
-            print("Texte numérique minimal. Forçage de l'OCR amélioré.")
-            full_text = ""
-            pages_text = []
-            raise Exception("Force OCR")
-        
-        print("Extraction numérique réussie.")
-    
-    except Exception as e:
-        print(f"Extraction numérique échouée ({e}). Passage à l'OCR amélioré avec EasyOCR.")
-        try:
-            # Convert PDF to images
-            images = convert_from_bytes(file_content, dpi=200)
-            print(f"Conversion du PDF en {len(images)} images pour l'OCR.")
-            
-            # Process each page with enhanced OCR
-            for page_num, image in enumerate(images):
-                print(f"Traitement OCR (page {page_num + 1})...")
-                # Convert PIL to numpy
-                import numpy as np
-                image_np = np.array(image)
-                
-                # Use OCRProcessor for enhanced extraction
-                page_text, confidence = ocr_processor.extract_text_from_pdf_page(
-                    image_np,
-                    preprocess=True
-                )
-                
-                if page_text:
-                    pages_text.append((page_text, page_num + 1))  # Tuple: (text, page_number)
-                    full_text += page_text + "\n\n"
-                    print(f"Page {page_num + 1}: {len(page_text)} chars, confidence: {confidence:.2f}")
-            
-            print(f"OCR terminé. Total: {len(full_text)} caractères extraits.")
-        
-        except Exception as ocr_error:
-            print(f"ERREUR OCR: {ocr_error}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Erreur OCR: {ocr_error}. Vérifiez les dépendances."
-            )
-    
-    if len(full_text.strip()) == 0:
-        raise HTTPException(
-            status_code=400,
-            detail="Aucun texte n'a pu être extrait du document."
-        )
-
-    # --- 2. SMART CHUNKING WITH METADATA ---
-    print("Découpage intelligent avec métadonnées...")
-    try:
-        # Chunk by pages with metadata
-        all_chunks_with_metadata = smart_chunker.chunk_by_pages(
-            pages=pages_text,
-            document_name=file.filename
-        )
-        
-        if not all_chunks_with_metadata:
-            raise HTTPException(
-                status_code=400,
-                detail="Le document n'a pas pu être découpé."
-            )
-        
-        print(f"Découpage terminé: {len(all_chunks_with_metadata)} chunks avec métadonnées.")
-    
-    except Exception as chunk_error:
-        print(f"Erreur découpage: {chunk_error}")
-        raise HTTPException(
-            status_code=500,
-            detail=f"Erreur lors du découpage: {chunk_error}"
+    # --- MODE ASYNCHRONE : JOB EN ARRIÈRE-PLAN ---
+    if background:
+        job_id = ingestion_queue.submit(
+            user_id=current_user.sub,
+            filename=file.filename,
+            file_content=file_content
         )
+        print(f"📥 Job d'ingestion {job_id} en file d'attente")
+        return {
+            "status": "queued",
+            "job_id": job_id,
+            "filename": file.filename,
+            "status_url": f"/api/v1/ocr/jobs/{job_id}"
+        }
 
-    # --- 3. INSERTION DANS CHROMADB ---
+    # --- MODE SYNCHRONE : EXTRACTION, DÉCOUPAGE, EMBEDDING, INDEXATION, STOCKAGE ---
     try:
-        # Extract chunks and metadata
-        chunks = [item["content"] for item in all_chunks_with_metadata]
-        metadatas = [item["metadata"] for item in all_chunks_with_metadata]
-        
-        # Add to ChromaDB (automatic embedding)
-        count = chroma_manager.add_documents(
+        result = await run_in_threadpool(
+            ingestion_pipeline.run,
             user_id=current_user.sub,
-            chunks=chunks,
-            metadatas=metadatas
+            document_name=file.filename,
+            file_content=file_content
         )
-        
-        print(f"✅ {count} chunks indexés dans ChromaDB pour l'utilisateur {current_user.sub}")
-    
-    except Exception as db_error:
-        print(f"Erreur ChromaDB: {db_error}")
+    except IngestionError as ingestion_error:
+        print(f"Erreur d'ingestion: {ingestion_error}")
         raise HTTPException(
-            status_code=500,
-            detail=f"Erreur d'indexation: {db_error}"
+            status_code=ingestion_error.status_code,
+            detail=str(ingestion_error)
         )
 
-    # --- 6. SAUVEGARDE DU PDF EN LOCAL ---
-    storage_path = None
-    try:
-        # Create user directory if needed
-        user_dir = PDF_STORAGE_DIR / current_user.sub
-        user_dir.mkdir(exist_ok=True)
-        
-        # Save PDF to local filesystem
-        file_path = user_dir / file.filename
-        with open(file_path, "wb") as f:
-            f.write(file_content)
-        
-        storage_path = f"{current_user.sub}/{file.filename}"
-        print(f"✅ PDF sauvegardé localement: {file_path}")
-        
-    except Exception as storage_error:
-        print(f"⚠️ Erreur de sauvegarde locale (non-bloquante): {storage_error}")
-        print(f"Le PDF n'a pas été sauvegardé mais reste indexé dans ChromaDB.")
-        # Don't raise - storage is optional, ChromaDB indexing is what matters
+    if result["status"] == "unchanged":
+        print(f"♻️ Document inchangé, aucune ré-indexation pour l'utilisateur {current_user.sub}")
+        message = "Document déjà indexé (contenu identique), aucun traitement nécessaire."
+    else:
+        print(f"✅ {result['chunks_indexed']} chunks indexés ({result['pages_processed']} pages traitées) pour l'utilisateur {current_user.sub}")
+        message = f"Document traité et indexé avec ChromaDB + OCR amélioré."
 
-    # --- 7. RÉPONSE AU FRONTEND ---
+    # --- RÉPONSE AU FRONTEND ---
     return {
         "status": "Succès",
+        "ingestion_status": result["status"], # indexed / updated / unchanged
         "filename": file.filename,
-        "message": f"Document traité et indexé avec ChromaDB + OCR amélioré.",
-        "chunks_indexed": count,
-        "storage_path": storage_path,
-        "storage_uploaded": storage_path is not None
+        "message": message,
+        "chunks_indexed": result["chunks_indexed"],
+        "chunks_deleted": result["chunks_deleted"],
+        "pages_processed": result["pages_processed"],
+        "extraction_method": result["extraction_method"], # digital / ocr / hybrid
+        "storage_path": result["storage_path"],
+        "storage_uploaded": result["storage_path"] is not None,
+        "timings": result["timings"]
     }
 
+# --- ENDPOINTS DE SUIVI DES JOBS D'INGESTION ---
+@app.get("/api/v1/ocr/jobs/{job_id}")
+async def get_ingestion_job(
+    job_id: str,
+    current_user: UserTokenData = Depends(get_current_user)
+):
+    """
+    Statut d'un job d'ingestion : étape courante, progression (0-1),
+    durées par étape (secondes) et résultat final.
+    """
+    job = ingestion_jobs.get(job_id)
+    if job is None or job["user_id"] != current_user.sub:
+        raise HTTPException(status_code=404, detail=f"Job non trouvé: {job_id}")
+
+    job.pop("file_path", None)
+    return job
+
+@app.get("/api/v1/ocr/jobs")
+async def list_ingestion_jobs(
+    current_user: UserTokenData = Depends(get_current_user)
+):
+    """ Liste les jobs d'ingestion récents de l'utilisateur. """
+    jobs = ingestion_jobs.list_for_user(current_user.sub)
+    for job in jobs:
+        job.pop("file_path", None)
+    return {"jobs": jobs, "total": len(jobs)}
+
 # --- ENDPOINT DE RECHERCHE RAG + GÉNÉRATION (HYBRID SEARCH + RERANKING) ---
 @app.post("/api/v1/rag/query")
 async def rag_query_with_generation(
@@ -385,96 +649,38 @@ async def rag_query_with_generation(
     print(f"🔍 Requête RAG de {current_user.sub}: {request.query}")
 
     try:
-        # --- 1. RECHERCHE VECTORIELLE (CHROMADB) ---
-        print("1️⃣ Recherche vectorielle ChromaDB...")
-        vector_results = chroma_manager.query(
-            user_id=current_user.sub,
-            query_text=request.query,
-            n_results=10  # Fetch more for reranking
-        )
-        
-        if not vector_results['documents'][0]:
-            print("❌ Aucun document trouvé dans ChromaDB")
-            return {
-                "answer": "Désolé, je n'ai trouvé aucune information pertinente dans les documents indexés.",
-                "sources": [],
-                "citations": []
-            }
-        
-        print(f"✅ Trouvé {len(vector_results['documents'][0])} résultats vectoriels")
-
-        # --- 2. RECHERCHE HYBRIDE (BM25 + VECTOR FUSION) ---
-        print("2️⃣ Fusion hybride (sémantique + mot-clé)...")
-        hybrid_results = hybrid_searcher.hybrid_search(
-            query=request.query,
-            vector_results=vector_results,
-            top_k=10
-        )
-        print(f"✅ {len(hybrid_results)} résultats fusionnés")
-
-        # --- 3. RE-RANKING AVEC CROSSENCODER ---
-        print("3️⃣ Re-ranking avec CrossEncoder...")
-        reranked_results = reranker.rerank(
-            query=request.query,
-            candidates=hybrid_results,
-            top_k=5  # Keep top 5 for context
-        )
-        print(f"✅ {len(reranked_results)} résultats re-classés")
+        # --- 0. CACHE (requête normalisée, par utilisateur) ---
+        cache_version = query_cache.version(current_user.sub)
+        if RAG_CACHE_ANSWERS:
+            cached_response = query_cache.get(current_user.sub, "answer", request.query)
+            if cached_response is not None:
+                print("⚡ Réponse servie depuis le cache")
+                RAG_QUERIES.labels(endpoint="query", cache="answer").inc()
+                cached_response["search_stats"]["cache_hit"] = "answer"
+                return cached_response
 
-        if not reranked_results:
-            return {
-                "answer": "Aucun résultat pertinent après re-ranking.",
-                "sources": [],
-                "citations": []
-            }
+        retrieval, cache_hit = await retrieve_and_rerank(current_user.sub, request.query, cache_version)
+        RAG_QUERIES.labels(endpoint="query", cache="retrieval" if cache_hit else "miss").inc()
+        vector_results = retrieval["vector_results"]
+        hybrid_results = retrieval["hybrid_results"]
+        reranked_results = retrieval["reranked_results"]
 
-        # --- 4. CONSTRUCTION DU CONTEXTE POUR LE LLM ---
-        context_parts = []
-        for i, result in enumerate(reranked_results, 1):
-            doc_name = result['metadata'].get('document_name', 'Unknown')
-            page_num = result['metadata'].get('page_number', 0)
-            content = result['document']
-            context_parts.append(f"[{i}] Source: {doc_name} (page {page_num})\n{content}")
-        
-        context = "\n\n---\n\n".join(context_parts)
+        empty_answer = empty_retrieval_answer(retrieval)
+        if empty_answer is not None:
+            return {"answer": empty_answer, "sources": [], "citations": []}
 
-        # --- 5. GÉNÉRATION AVEC MISTRAL ---
+        # --- 4-5. CONTEXTE + GÉNÉRATION AVEC MISTRAL (client asynchrone) ---
         print("4️⃣ Génération de la réponse avec Mistral...")
-        system_prompt = """Tu es un assistant expert en maintenance industrielle. 
-Réponds à la question en te basant STRICTEMENT sur le contexte fourni. 
-Cite tes sources en utilisant [1], [2], etc. qui correspondent aux numéros dans le contexte.
-Sois concis et précis. Si l'information n'est pas dans le contexte, dis-le clairement."""
-
-        user_prompt = f"Contexte:\n{context}\n\nQuestion: {request.query}\n\nRéponse:"
-
         try:
-            chat_response = mistral_client.chat.complete(
-                model="mistral-small-latest",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=0.2,
-                max_tokens=500,
-            )
+            with time_stage("llm"):
+                chat_response = await mistral_client.chat.complete_async(
+                    model="mistral-small-latest",
+                    messages=build_llm_messages(request.query, reranked_results),
+                    temperature=0.2,
+                    max_tokens=500,
+                )
 
-            generated_answer = ""
-            if chat_response and getattr(chat_response, "choices", None):
-                msg = chat_response.choices[0].message.content
-                if isinstance(msg, str):
-                    generated_answer = msg
-                elif isinstance(msg, list):
-                    parts = []
-                    for item in msg:
-                        if isinstance(item, str):
-                            parts.append(item)
-                        elif isinstance(item, dict) and item.get("text"):
-                            parts.append(item.get("text"))
-                        else:
-                            parts.append(str(item))
-                    generated_answer = " ".join(parts)
-                else:
-                    generated_answer = str(msg)
+            generated_answer = extract_answer_text(chat_response)
 
             print("✅ Réponse générée par Mistral")
         
@@ -486,26 +692,11 @@ Sois concis et précis. Si l'information n'est pas dans le contexte, dis-le clai
             )
 
         # --- 6. TRAITEMENT DES CITATIONS AVEC POSITIONS PRÉCISES ---
-        print("5️⃣ Extraction des citations...")
-        citations = citation_tracker.create_citation_objects(
-            cited_chunks=reranked_results,
-            response_text=generated_answer
-        )
-        
-        print(f"✅ {len(citations)} citations extraites")
+        citations, sources_for_frontend = extract_citations(reranked_results, generated_answer)
 
         # --- 7. FORMATER LA RÉPONSE COMPLÈTE ---
-        # Sources pour compatibilité (format simplifié)
-        sources_for_frontend = [
-            {
-                "document_name": c["document_name"],
-                "page_number": c["page_number"],
-                "content_preview": c["text"][:150] + "..."
-            }
-            for c in citations
-        ]
 
-        return {
+        response = {
             "answer": generated_answer.strip(),
             "sources": sources_for_frontend,  # Format legacy
             "citations": citations,  # Format enrichi avec char_start/char_end
@@ -513,10 +704,16 @@ Sois concis et précis. Si l'information n'est pas dans le contexte, dis-le clai
             "search_stats": {
                 "vector_results": len(vector_results['documents'][0]),
                 "hybrid_results": len(hybrid_results),
-                "reranked_results": len(reranked_results)
+                "reranked_results": len(reranked_results),
+                "cache_hit": "retrieval" if cache_hit else None
             }
         }
 
+        if RAG_CACHE_ANSWERS:
+            query_cache.set(current_user.sub, "answer", request.query, response, version=cache_version)
+
+        return response
+
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
@@ -528,6 +725,124 @@ Sois concis et précis. Si l'information n'est pas dans le contexte, dis-le clai
             detail=f"Erreur interne: {str(e)}"
         )
 
+# --- ENDPOINT RAG EN STREAMING (SERVER-SENT EVENTS) ---
+@app.post("/api/v1/rag/query/stream")
+async def rag_query_stream(
+    request: QueryRequest,
+    current_user: UserTokenData = Depends(get_current_user)
+):
+    """
+    Variante streaming de /api/v1/rag/query (text/event-stream) :
+    - event "retrieval" : passages retenus, dès la fin du re-ranking
+    - event "token"     : morceaux de la réponse Mistral au fil de l'eau
+    - event "citations" : citations extraites de la réponse complète
+    - event "done"      : fin du flux ("error" en cas d'échec)
+    """
+    print(f"🔍 Requête RAG (stream) de {current_user.sub}: {request.query}")
+
+    # Recherche avant l'ouverture du flux : les erreurs remontent en HTTP classique
+    try:
+        cache_version = query_cache.version(current_user.sub)
+        retrieval, cache_hit = await retrieve_and_rerank(current_user.sub, request.query, cache_version)
+        RAG_QUERIES.labels(endpoint="stream", cache="retrieval" if cache_hit else "miss").inc()
+    except Exception as e:
+        print(f"❌ Erreur RAG: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur interne: {str(e)}")
+
+    vector_results = retrieval["vector_results"]
+    hybrid_results = retrieval["hybrid_results"]
+    reranked_results = retrieval["reranked_results"]
+
+    async def event_stream():
+        yield sse_event("retrieval", {
+            "passages": [
+                {
+                    "citation_number": i,
+                    "document_name": r["metadata"].get("document_name", "Unknown"),
+                    "page_number": r["metadata"].get("page_number", 0),
+                    "content_preview": r["document"][:150] + "..."
+                }
+                for i, r in enumerate(reranked_results, 1)
+            ],
+            "search_stats": {
+                "vector_results": len(vector_results['documents'][0]),
+                "hybrid_results": len(hybrid_results),
+                "reranked_results": len(reranked_results),
+                "cache_hit": "retrieval" if cache_hit else None
+            }
+        })
+
+        empty_answer = empty_retrieval_answer(retrieval)
+        if empty_answer is not None:
+            yield sse_event("token", {"text": empty_answer})
+            yield sse_event("citations", {"citations": [], "sources": [], "citation_count": 0})
+            yield sse_event("done", {})
+            return
+
+        print("4️⃣ Génération de la réponse avec Mistral (stream)...")
+        answer_parts = []
+        llm_start = time.perf_counter()
+        try:
+            stream = await mistral_client.chat.stream_async(
+                model="mistral-small-latest",
+                messages=build_llm_messages(request.query, reranked_results),
+                temperature=0.2,
+                max_tokens=500,
+            )
+            async for chunk in stream:
+                choices = chunk.data.choices
+                delta = choices[0].delta.content if choices else None
+                if not delta:
+                    continue
+                if not isinstance(delta, str):
+                    delta = "".join(getattr(part, "text", "") or "" for part in delta)
+                if not answer_parts:
+                    RAG_STAGE_SECONDS.labels(stage="llm_first_token").observe(time.perf_counter() - llm_start)
+                answer_parts.append(delta)
+                yield sse_event("token", {"text": delta})
+        except Exception as mistral_error:
+            print(f"❌ Erreur Mistral: {mistral_error}")
+            yield sse_event("error", {"detail": f"Erreur de génération: {mistral_error}"})
+            return
+        RAG_STAGE_SECONDS.labels(stage="llm").observe(time.perf_counter() - llm_start)
+
+        print("✅ Réponse générée par Mistral")
+        citations, sources_for_frontend = extract_citations(reranked_results, "".join(answer_parts))
+        yield sse_event("citations", {
+            "citations": citations,
+            "sources": sources_for_frontend,
+            "citation_count": len(citations)
+        })
+        yield sse_event("done", {})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# --- ENDPOINT PROMETHEUS ---
+@app.get("/metrics")
+def prometheus_metrics():
+    """ Métriques Prometheus : durées par étape RAG, OCR par page, chunks, embeddings. """
+    payload, content_type = render_latest()
+    return Response(content=payload, media_type=content_type)
+
+# --- ENDPOINT DE STATISTIQUES DES CACHES RAG ---
+@app.get("/api/v1/rag/stats")
+async def rag_cache_stats(
+    current_user: UserTokenData = Depends(get_admin_user)
+):
+    """ Compteurs hits/misses des caches (embeddings et résultats de recherche), pour tout le processus : admins uniquement. """
+    return {
+        "vector_store": chroma_manager.store.name,
+        "embedding_cache": chroma_manager.embedding_cache_stats(),
+        "query_cache": query_cache.stats(),
+        "rerank_cache": reranker.cache_stats(),
+        "embed_batching": chroma_manager.query_batcher.stats() if chroma_manager.query_batcher else None,
+        "rerank_batching": reranker.batcher.stats() if reranker.batcher else None
+    }
+
 # --- ENDPOINT DE PRÉVISION PDR (MACHINE LEARNING) ---
 @app.post("/api/v1/pdr/forecast")
 async def forecast_pdr_endpoint(
@@ -638,6 +953,8 @@ async def list_stored_documents(
 ):
     """
     Liste tous les PDFs stockés pour l'utilisateur avec leurs métadonnées
+    (lecture du manifeste des documents, sans parcourir ChromaDB ; les PDFs
+    stockés absents du manifeste sont listés avec 0 chunk)
     """
     try:
         user_dir = PDF_STORAGE_DIR / current_user.sub
@@ -646,29 +963,48 @@ async def list_stored_documents(
             return {"documents": []}
         
         documents = []
+        entries = await run_blocking(chroma_manager.list_document_entries, current_user.sub)
         
-        # Parcourir tous les PDFs de l'utilisateur
-        for pdf_file in user_dir.glob("*.pdf"):
-            file_stat = pdf_file.stat()
+        for entry in entries:
+            pdf_file = user_dir / entry["document_name"]
+            if not pdf_file.exists():
+                continue
             
-            # Compter les chunks dans ChromaDB
-            chunk_count = 0
-            try:
-                collection = chroma_manager.get_or_create_collection(current_user.sub)
-                results = collection.get(
-                    where={"document_name": pdf_file.name},
-                    include=["metadatas"]
-                )
-                chunk_count = len(results['ids']) if results['ids'] else 0
-            except Exception as e:
-                print(f"Erreur comptage chunks pour {pdf_file.name}: {e}")
+            size = entry["size_bytes"]
+            uploaded_at = entry["updated_at"]
+            if size is None:
+                # Document indexé avant le manifeste : taille et date du fichier stocké
+                file_stat = pdf_file.stat()
+                size = file_stat.st_size
+                uploaded_at = file_stat.st_mtime
             
+            documents.append({
+                "filename": entry["document_name"],
+                "size": size,
+                "size_mb": round(size / (1024 * 1024), 2),
+                "uploaded_at": uploaded_at,
+                "chunk_count": entry["chunk_count"],
+                "page_count": entry["page_count"],
+                "document_hash": entry["document_hash"],
+                "extraction_method": entry["extraction_method"],
+                "url": f"/api/v1/pdf/{current_user.sub}/{entry['document_name']}"
+            })
+        
+        # PDFs stockés sans ligne dans le manifeste (antérieurs au manifeste ou non indexés)
+        listed = {entry["document_name"] for entry in entries}
+        for pdf_file in user_dir.glob("*.pdf"):
+            if pdf_file.name in listed:
+                continue
+            file_stat = pdf_file.stat()
             documents.append({
                 "filename": pdf_file.name,
                 "size": file_stat.st_size,
                 "size_mb": round(file_stat.st_size / (1024 * 1024), 2),
                 "uploaded_at": file_stat.st_mtime,
-                "chunk_count": chunk_count,
+                "chunk_count": 0,
+                "page_count": None,
+                "document_hash": None,
+                "extraction_method": None,
                 "url": f"/api/v1/pdf/{current_user.sub}/{pdf_file.name}"
             })
         
@@ -694,10 +1030,12 @@ async def list_stored_documents(
 @app.delete("/api/v1/documents/{filename}")
 async def delete_document(
     filename: str,
+    compact: bool = Query(False),
     current_user: UserTokenData = Depends(get_current_user)
 ):
     """
     Supprime un PDF et tous ses vecteurs associés dans ChromaDB
+    (compact=true : récupère l'espace disque en arrière-plan)
     """
     try:
         print(f"\n{'='*60}")
@@ -708,9 +1046,11 @@ async def delete_document(
         
         # 1. Supprimer les vecteurs de ChromaDB
         print(f"Étape 1: Suppression des vecteurs dans ChromaDB...")
-        deleted_chunks = chroma_manager.delete_by_document(
+        deleted_chunks = await run_blocking(
+            chroma_manager.delete_by_document,
             user_id=current_user.sub,
-            document_name=filename
+            document_name=filename,
+            compact=compact
         )
         
         if deleted_chunks > 0:
@@ -757,7 +1097,4 @@ async def delete_document(
         )
 
 # --- Lancement du serveur Uvicorn ---
-if __name__ == "__main__":
-    # S'exécute quand on lance 'python main.py'
-    # Utilise le port 8000 par défaut et active le rechargement automatique (--reload)
-    uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
+# `python serve.py` (ou `python main.py`, qui y délègue en tête de fichier) ou `uvicorn main:app`
@@ -3,18 +3,74 @@ RAG Module Package
 Provides advanced Retrieval-Augmented Generation capabilities with ChromaDB
 """
 
-from .chroma_manager import ChromaManager
-from .chunking import SmartChunker
-from .hybrid_search import HybridSearcher
-from .reranker import CrossEncoderReranker
-from .citation_tracker import CitationTracker
-from .ocr_processor import OCRProcessor
+import importlib
+
+# Submodules are imported on first attribute access (PEP 562): importing
+# rag.ocr_processor in an OCR worker process must not load ChromaDB,
+# sentence-transformers or spaCy
+_EXPORTS = {
+    "ChromaManager": "chroma_manager",
+    "VectorStore": "vector_store",
+    "ChromaVectorStore": "chroma_store",
+    "NumpyVectorStore": "numpy_store",
+    "SmartChunker": "chunking",
+    "HybridSearcher": "hybrid_search",
+    "retrieve_candidates": "retrieval",
+    "LexicalIndex": "lexical_index",
+    "LexicalIndexManager": "lexical_index",
+    "EmbeddingCache": "embedding_cache",
+    "CachedEmbeddingFunction": "embedding_cache",
+    "QueryResultCache": "query_cache",
+    "DocumentManifest": "document_manifest",
+    "StoreLock": "store_lock",
+    "StoreLockedError": "store_lock",
+    "MicroBatcher": "batching",
+    "CrossEncoderReranker": "reranker",
+    "CitationTracker": "citation_tracker",
+    "OCRProcessor": "ocr_processor",
+    "ParallelOCREngine": "ocr_processor",
+    "IngestionPipeline": "ingestion",
+    "IngestionError": "ingestion",
+    "IngestionJobStore": "ingestion_jobs",
+    "IngestionJobQueue": "ingestion_jobs",
+}
 
 __all__ = [
     "ChromaManager",
+    "VectorStore",
+    "ChromaVectorStore",
+    "NumpyVectorStore",
     "SmartChunker",
     "HybridSearcher",
+    "retrieve_candidates",
+    "LexicalIndex",
+    "LexicalIndexManager",
+    "EmbeddingCache",
+    "CachedEmbeddingFunction",
+    "QueryResultCache",
+    "DocumentManifest",
+    "StoreLock",
+    "StoreLockedError",
+    "MicroBatcher",
     "CrossEncoderReranker",
     "CitationTracker",
     "OCRProcessor",
+    "ParallelOCREngine",
+    "IngestionPipeline",
+    "IngestionError",
+    "IngestionJobStore",
+    "IngestionJobQueue",
 ]
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,148 @@
+"""
+Micro-Batching Module
+Groups small model calls from concurrent requests into one forward pass
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Any, Dict, Optional, Sequence
+
+from .metrics import MICRO_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """
+    Collects inputs submitted by concurrent threads for up to max_wait_ms,
+    runs them through batch_fn in one call and hands each caller its slice
+    of the outputs
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 3.0,
+        name: str = "micro-batcher"
+    ):
+        """
+        Initialize micro-batcher
+
+        Args:
+            batch_fn: Function mapping a list of inputs to one output per input
+                      (e.g. embedding function, CrossEncoder.predict)
+            max_batch_size: Inputs per call; a batch closes early once reached
+            max_wait_ms: How long the first request of a batch waits for others
+            name: Worker thread name
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self.batches = 0
+        self.items = 0
+        self.requests = 0
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self._thread.start()
+
+    def submit(self, inputs: List[Any]) -> List[Any]:
+        """
+        Run inputs through batch_fn, batched with other callers' inputs
+
+        Args:
+            inputs: Inputs of this request
+
+        Returns:
+            One output per input, in order (batch_fn errors are re-raised)
+        """
+        if not inputs:
+            return []
+
+        future: Future = Future()
+        self._ensure_worker()
+        self._queue.put((list(inputs), future))
+        return future.result()
+
+    def _collect(self, first) -> tuple:
+        """Gather requests until the window closes or the batch is full"""
+        batch = [first]
+        size = len(first[0])
+        stop = False
+        deadline = time.monotonic() + self.max_wait
+
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is _STOP:
+                stop = True
+                break
+            batch.append(request)
+            size += len(request[0])
+
+        return batch, stop
+
+    def _loop(self):
+        """Worker thread: one batch_fn call per collected batch"""
+        stop = False
+        while not stop:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch, stop = self._collect(first)
+
+            inputs = [item for request_inputs, _ in batch for item in request_inputs]
+            try:
+                outputs = list(self.batch_fn(inputs))
+                if len(outputs) != len(inputs):
+                    raise ValueError(f"{self.name}: expected {len(inputs)} outputs, got {len(outputs)}")
+            except Exception as e:
+                logger.error(f"{self.name}: batch of {len(inputs)} failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for request_inputs, future in batch:
+                future.set_result(outputs[offset:offset + len(request_inputs)])
+                offset += len(request_inputs)
+
+            MICRO_BATCH_SIZE.labels(batcher=self.name).observe(len(inputs))
+            self.batches += 1
+            self.items += len(inputs)
+            self.requests += len(batch)
+
+    def shutdown(self):
+        """Stop the worker thread once queued requests are served"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                self._queue.put(_STOP)
+                self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Batch counters"""
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "mean_requests_per_batch": self.requests / self.batches if self.batches else 0.0
+        }
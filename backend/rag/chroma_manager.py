@@ -3,59 +3,142 @@ ChromaDB Manager
 Handles all vector database operations with ChromaDB
 """
 
-import chromadb
-from chromadb.config import Settings
 from chromadb.utils import embedding_functions
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import logging
-import os
+import threading
+import time
 from pathlib import Path
 
+from .lexical_index import LexicalIndex, LexicalIndexManager, tokenize
+from .embedding_cache import EmbeddingCache, CachedEmbeddingFunction
+from .query_cache import QueryResultCache
+from .batching import MicroBatcher
+from .document_manifest import DocumentManifest
+from .metrics import CHUNKS_INDEXED, EMBEDDINGS
+from .vector_store import VectorStore
+from .chroma_store import ChromaVectorStore
+
 logger = logging.getLogger(__name__)
 
 
 class ChromaManager:
-    """Manages ChromaDB collections and operations"""
+    """Manages the vector store (ChromaDB by default), BM25 index and manifest of each user"""
     
     def __init__(
         self,
         persist_directory: str = "./chroma_db",
         collection_name: str = "documents",
-        embedding_model: str = "all-MiniLM-L6-v2"
+        embedding_model: str = "all-MiniLM-L6-v2",
+        lexical_index: Optional[LexicalIndexManager] = None,
+        use_embedding_cache: bool = True,
+        embedding_cache_directory: Optional[str] = None,
+        query_cache: Optional[QueryResultCache] = None,
+        batch_window_ms: float = 0.0,
+        manifest: Optional[DocumentManifest] = None,
+        hnsw_config: Optional[Dict[str, Any]] = None,
+        vector_store: Optional[VectorStore] = None
     ):
         """
         Initialize ChromaDB manager
         
         Args:
-            persist_directory: Path to persist ChromaDB data
+            persist_directory: Path to persist ChromaDB data (ignored if
+                               vector_store is passed: its directory is used)
             collection_name: Name of the collection
             embedding_model: SentenceTransformer model name
+            lexical_index: BM25 index manager kept in sync with the collections
+                           (defaults to one persisted next to the store directory)
+            use_embedding_cache: Reuse embeddings stored on disk by (model, text hash)
+            embedding_cache_directory: Directory of that cache (defaults to
+                                       <persist_directory>_embeddings whatever the
+                                       backend: embeddings only depend on model and text)
+            query_cache: Query result cache invalidated when a user's chunks change
+            batch_window_ms: Micro-batching window for query embeddings of
+                             concurrent requests (0 = embed each query alone)
+            manifest: Per-user document table (defaults to a SQLite file next
+                      to the store directory)
+            hnsw_config: HNSW settings of new ChromaDB collections, keys from
+                         rag.chroma_store.HNSW_METADATA_KEYS (e.g. {"space": "cosine", "M": 32});
+                         search_ef is also applied to existing collections
+            vector_store: Storage backend (defaults to a ChromaVectorStore in
+                          persist_directory); the BM25 index and manifest
+                          live next to the store's directory
         """
-        self.persist_directory = Path(persist_directory)
-        self.persist_directory.mkdir(parents=True, exist_ok=True)
-        
-        # Initialize ChromaDB client with persistence
-        self.client = chromadb.PersistentClient(
-            path=str(self.persist_directory),
-            settings=Settings(
-                anonymized_telemetry=False,
-                allow_reset=True
-            )
-        )
-        
         # Create embedding function (SentenceTransformer)
         self.embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
             model_name=embedding_model
         )
         
+        self.embedding_model = embedding_model
         self.collection_name = collection_name
-        self.collection = None
         
-        logger.info(f"ChromaDB initialized at {self.persist_directory}")
+        # Embeddings are passed explicitly, the store never calls the model
+        if vector_store is None:
+            vector_store = ChromaVectorStore(
+                persist_directory=persist_directory,
+                collection_name=collection_name,
+                embedding_function=self.embedding_function,
+                hnsw_config=hnsw_config
+            )
+        elif hnsw_config:
+            logger.warning(f"hnsw_config ignored: vector store '{vector_store.name}' passed explicitly")
+        self.store = vector_store
+        
+        # Derived files follow the active store, so switching backends starts
+        # from an empty manifest/BM25 index (rebuilt from the store) instead of
+        # ones describing the other backend's chunks
+        self.persist_directory = Path(vector_store.persist_directory)
+        self.persist_directory.mkdir(parents=True, exist_ok=True)
+        # Held by the one process writing these files (API or bulk ingestion, see rag.store_lock)
+        self.lock_path = self.persist_directory / "writer.lock"
+        
+        # Embeddings are computed here (not by ChromaDB) so they can be cached
+        self.embedding_cache = None
+        self.embedder = self.embedding_function
+        if use_embedding_cache:
+            self.embedding_cache = EmbeddingCache(
+                cache_directory=embedding_cache_directory or f"{Path(persist_directory)}_embeddings",
+                model_name=embedding_model
+            )
+            self.embedder = CachedEmbeddingFunction(self.embedding_function, self.embedding_cache)
+        
+        # Persistent BM25 index, stored next to the store's directory
+        if lexical_index is None:
+            lexical_index = LexicalIndexManager(
+                persist_directory=str(self.persist_directory.with_name(f"{self.persist_directory.name}_bm25")),
+                collection_name=collection_name
+            )
+        self.lexical_index = lexical_index
+        self.query_cache = query_cache
+        
+        # Document manifest: listing and fingerprints without scanning the collection
+        if manifest is None:
+            manifest = DocumentManifest(
+                db_path=str(self.persist_directory.with_name(f"{self.persist_directory.name}_manifest.db"))
+            )
+        self.manifest = manifest
+        self._manifest_sync_lock = threading.Lock()
+        
+        # Background compaction after large deletes (one run at a time)
+        self._compaction_lock = threading.Lock()
+        self._compaction_thread: Optional[threading.Thread] = None
+
+        # Query embeddings of concurrent requests share one forward pass
+        self.query_batcher = None
+        if batch_window_ms > 0:
+            self.query_batcher = MicroBatcher(
+                self.embed_documents,
+                max_batch_size=64,
+                max_wait_ms=batch_window_ms,
+                name="embed-batcher"
+            )
+        
+        logger.info(f"Vector store '{self.store.name}' initialized ({self.persist_directory})")
     
-    def get_or_create_collection(self, user_id: str) -> chromadb.Collection:
+    def get_or_create_collection(self, user_id: str):
         """
-        Get or create a collection for a specific user
+        ChromaDB collection of a user (ChromaDB backend only)
         
         Args:
             user_id: User identifier for collection isolation
@@ -63,26 +146,136 @@ class ChromaManager:
         Returns:
             ChromaDB collection
         """
-        collection_name = f"{self.collection_name}_{user_id}"
+        if not isinstance(self.store, ChromaVectorStore):
+            raise TypeError(f"No ChromaDB collections with the '{self.store.name}' vector store")
+        return self.store.get_or_create_collection(user_id)
+    
+    def list_user_ids(self) -> List[str]:
+        """Users that have a collection"""
+        return self.store.list_user_ids()
+    
+    def get_index_config(self, user_id: str) -> Dict[str, Any]:
+        """Index settings of a user's collection (HNSW settings with ChromaDB)"""
+        return self.store.index_config(user_id)
+    
+    def warmup(
+        self,
+        user_ids: Optional[List[str]] = None,
+        max_collections: Optional[int] = None
+    ) -> Dict[str, float]:
+        """
+        Load vector indexes (and BM25 matrices) into memory ahead of the first query
+        
+        ChromaDB reads a collection's HNSW index from disk on its first query;
+        one dummy query per collection moves that cost to startup.
+        
+        Args:
+            user_ids: Users to warm up (all collections if None)
+            max_collections: Only warm up the largest N collections
+            
+        Returns:
+            Seconds spent per user
+        """
+        if user_ids is None:
+            user_ids = self.list_user_ids()
+        
+        sizes = {}
+        for user_id in user_ids:
+            try:
+                sizes[user_id] = self.store.count(user_id)
+            except Exception as e:
+                logger.warning(f"Warmup: cannot open collection of user {user_id}: {e}")
+        targets = sorted((u for u in sizes if sizes[u] > 0), key=sizes.get, reverse=True)
+        if max_collections is not None:
+            targets = targets[:max_collections]
+        if not targets:
+            return {}
+        
+        # Also loads the embedding model
+        embedding = self.embed_query("warmup")
         
+        timings = {}
+        for user_id in targets:
+            start = time.perf_counter()
+            try:
+                self.store.warmup(user_id, embedding)
+                self.get_lexical_index(user_id)
+                self.lexical_index.search(user_id, "warmup", top_k=1)
+            except Exception as e:
+                logger.warning(f"Warmup failed for user {user_id}: {e}")
+                continue
+            timings[user_id] = time.perf_counter() - start
+            logger.info(f"Warmed up collection of user {user_id} ({sizes[user_id]} chunks) in {timings[user_id]:.2f}s")
+        return timings
+    
+    def rebuild_collection(
+        self,
+        user_id: str,
+        hnsw_config: Optional[Dict[str, Any]] = None,
+        batch_size: int = 1000
+    ) -> int:
+        """
+        Rebuild a user's vector index with new settings (HNSW space, construction_ef,
+        M... with ChromaDB; compaction of the shard with the NumPy backend)
+        
+        Ids are unchanged, so the BM25 index and the manifest stay valid. With
+        ChromaDB, this user's writes wait for the end of the copy (see
+        ChromaVectorStore.rebuild).
+        
+        Args:
+            user_id: User identifier
+            hnsw_config: Index settings (merged over the store's defaults)
+            batch_size: Chunks copied per batch
+            
+        Returns:
+            Number of chunks in the rebuilt index
+        """
         try:
-            self.collection = self.client.get_or_create_collection(
-                name=collection_name,
-                embedding_function=self.embedding_function,
-                metadata={"user_id": user_id, "description": "Document chunks for RAG"}
-            )
-            logger.info(f"Collection '{collection_name}' ready ({self.collection.count()} documents)")
-            return self.collection
-        except Exception as e:
-            logger.error(f"Error getting/creating collection: {e}")
-            raise
+            return self.store.rebuild(user_id, hnsw_config, batch_size=batch_size)
+        finally:
+            self._invalidate_query_cache(user_id)
+    
+    def _invalidate_query_cache(self, user_id: str):
+        """Drop cached query results once a user's chunks changed"""
+        if self.query_cache is not None:
+            self.query_cache.invalidate(user_id)
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Compute embeddings with the collection's embedding function
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            One embedding per text
+        """
+        if not texts:
+            return []
+        if self.embedding_cache is None:
+            EMBEDDINGS.labels(source="model").inc(len(texts))
+        return [list(map(float, e)) for e in self.embedder(texts)]
+
+    def embed_query(self, query_text: str) -> List[float]:
+        """Embedding of a search query (micro-batched with concurrent queries if enabled)"""
+        if self.query_batcher is not None:
+            return self.query_batcher.submit([query_text])[0]
+        return self.embed_documents([query_text])[0]
+    
+    def embedding_cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of the embedding cache"""
+        if self.embedding_cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.embedding_cache.stats()}
     
     def add_documents(
         self,
         user_id: str,
         chunks: List[str],
         metadatas: List[Dict[str, Any]],
-        ids: Optional[List[str]] = None
+        ids: Optional[List[str]] = None,
+        embeddings: Optional[List[List[float]]] = None,
+        tokens: Optional[List[List[str]]] = None
     ) -> int:
         """
         Add document chunks to the collection
@@ -92,12 +285,12 @@ class ChromaManager:
             chunks: List of text chunks
             metadatas: List of metadata dicts for each chunk
             ids: Optional list of unique IDs (auto-generated if None)
+            embeddings: Optional precomputed embeddings (computed via the cache if None)
+            tokens: Optional BM25 terms of each chunk (rag.text_analysis.analyze)
             
         Returns:
             Number of chunks added
         """
-        collection = self.get_or_create_collection(user_id)
-        
         if not chunks:
             logger.warning("No chunks to add")
             return 0
@@ -107,17 +300,37 @@ class ChromaManager:
             import uuid
             ids = [str(uuid.uuid4()) for _ in chunks]
         
+        if embeddings is None:
+            embeddings = self.embed_documents(chunks)
+        
         try:
-            collection.add(
-                documents=chunks,
-                metadatas=metadatas,
-                ids=ids
-            )
+            # upsert: deterministic ids make re-ingestion idempotent
+            self.store.upsert(user_id, ids, embeddings, chunks, metadatas)
+            CHUNKS_INDEXED.labels(operation="added").inc(len(chunks))
             logger.info(f"Added {len(chunks)} chunks to collection")
-            return len(chunks)
         except Exception as e:
             logger.error(f"Error adding documents: {e}")
             raise
+        finally:
+            self._invalidate_query_cache(user_id)
+        
+        # Keep the manifest in sync for direct callers (IngestionPipeline then
+        # records the authoritative row)
+        try:
+            self._merge_into_manifest(user_id, ids, metadatas)
+        except Exception as e:
+            logger.error(f"Error updating document manifest: {e}")
+        
+        # Keep the lexical index in sync (it can be rebuilt from ChromaDB if this fails)
+        try:
+            if self.lexical_index.exists(user_id):
+                self.lexical_index.add_documents(user_id, chunks, ids, tokens=tokens)
+            else:
+                self.rebuild_lexical_index(user_id)
+        except Exception as e:
+            logger.error(f"Error updating lexical index: {e}")
+        
+        return len(chunks)
     
     def query(
         self,
@@ -140,15 +353,13 @@ class ChromaManager:
         Returns:
             Query results with documents, metadatas, distances
         """
-        collection = self.get_or_create_collection(user_id)
-        
         try:
-            results = collection.query(
-                query_texts=[query_text],
+            results = self.store.query(
+                user_id,
+                self.embed_query(query_text),
                 n_results=n_results,
                 where=where,
-                where_document=where_document,
-                include=["documents", "metadatas", "distances"]
+                where_document=where_document
             )
             
             logger.info(f"Query returned {len(results['documents'][0])} results")
@@ -157,78 +368,339 @@ class ChromaManager:
             logger.error(f"Error querying collection: {e}")
             raise
     
-    def delete_by_document(self, user_id: str, document_name: str) -> int:
+    def get_document_fingerprint(self, user_id: str, document_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the content hashes stored with an indexed document
+        
+        Args:
+            user_id: User identifier
+            document_name: Name of the document
+            
+        Returns:
+            None if the document is not indexed, else
+            {"document_hash": str|None, "pages": {page_number: {"page_hash": str|None, "ids": [...]}}}
+        """
+        self.sync_manifest(user_id)
+        document = self.manifest.get(user_id, document_name)
+        if document is None:
+            return None
+        return {"document_hash": document["document_hash"], "pages": document["pages"]}
+    
+    def sync_manifest(self, user_id: str, force: bool = False) -> int:
+        """
+        Build a user's manifest rows from the collection metadata (once per
+        user, for collections indexed before the manifest existed)
+        
+        Args:
+            user_id: User identifier
+            force: Rebuild even if the user was already synced
+            
+        Returns:
+            Number of documents found (0 if nothing was rebuilt)
+        """
+        if not force and self.manifest.is_synced(user_id):
+            return 0
+        
+        with self._manifest_sync_lock:
+            if not force and self.manifest.is_synced(user_id):
+                return 0
+            
+            results = self.store.get(user_id, include=["metadatas"])
+            
+            documents: Dict[str, Dict[str, Any]] = {}
+            for chunk_id, metadata in zip(results['ids'], results['metadatas']):
+                document_name = metadata.get("document_name")
+                if not document_name:
+                    continue
+                document = documents.setdefault(document_name, {"document_hash": None, "pages": {}})
+                document["document_hash"] = document["document_hash"] or metadata.get("document_hash")
+                page = document["pages"].setdefault(
+                    metadata.get("page_number", 0),
+                    {"page_hash": metadata.get("page_hash"), "ids": []}
+                )
+                page["ids"].append(chunk_id)
+            
+            self.manifest.delete_user(user_id)
+            for document_name, document in documents.items():
+                self.manifest.upsert(user_id, document_name, document["document_hash"], document["pages"])
+            self.manifest.mark_synced(user_id)
+            
+            logger.info(f"Manifest rebuilt for user {user_id} ({len(documents)} documents)")
+            return len(documents)
+    
+    def _merge_into_manifest(self, user_id: str, ids: List[str], metadatas: List[Dict[str, Any]]):
+        """
+        Add chunk ids to the manifest rows of their documents
+        
+        A document's hash is kept only if every added chunk carries it, so a
+        partially written document is never reported as unchanged.
+        """
+        if not self.manifest.is_synced(user_id):
+            # The one-time sync will read these chunks from the store
+            return
+        
+        added: Dict[str, Dict[int, List[Any]]] = {}
+        for chunk_id, metadata in zip(ids, metadatas):
+            document_name = metadata.get("document_name")
+            if document_name:
+                added.setdefault(document_name, {}).setdefault(
+                    metadata.get("page_number", 0), []
+                ).append((chunk_id, metadata))
+        
+        for document_name, pages_added in added.items():
+            document = self.manifest.get(user_id, document_name)
+            pages = document["pages"] if document else {}
+            hashes = set()
+            for page_number, entries in pages_added.items():
+                page = pages.setdefault(page_number, {"page_hash": None, "ids": []})
+                known = set(page["ids"])
+                for chunk_id, metadata in entries:
+                    hashes.add(metadata.get("document_hash"))
+                    page["page_hash"] = metadata.get("page_hash", page["page_hash"])
+                    if chunk_id not in known:
+                        page["ids"].append(chunk_id)
+                        known.add(chunk_id)
+            
+            document_hash = hashes.pop() if len(hashes) == 1 else None
+            if document and document["document_hash"] not in (None, document_hash):
+                document_hash = None
+            self.manifest.upsert(
+                user_id, document_name, document_hash, pages,
+                extraction_method=document["extraction_method"] if document else None
+            )
+    
+    def record_document(
+        self,
+        user_id: str,
+        document_name: str,
+        document_hash: str,
+        pages: Dict[int, Dict[str, Any]],
+        extraction_method: Optional[str] = None,
+        size_bytes: Optional[int] = None,
+        storage_path: Optional[str] = None
+    ):
+        """
+        Record an ingested document in the manifest
+        
+        Args:
+            user_id: User identifier
+            document_name: Name of the document
+            document_hash: Hash of the whole file
+            pages: {page_number: {"page_hash": str, "ids": [chunk ids]}} for every page
+            extraction_method: digital / ocr / hybrid
+            size_bytes: File size
+            storage_path: Relative path of the stored PDF
+        """
+        self.sync_manifest(user_id)
+        self.manifest.upsert(
+            user_id, document_name, document_hash, pages,
+            extraction_method=extraction_method,
+            size_bytes=size_bytes,
+            storage_path=storage_path
+        )
+    
+    def list_document_entries(self, user_id: str) -> List[Dict[str, Any]]:
+        """Manifest rows of a user's documents (chunk/page counts, hashes, timestamps)"""
+        self.sync_manifest(user_id)
+        return self.manifest.list_for_user(user_id)
+    
+    def delete_chunks(self, user_id: str, ids: List[str]) -> int:
+        """
+        Delete chunks by id (vector store and lexical index)
+        
+        Args:
+            user_id: User identifier
+            ids: Chunk IDs to delete
+            
+        Returns:
+            Number of chunks deleted
+        """
+        if not ids:
+            return 0
+        
+        try:
+            self.store.delete(user_id, ids)
+            CHUNKS_INDEXED.labels(operation="deleted").inc(len(ids))
+            logger.info(f"Deleted {len(ids)} chunks from collection")
+        except Exception as e:
+            logger.error(f"Error deleting chunks: {e}")
+            raise
+        finally:
+            self._invalidate_query_cache(user_id)
+        
+        try:
+            self.lexical_index.delete_documents(user_id, ids)
+        except Exception as e:
+            logger.error(f"Error updating lexical index: {e}")
+        
+        return len(ids)
+    
+    def update_metadatas(self, user_id: str, ids: List[str], fields: Dict[str, Any]):
+        """
+        Set metadata fields on existing chunks (other fields are kept)
+        
+        Args:
+            user_id: User identifier
+            ids: Chunk IDs to update
+            fields: Metadata fields to set on every chunk
+        """
+        if not ids:
+            return
+        
+        try:
+            self.store.update_metadatas(user_id, ids, fields)
+        except Exception as e:
+            logger.error(f"Error updating metadatas: {e}")
+            raise
+        finally:
+            self._invalidate_query_cache(user_id)
+    
+    def delete_by_document(self, user_id: str, document_name: str, compact: bool = False) -> int:
         """
         Delete all chunks from a specific document
         
         Args:
             user_id: User identifier
             document_name: Name of the document to delete
+            compact: Reclaim disk space in the background afterwards
             
         Returns:
             Number of chunks deleted
         """
-        collection = self.get_or_create_collection(user_id)
-        
         try:
-            # First, get all documents to see what we have
-            all_results = collection.get(include=["metadatas"])
-            logger.info(f"Total chunks in collection: {len(all_results['ids'])}")
-            
-            # Log all unique document names for debugging
-            doc_names = set()
-            for metadata in all_results['metadatas']:
-                if 'document_name' in metadata:
-                    doc_names.add(metadata['document_name'])
-            logger.info(f"Documents in collection: {doc_names}")
-            logger.info(f"Looking for document: '{document_name}'")
-            
-            # Get all IDs for this document
-            results = collection.get(
-                where={"document_name": document_name},
-                include=["metadatas"]
-            )
+            # Ids only, through the metadata filter (no documents/embeddings loaded)
+            results = self.store.get(user_id, where={"document_name": document_name}, include=[])
+            ids = results['ids']
             
-            if results['ids']:
-                logger.info(f"Found {len(results['ids'])} chunks to delete for '{document_name}'")
-                collection.delete(ids=results['ids'])
-                logger.info(f"✅ Successfully deleted {len(results['ids'])} chunks from '{document_name}'")
-                return len(results['ids'])
+            if ids:
+                logger.info(f"Found {len(ids)} chunks to delete for '{document_name}'")
+                self.delete_chunks(user_id, ids)
+                logger.info(f"✅ Successfully deleted {len(ids)} chunks from '{document_name}'")
             else:
                 logger.warning(f"❌ No chunks found for document '{document_name}'")
-                logger.warning(f"Available documents: {doc_names}")
-                return 0
+            
+            self.manifest.delete(user_id, document_name)
+            if compact and ids:
+                self.schedule_compaction()
+            return len(ids)
         except Exception as e:
             logger.error(f"Error deleting document: {e}")
             raise
     
+    def compact(self):
+        """
+        Reclaim the space left by deleted chunks (VACUUM of ChromaDB's SQLite
+        file, rewrite of the NumPy shards)
+        """
+        self.store.compact()
+    
+    def schedule_compaction(self):
+        """Run compact() in a background thread (no-op if one is already running)"""
+        with self._compaction_lock:
+            if self._compaction_thread is not None and self._compaction_thread.is_alive():
+                return
+            
+            def run():
+                try:
+                    self.compact()
+                except Exception as e:
+                    logger.error(f"Background compaction failed: {e}")
+            
+            self._compaction_thread = threading.Thread(target=run, name="chroma-compaction", daemon=True)
+            self._compaction_thread.start()
+    
+    def get_lexical_index(self, user_id: str) -> LexicalIndex:
+        """
+        Get the BM25 index for a user, building it from the vector store if missing
+        
+        Args:
+            user_id: User identifier
+            
+        Returns:
+            LexicalIndex covering the user's whole collection
+        """
+        if not self.lexical_index.exists(user_id):
+            self.rebuild_lexical_index(user_id)
+        return self.lexical_index.get_index(user_id)
+    
+    def rebuild_lexical_index(self, user_id: str) -> int:
+        """
+        Rebuild a user's BM25 index from the chunks stored in the vector store
+        
+        Args:
+            user_id: User identifier
+            
+        Returns:
+            Number of chunks indexed
+        """
+        try:
+            results = self.store.get(user_id, include=["documents"])
+            index = LexicalIndex(k1=self.lexical_index.k1, b=self.lexical_index.b)
+            index.add(results['ids'], [tokenize(document) for document in results['documents']])
+            self.lexical_index.replace_index(user_id, index)
+            logger.info(f"Lexical index rebuilt for user {user_id} ({len(index)} chunks)")
+            return len(index)
+        except Exception as e:
+            logger.error(f"Error rebuilding lexical index: {e}")
+            raise
+    
+    def search_lexical(
+        self,
+        user_id: str,
+        query_text: str,
+        n_results: int = 10
+    ) -> List[Tuple[str, float, Dict, str]]:
+        """
+        Keyword (BM25) search over the user's whole collection
+        
+        Args:
+            user_id: User identifier
+            query_text: Query string
+            n_results: Number of results to return
+            
+        Returns:
+            List of (document, score, metadata, id) tuples
+        """
+        self.get_lexical_index(user_id)
+        hits = self.lexical_index.search(user_id, query_text, top_k=n_results)
+        if not hits:
+            return []
+        
+        # The index only keeps term statistics: texts and metadata come from the store
+        stored = self.store.get(user_id, include=["documents", "metadatas"], ids=[doc_id for doc_id, _ in hits])
+        chunks = {
+            doc_id: (document, metadata)
+            for doc_id, document, metadata in zip(stored['ids'], stored['documents'], stored['metadatas'])
+        }
+        results = [
+            (chunks[doc_id][0], score, chunks[doc_id][1], doc_id)
+            for doc_id, score in hits
+            if doc_id in chunks
+        ]
+        logger.info(f"Lexical search returned {len(results)} results")
+        return results
+    
     def count_documents(self, user_id: str) -> int:
         """Get total number of chunks in collection"""
-        collection = self.get_or_create_collection(user_id)
-        return collection.count()
+        return self.store.count(user_id)
     
     def list_documents(self, user_id: str) -> List[str]:
-        """List all unique document names in the collection"""
-        collection = self.get_or_create_collection(user_id)
-        
+        """List all unique document names in the collection (from the manifest)"""
         try:
-            results = collection.get(include=["metadatas"])
-            document_names = set()
-            for metadata in results['metadatas']:
-                if 'document_name' in metadata:
-                    document_names.add(metadata['document_name'])
-            return sorted(list(document_names))
+            return sorted(document["document_name"] for document in self.list_document_entries(user_id))
         except Exception as e:
             logger.error(f"Error listing documents: {e}")
             return []
     
     def reset_collection(self, user_id: str):
         """Delete and recreate the collection (use with caution!)"""
-        collection_name = f"{self.collection_name}_{user_id}"
         try:
-            self.client.delete_collection(name=collection_name)
-            logger.warning(f"Collection '{collection_name}' deleted")
-            self.get_or_create_collection(user_id)
+            self.store.drop(user_id)
+            self.lexical_index.reset(user_id)
+            self.manifest.delete_user(user_id)
+            self.manifest.mark_synced(user_id)
+            self._invalidate_query_cache(user_id)
+            logger.warning(f"Collection of user {user_id} deleted")
         except Exception as e:
             logger.error(f"Error resetting collection: {e}")
             raise
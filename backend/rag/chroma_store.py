@@ -0,0 +1,365 @@
+"""
+ChromaDB Vector Store
+VectorStore backend on chromadb.PersistentClient (one collection per user)
+"""
+
+import chromadb
+from chromadb.config import Settings
+from typing import List, Dict, Any, Optional, Sequence, Callable, Iterator
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from .vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+# Ids per collection.delete call (below Chroma's SQLite max batch size)
+DELETE_BATCH_SIZE = 5000
+
+# HNSW parameters -> ChromaDB collection metadata keys. Only search_ef can change
+# after creation; the others need rebuild()
+HNSW_METADATA_KEYS = {
+    "space": "hnsw:space",  # l2 (default), cosine or ip
+    "construction_ef": "hnsw:construction_ef",
+    "search_ef": "hnsw:search_ef",
+    "M": "hnsw:M",
+}
+
+# Temporary collection name suffix used while a collection is rebuilt
+REBUILD_SUFFIX = "__rebuild"
+
+
+class ChromaVectorStore(VectorStore):
+    """ChromaDB collections with cached handles and per-collection HNSW settings"""
+
+    name = "chroma"
+
+    def __init__(
+        self,
+        persist_directory: str = "./chroma_db",
+        collection_name: str = "documents",
+        embedding_function=None,
+        hnsw_config: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Initialize ChromaDB backend
+
+        Args:
+            persist_directory: Path to persist ChromaDB data
+            collection_name: Collection prefix (collections are <prefix>_<user_id>)
+            embedding_function: Embedding function attached to the collections
+            hnsw_config: HNSW settings of new collections, keys from
+                         HNSW_METADATA_KEYS (e.g. {"space": "cosine", "M": 32});
+                         search_ef is also applied to existing collections
+        """
+        self.persist_directory = Path(persist_directory)
+        self.persist_directory.mkdir(parents=True, exist_ok=True)
+        self.collection_name = collection_name
+        self.embedding_function = embedding_function
+        self.hnsw_config = dict(hnsw_config or {})
+        self._hnsw_metadata(self.hnsw_config)  # Validate keys early
+
+        # Initialize ChromaDB client with persistence
+        self.client = chromadb.PersistentClient(
+            path=str(self.persist_directory),
+            settings=Settings(
+                anonymized_telemetry=False,
+                allow_reset=True
+            )
+        )
+
+        # Collection handles per user, created lazily once
+        self._collections: Dict[str, chromadb.Collection] = {}
+        self._collections_lock = threading.Lock()
+
+        # Writes in progress per user, and users being rebuilt (their writes wait)
+        self._writes_in_flight: Dict[str, int] = {}
+        self._rebuilding: set = set()
+        self._write_condition = threading.Condition()
+
+    def get_or_create_collection(self, user_id: str) -> chromadb.Collection:
+        """
+        Get or create a collection for a specific user (handle cached after first use)
+
+        Args:
+            user_id: User identifier for collection isolation
+
+        Returns:
+            ChromaDB collection
+        """
+        collection = self._collections.get(user_id)
+        if collection is not None:
+            return collection
+
+        collection_name = f"{self.collection_name}_{user_id}"
+
+        with self._collections_lock:
+            collection = self._collections.get(user_id)
+            if collection is not None:
+                return collection
+            try:
+                collection = self.client.get_or_create_collection(
+                    name=collection_name,
+                    embedding_function=self.embedding_function,
+                    metadata=self._collection_metadata(user_id, self.hnsw_config)
+                )
+            except Exception as e:
+                logger.error(f"Error getting/creating collection: {e}")
+                raise
+            self._apply_search_ef(collection)
+            self._collections[user_id] = collection
+            logger.info(f"Collection '{collection_name}' ready")
+            return collection
+
+    def forget_collection(self, user_id: str):
+        """Drop a cached collection handle (collection deleted or recreated)"""
+        with self._collections_lock:
+            self._collections.pop(user_id, None)
+
+    @staticmethod
+    def _hnsw_metadata(hnsw_config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """ChromaDB metadata keys for an HNSW config"""
+        metadata = {}
+        for key, value in (hnsw_config or {}).items():
+            if value is None:
+                continue
+            if key not in HNSW_METADATA_KEYS:
+                raise ValueError(f"Unknown HNSW parameter '{key}' (expected one of {sorted(HNSW_METADATA_KEYS)})")
+            metadata[HNSW_METADATA_KEYS[key]] = value
+        return metadata
+
+    def _collection_metadata(self, user_id: str, hnsw_config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "user_id": user_id,
+            "description": "Document chunks for RAG",
+            **self._hnsw_metadata(hnsw_config)
+        }
+
+    def _apply_search_ef(self, collection: chromadb.Collection):
+        """Set the configured search_ef on an existing collection if it differs"""
+        search_ef = self.hnsw_config.get("search_ef")
+        current = collection.metadata or {}
+        if search_ef is None or current.get("hnsw:search_ef") == search_ef:
+            return
+        # modify() rejects hnsw:space (even unchanged) and replaces the whole
+        # metadata, which would silently drop a non-default space
+        if "hnsw:space" in current:
+            logger.warning(
+                f"Collection '{collection.name}' has a custom distance space: "
+                f"use rebuild() to change its search_ef"
+            )
+            return
+        metadata = {**current, "hnsw:search_ef": search_ef}
+        try:
+            collection.modify(metadata=metadata)
+            logger.info(f"Collection '{collection.name}': search_ef set to {search_ef}")
+        except Exception as e:
+            logger.warning(f"Could not set search_ef on '{collection.name}': {e}")
+
+    @contextmanager
+    def _writing(self, user_id: str) -> Iterator[None]:
+        """Write section of a user's collection, held back while it is rebuilt"""
+        with self._write_condition:
+            while user_id in self._rebuilding:
+                self._write_condition.wait()
+            self._writes_in_flight[user_id] = self._writes_in_flight.get(user_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._write_condition:
+                self._writes_in_flight[user_id] -= 1
+                if not self._writes_in_flight[user_id]:
+                    del self._writes_in_flight[user_id]
+                self._write_condition.notify_all()
+
+    def _read(self, user_id: str, func: Callable[[chromadb.Collection], Any]) -> Any:
+        """
+        Run a read on the user's collection handle
+
+        A handle taken just before a rebuild/drop swapped the collection points to
+        a deleted collection: the read is retried once on the current handle.
+        """
+        collection = self.get_or_create_collection(user_id)
+        try:
+            return func(collection)
+        except Exception:
+            if self._collections.get(user_id) is collection:
+                raise
+            logger.info(f"Collection of user {user_id} was replaced during a read, retrying")
+            return func(self.get_or_create_collection(user_id))
+
+    def _collection_names(self) -> List[str]:
+        """Names of all collections (list_collections returns objects or names depending on the version)"""
+        return [getattr(collection, "name", collection) for collection in self.client.list_collections()]
+
+    # --- VectorStore ---
+
+    def upsert(self, user_id, ids, embeddings, documents, metadatas):
+        # upsert: deterministic ids make re-ingestion idempotent
+        with self._writing(user_id):
+            self.get_or_create_collection(user_id).upsert(
+                documents=documents,
+                metadatas=metadatas,
+                ids=ids,
+                embeddings=embeddings
+            )
+
+    def query(self, user_id, embedding, n_results, where=None, where_document=None):
+        return self._read(user_id, lambda collection: collection.query(
+            query_embeddings=[embedding],
+            n_results=n_results,
+            where=where,
+            where_document=where_document,
+            include=["documents", "metadatas", "distances"]
+        ))
+
+    def get(self, user_id, where=None, include: Sequence[str] = ("documents", "metadatas"), ids=None):
+        return self._read(user_id, lambda collection: collection.get(ids=ids, where=where, include=list(include)))
+
+    def delete(self, user_id, ids):
+        with self._writing(user_id):
+            collection = self.get_or_create_collection(user_id)
+            for i in range(0, len(ids), DELETE_BATCH_SIZE):
+                collection.delete(ids=ids[i:i + DELETE_BATCH_SIZE])
+
+    def update_metadatas(self, user_id, ids, fields):
+        with self._writing(user_id):
+            self.get_or_create_collection(user_id).update(ids=ids, metadatas=[dict(fields) for _ in ids])
+
+    def count(self, user_id):
+        return self._read(user_id, lambda collection: collection.count())
+
+    def drop(self, user_id):
+        collection_name = f"{self.collection_name}_{user_id}"
+        with self._writing(user_id):
+            self.forget_collection(user_id)
+            self.client.delete_collection(name=collection_name)
+            self.get_or_create_collection(user_id)
+
+    def list_user_ids(self):
+        prefix = f"{self.collection_name}_"
+        return [
+            name[len(prefix):]
+            for name in self._collection_names()
+            if name.startswith(prefix) and not name.endswith(REBUILD_SUFFIX)
+        ]
+
+    def warmup(self, user_id, embedding):
+        # ChromaDB reads the HNSW index from disk on a collection's first query
+        self._read(user_id, lambda collection: collection.query(
+            query_embeddings=[embedding], n_results=1, include=["distances"]
+        ))
+
+    def compact(self):
+        """
+        VACUUM of ChromaDB's SQLite file. Concurrent writes wait on SQLite's
+        lock meanwhile.
+        """
+        db_file = self.persist_directory / "chroma.sqlite3"
+        if not db_file.exists():
+            return
+
+        size_before = db_file.stat().st_size
+        conn = sqlite3.connect(str(db_file), timeout=60)
+        try:
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+        logger.info(
+            f"Compacted {db_file.name}: {size_before / 1e6:.1f} MB -> {db_file.stat().st_size / 1e6:.1f} MB"
+        )
+
+    def index_config(self, user_id):
+        """HNSW settings stored on a user's collection (unset keys use ChromaDB defaults)"""
+        metadata = self.get_or_create_collection(user_id).metadata or {}
+        return {
+            key: metadata[metadata_key]
+            for key, metadata_key in HNSW_METADATA_KEYS.items()
+            if metadata_key in metadata
+        }
+
+    def rebuild(self, user_id, config=None, batch_size=1000):
+        """
+        Recreate a user's collection with new HNSW settings (space, construction_ef, M...)
+
+        Chunks, embeddings and metadata are copied to a temporary collection which
+        then replaces the original; ids are unchanged. The user's writes through
+        this store wait until the swap (other processes must not write meanwhile);
+        reads keep using the original collection, then retry on the new one if
+        they raced the swap. An interrupted rebuild is completed or restarted on
+        the next call.
+
+        Args:
+            user_id: User identifier
+            config: HNSW settings (merged over the store's hnsw_config)
+            batch_size: Chunks copied per get/add call
+
+        Returns:
+            Number of chunks copied
+        """
+        with self._write_condition:
+            # One rebuild per user; then let the writes already started finish
+            while user_id in self._rebuilding:
+                self._write_condition.wait()
+            self._rebuilding.add(user_id)
+            while self._writes_in_flight.get(user_id):
+                self._write_condition.wait()
+        try:
+            return self._rebuild(user_id, config, batch_size)
+        finally:
+            with self._write_condition:
+                self._rebuilding.discard(user_id)
+                self._write_condition.notify_all()
+
+    def _rebuild(self, user_id: str, config: Optional[Dict[str, Any]], batch_size: int) -> int:
+        config = {**self.hnsw_config, **(config or {})}
+        name = f"{self.collection_name}_{user_id}"
+        tmp_name = f"{name}{REBUILD_SUFFIX}"
+
+        names = set(self._collection_names())
+        if tmp_name in names:
+            if name not in names:
+                # Interrupted after the original was deleted: finish the swap
+                with self._collections_lock:
+                    self.client.get_collection(name=tmp_name, embedding_function=self.embedding_function).modify(name=name)
+                    self._collections.pop(user_id, None)
+                logger.info(f"Completed interrupted rebuild of '{name}'")
+                return self.get_or_create_collection(user_id).count()
+            self.client.delete_collection(name=tmp_name)
+
+        source = self.client.get_collection(name=name, embedding_function=self.embedding_function)
+        target = self.client.create_collection(
+            name=tmp_name,
+            embedding_function=self.embedding_function,
+            metadata=self._collection_metadata(user_id, config)
+        )
+
+        copied = 0
+        while True:
+            batch = source.get(
+                include=["embeddings", "documents", "metadatas"],
+                limit=batch_size,
+                offset=copied
+            )
+            if not batch["ids"]:
+                break
+            target.add(
+                ids=batch["ids"],
+                embeddings=batch["embeddings"],
+                documents=batch["documents"],
+                metadatas=batch["metadatas"]
+            )
+            copied += len(batch["ids"])
+            logger.info(f"Rebuilding '{name}': {copied} chunks copied")
+
+        # Swap under the handle lock so no query recreates an empty collection meanwhile
+        with self._collections_lock:
+            self.client.delete_collection(name=name)
+            target.modify(name=name)
+            self._collections.pop(user_id, None)
+
+        logger.info(f"Collection '{name}' rebuilt with {self._hnsw_metadata(config)} ({copied} chunks)")
+        return copied
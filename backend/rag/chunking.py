@@ -5,11 +5,19 @@ Intelligent text splitting with sentence awareness and metadata extraction
 
 import re
 import spacy
-from typing import List, Dict, Any, Tuple
+from bisect import bisect_left
+from collections import Counter
+from typing import List, Dict, Any, Tuple, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+SPACY_MODELS = {"fr": "fr_core_news_sm", "en": "en_core_web_sm"}
+
+# Rule-based sentence boundary: end punctuation, whitespace, then an upper-case
+# letter, digit, quote, bullet or dash (French abbreviations like "art." or "N°" stay attached)
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?…])\s+(?=[A-ZÀ-ÖØ-Þ0-9«"“(•\-–])')
+
 
 class SmartChunker:
     """Advanced text chunking with context preservation"""
@@ -18,7 +26,10 @@ class SmartChunker:
         self,
         chunk_size: int = 800,
         chunk_overlap: int = 100,
-        language: str = "fr"
+        language: str = "fr",
+        segmentation: str = "full",
+        pipe_batch_size: int = 32,
+        n_process: int = 1
     ):
         """
         Initialize chunker
@@ -27,23 +38,50 @@ class SmartChunker:
             chunk_size: Target size of chunks in characters
             chunk_overlap: Overlap between chunks in characters
             language: Language code for spaCy model
+            segmentation: Sentence splitting mode:
+                          "full"  - full spaCy model (dependency parser),
+                                    keywords are the tagged nouns
+                          "fast"  - spaCy tokenizer + rule-based sentencizer
+                                    only (no tagger), keywords are the most
+                                    frequent non-stopword words
+                          "rules" - regex splitter, no spaCy pass
+                          "fast" and "rules" cut sentences differently from
+                          "full", so re-indexing a document already chunked
+                          with "full" changes its chunk boundaries and ids
+            pipe_batch_size: Pages per nlp.pipe batch
+            n_process: Processes used by nlp.pipe for the tagging pass
+                       (worth it for bulk imports, not single uploads)
         """
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.language = language
+        self.segmentation = segmentation
+        self.pipe_batch_size = pipe_batch_size
+        self.n_process = n_process
         
-        # Load spaCy model for sentence splitting
-        try:
-            if language == "fr":
-                self.nlp = spacy.load("fr_core_news_sm")
-            elif language == "en":
-                self.nlp = spacy.load("en_core_web_sm")
-            else:
-                logger.warning(f"Language {language} not supported, using basic splitting")
+        # self.nlp splits sentences, self.keyword_nlp tags nouns for keywords
+        # (the same full pipeline; "fast" and "rules" never run the tagger)
+        self.nlp = None
+        self.keyword_nlp = None
+        
+        model_name = SPACY_MODELS.get(language)
+        if model_name is None:
+            logger.warning(f"Language {language} not supported, using basic splitting")
+            return
+        
+        if segmentation == "full":
+            try:
+                self.nlp = spacy.load(model_name)
+                self.keyword_nlp = self.nlp
+            except Exception as e:
+                logger.warning(f"Could not load spaCy model: {e}. Using basic splitting")
+        elif segmentation == "fast":
+            try:
+                self.nlp = spacy.blank(language)
+                self.nlp.add_pipe("sentencizer")
+            except Exception as e:
+                logger.warning(f"Could not create spaCy sentencizer: {e}. Using basic splitting")
                 self.nlp = None
-        except Exception as e:
-            logger.warning(f"Could not load spaCy model: {e}. Using basic splitting")
-            self.nlp = None
     
     def chunk_text(
         self,
@@ -68,21 +106,41 @@ class SmartChunker:
         # Normalize whitespace
         text = self._normalize_text(text)
         
-        # Use spaCy for sentence-aware splitting if available
-        if self.nlp:
-            chunks = self._chunk_with_sentences(text)
+        keyword_doc = self.keyword_nlp(text) if self.keyword_nlp else None
+        if self.nlp is self.keyword_nlp:
+            sentence_doc = keyword_doc
+        else:
+            sentence_doc = self.nlp(text) if self.nlp else None
+        return self._chunk_page(text, document_name, page_number, sentence_doc, keyword_doc)
+    
+    def _chunk_page(
+        self,
+        text: str,
+        document_name: str,
+        page_number: int,
+        sentence_doc=None,
+        keyword_doc=None
+    ) -> List[Dict[str, Any]]:
+        """Chunk one normalized page, given its spaCy docs (sentences, keywords)"""
+        # Sentence-aware splitting if a segmenter is available
+        if sentence_doc is not None or self.segmentation == "rules":
+            spans = self._chunk_with_sentences(text, sentence_doc)
         else:
-            chunks = self._chunk_basic(text)
+            spans = self._chunk_basic(text)
+        
+        # Without a tagged doc, the sentencizer's tokens still give the keywords
+        keywords_per_chunk = self._keywords_by_chunk(
+            text, spans, keyword_doc if keyword_doc is not None else sentence_doc
+        )
         
         # Add metadata to each chunk
         chunk_dicts = []
-        for idx, chunk_text in enumerate(chunks):
-            # Calculate approximate character positions
-            char_start = sum(len(c) for c in chunks[:idx])
-            char_end = char_start + len(chunk_text)
+        for idx, (char_start, char_end) in enumerate(spans):
+            # Exact offsets into the normalized page text (used for PDF highlighting)
+            chunk_text = text[char_start:char_end]
             
-            # Extract keywords and convert to comma-separated string for ChromaDB
-            keywords_list = self._extract_keywords(chunk_text)
+            # Keywords as comma-separated string for ChromaDB
+            keywords_list = keywords_per_chunk[idx]
             keywords_str = ", ".join(keywords_list) if keywords_list else ""
             
             metadata = {
@@ -111,51 +169,76 @@ class SmartChunker:
         text = text.strip()
         return text
     
-    def _chunk_with_sentences(self, text: str) -> List[str]:
-        """Chunk text using sentence boundaries (spaCy)"""
-        if not self.nlp:
-            return self._chunk_basic(text)
+    @staticmethod
+    def _strip_span(text: str, start: int, end: int) -> Tuple[int, int]:
+        """Shrink [start, end) to exclude surrounding whitespace"""
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return start, end
+    
+    def _sentence_spans(self, text: str, doc=None) -> List[Tuple[int, int]]:
+        """(start, end) of each sentence of a page, from its spaCy doc or the rule-based splitter"""
+        if doc is not None:
+            bounds = [(sent.start_char, sent.end_char) for sent in doc.sents]
+        else:
+            bounds = []
+            start = 0
+            for match in SENTENCE_BOUNDARY.finditer(text):
+                bounds.append((start, match.start()))
+                start = match.end()
+            bounds.append((start, len(text)))
+        
+        spans = [self._strip_span(text, start, end) for start, end in bounds]
+        return [(start, end) for start, end in spans if end > start]
+    
+    def _chunk_with_sentences(self, text: str, doc=None) -> List[Tuple[int, int]]:
+        """Chunk text using sentence boundaries, returns (start, end) offsets"""
+        if doc is None and self.segmentation != "rules":
+            if not self.nlp:
+                return self._chunk_basic(text)
+            doc = self.nlp(text)
         
-        doc = self.nlp(text)
-        sentences = [sent.text.strip() for sent in doc.sents]
+        sentences = self._sentence_spans(text, doc)
         
         chunks = []
         current_chunk = []
         current_length = 0
         
-        for sentence in sentences:
-            sentence_length = len(sentence)
+        for start, end in sentences:
+            sentence_length = end - start
             
             # If adding this sentence would exceed chunk_size
             if current_length + sentence_length > self.chunk_size and current_chunk:
-                # Save current chunk
-                chunks.append(' '.join(current_chunk))
+                # Save current chunk (first sentence start to last sentence end)
+                chunks.append((current_chunk[0][0], current_chunk[-1][1]))
                 
                 # Start new chunk with overlap
                 # Include last few sentences for context
-                overlap_sentences = []
+                overlap_start = len(current_chunk)
                 overlap_length = 0
-                for s in reversed(current_chunk):
-                    if overlap_length + len(s) < self.chunk_overlap:
-                        overlap_sentences.insert(0, s)
-                        overlap_length += len(s)
+                for s_start, s_end in reversed(current_chunk):
+                    if overlap_length + (s_end - s_start) < self.chunk_overlap:
+                        overlap_start -= 1
+                        overlap_length += s_end - s_start
                     else:
                         break
                 
-                current_chunk = overlap_sentences + [sentence]
-                current_length = sum(len(s) for s in current_chunk)
+                current_chunk = current_chunk[overlap_start:] + [(start, end)]
+                current_length = overlap_length + sentence_length
             else:
-                current_chunk.append(sentence)
+                current_chunk.append((start, end))
                 current_length += sentence_length
         
         # Add final chunk
         if current_chunk:
-            chunks.append(' '.join(current_chunk))
+            chunks.append((current_chunk[0][0], current_chunk[-1][1]))
         
         return chunks
     
-    def _chunk_basic(self, text: str) -> List[str]:
-        """Basic chunking with fixed size and overlap"""
+    def _chunk_basic(self, text: str) -> List[Tuple[int, int]]:
+        """Basic chunking with fixed size and overlap, returns (start, end) offsets"""
         chunks = []
         start = 0
         text_length = len(text)
@@ -171,9 +254,9 @@ class SmartChunker:
                 if match:
                     end += match.end()
             
-            chunk = text[start:end].strip()
-            if chunk:
-                chunks.append(chunk)
+            chunk_start, chunk_end = self._strip_span(text, start, min(end, text_length))
+            if chunk_end > chunk_start:
+                chunks.append((chunk_start, chunk_end))
             
             # Move start with overlap
             start = end - self.chunk_overlap if end < text_length else text_length
@@ -182,25 +265,118 @@ class SmartChunker:
     
     def _extract_keywords(self, text: str, max_keywords: int = 5) -> List[str]:
         """Extract important keywords from text"""
-        if not self.nlp:
+        if not self.keyword_nlp:
             # Simple word frequency if no NLP
             words = re.findall(r'\b\w{4,}\b', text.lower())
-            from collections import Counter
             return [word for word, _ in Counter(words).most_common(max_keywords)]
         
         # Use spaCy for better keyword extraction
-        doc = self.nlp(text)
+        doc = self.keyword_nlp(text)
+        keywords = [lemma for _, lemma in self._keyword_candidates(doc)]
+        
+        # Return unique keywords (most common first)
+        return [kw for kw, _ in Counter(keywords).most_common(max_keywords)]
+    
+    @staticmethod
+    def _keyword_candidates(doc) -> List[Tuple[int, str]]:
+        """
+        (char offset, lemma) of the nouns and proper nouns of a tagged doc, or
+        (char offset, lower-cased word) of the non-stopword words of an
+        untagged one (tokenizer + sentencizer)
+        """
+        if not doc.has_annotation("POS"):
+            return [
+                (token.idx, token.lower_)
+                for token in doc
+                if token.is_alpha and not token.is_stop and len(token.text) > 3
+            ]
+        return [
+            (token.idx, token.lemma_.lower())
+            for token in doc
+            if token.pos_ in ['NOUN', 'PROPN'] and not token.is_stop and len(token.text) > 3
+        ]
+    
+    def _keywords_by_chunk(
+        self,
+        text: str,
+        spans: List[Tuple[int, int]],
+        doc=None,
+        max_keywords: int = 5
+    ) -> List[List[str]]:
+        """
+        Keywords of each chunk, taken from the page's tagged doc (one spaCy
+        pass per page instead of one per chunk)
+        """
+        if doc is None:
+            return [self._extract_keywords(text[start:end], max_keywords) for start, end in spans]
+        
+        candidates = self._keyword_candidates(doc)
+        offsets = [offset for offset, _ in candidates]
         
-        # Extract nouns and proper nouns
         keywords = []
-        for token in doc:
-            if token.pos_ in ['NOUN', 'PROPN'] and not token.is_stop and len(token.text) > 3:
-                keywords.append(token.lemma_.lower())
+        for start, end in spans:
+            lo = bisect_left(offsets, start)
+            hi = bisect_left(offsets, end)
+            counts = Counter(lemma for _, lemma in candidates[lo:hi])
+            keywords.append([kw for kw, _ in counts.most_common(max_keywords)])
+        return keywords
+    
+    def _pipe_pages(self, texts: List[str], batch_size: int, n_process: int):
+        """(sentence_doc, keyword_doc) per text, one nlp.pipe pass per pipeline"""
+        if self.keyword_nlp:
+            keyword_docs = list(self.keyword_nlp.pipe(texts, batch_size=batch_size, n_process=n_process))
+        else:
+            keyword_docs = [None] * len(texts)
         
-        # Return unique keywords (most common first)
-        from collections import Counter
-        keyword_counts = Counter(keywords)
-        return [kw for kw, _ in keyword_counts.most_common(max_keywords)]
+        if self.nlp is self.keyword_nlp:
+            sentence_docs = keyword_docs
+        elif self.nlp:
+            # The sentencizer is cheap: multiprocessing would only add pickling
+            sentence_docs = self.nlp.pipe(texts, batch_size=batch_size)
+        else:
+            sentence_docs = [None] * len(texts)
+        
+        return zip(sentence_docs, keyword_docs)
+    
+    def chunk_documents(
+        self,
+        documents: List[Tuple[str, List[Tuple[str, int]]]],
+        batch_size: Optional[int] = None,
+        n_process: Optional[int] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Chunk the pages of several documents in one batched spaCy pass
+        
+        Args:
+            documents: List of (document_name, [(text, page_number), ...])
+            batch_size: Pages per nlp.pipe batch (defaults to pipe_batch_size)
+            n_process: nlp.pipe processes (defaults to n_process)
+            
+        Returns:
+            One list of chunk dicts per document, as chunk_by_pages returns
+        """
+        batch_size = batch_size or self.pipe_batch_size
+        n_process = n_process or self.n_process
+        
+        # Flatten every non-empty page of every document
+        pages = []
+        for doc_idx, (_, doc_pages) in enumerate(documents):
+            for text, page_num in doc_pages:
+                if text and text.strip():
+                    pages.append((doc_idx, self._normalize_text(text), page_num))
+        
+        results: List[List[Dict[str, Any]]] = [[] for _ in documents]
+        docs = self._pipe_pages([text for _, text, _ in pages], batch_size, n_process)
+        for (doc_idx, text, page_num), (sentence_doc, keyword_doc) in zip(pages, docs):
+            results[doc_idx].extend(
+                self._chunk_page(text, documents[doc_idx][0], page_num, sentence_doc, keyword_doc)
+            )
+        
+        logger.info(
+            f"Chunked {len(pages)} pages from {len(documents)} documents "
+            f"into {sum(len(chunks) for chunks in results)} chunks"
+        )
+        return results
     
     def chunk_by_pages(
         self,
@@ -217,11 +393,4 @@ class SmartChunker:
         Returns:
             List of chunk dicts with metadata
         """
-        all_chunks = []
-        
-        for text, page_num in pages:
-            page_chunks = self.chunk_text(text, document_name, page_num)
-            all_chunks.extend(page_chunks)
-        
-        logger.info(f"Chunked {len(pages)} pages into {len(all_chunks)} chunks")
-        return all_chunks
+        return self.chunk_documents([(document_name, pages)])[0]
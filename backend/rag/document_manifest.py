@@ -0,0 +1,195 @@
+"""
+Document Manifest Module
+SQLite table of indexed documents per user (hashes, page/chunk counts, timestamps)
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Any, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Columns returned by list_for_user when the per-page blob is not needed
+LISTING_COLUMNS = (
+    "user_id", "document_name", "document_hash", "page_count", "chunk_count",
+    "extraction_method", "size_bytes", "storage_path", "created_at", "updated_at"
+)
+
+
+class DocumentManifest:
+    """One row per (user, document), kept in sync with the vector store"""
+
+    def __init__(self, db_path: str = "./chroma_db_manifest.db"):
+        """
+        Initialize document manifest
+
+        Args:
+            db_path: Path of the SQLite database file
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    user_id TEXT NOT NULL,
+                    document_name TEXT NOT NULL,
+                    document_hash TEXT,
+                    page_count INTEGER NOT NULL DEFAULT 0,
+                    chunk_count INTEGER NOT NULL DEFAULT 0,
+                    pages TEXT NOT NULL DEFAULT '{}',
+                    extraction_method TEXT,
+                    size_bytes INTEGER,
+                    storage_path TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (user_id, document_name)
+                )
+                """
+            )
+            # Users whose rows were built from (or started with) the vector store,
+            # so a missing row means "not indexed"
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS synced_users (
+                    user_id TEXT PRIMARY KEY,
+                    synced_at REAL NOT NULL
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Connection committed on success (rolled back on error) and closed on exit"""
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        document = dict(row)
+        document["pages"] = {
+            int(page_number): page
+            for page_number, page in json.loads(document["pages"] or "{}").items()
+        }
+        return document
+
+    @staticmethod
+    def _pages_json(pages: Dict[int, Dict[str, Any]]) -> str:
+        return json.dumps({str(page_number): page for page_number, page in sorted(pages.items())})
+
+    def is_synced(self, user_id: str) -> bool:
+        """Whether the user's rows are authoritative"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT 1 FROM synced_users WHERE user_id = ?", (user_id,)).fetchone()
+        return row is not None
+
+    def mark_synced(self, user_id: str):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO synced_users (user_id, synced_at) VALUES (?, ?)",
+                (user_id, time.time())
+            )
+
+    def upsert(
+        self,
+        user_id: str,
+        document_name: str,
+        document_hash: Optional[str],
+        pages: Dict[int, Dict[str, Any]],
+        extraction_method: Optional[str] = None,
+        size_bytes: Optional[int] = None,
+        storage_path: Optional[str] = None,
+        created_at: Optional[float] = None
+    ):
+        """
+        Insert or replace a document row (created_at is kept on updates)
+
+        Args:
+            user_id: User identifier
+            document_name: Name of the document
+            document_hash: Hash of the whole file
+            pages: {page_number: {"page_hash": str|None, "ids": [chunk ids]}}
+            extraction_method: digital / ocr / hybrid
+            size_bytes: File size
+            storage_path: Relative path of the stored PDF
+            created_at: First ingestion time (defaults to now for new rows)
+        """
+        now = time.time()
+        chunk_count = sum(len(page["ids"]) for page in pages.values())
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO documents
+                    (user_id, document_name, document_hash, page_count, chunk_count, pages,
+                     extraction_method, size_bytes, storage_path, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (user_id, document_name) DO UPDATE SET
+                    document_hash = excluded.document_hash,
+                    page_count = excluded.page_count,
+                    chunk_count = excluded.chunk_count,
+                    pages = excluded.pages,
+                    extraction_method = excluded.extraction_method,
+                    size_bytes = COALESCE(excluded.size_bytes, documents.size_bytes),
+                    storage_path = COALESCE(excluded.storage_path, documents.storage_path),
+                    updated_at = excluded.updated_at
+                """,
+                (
+                    user_id, document_name, document_hash, len(pages), chunk_count,
+                    self._pages_json(pages), extraction_method, size_bytes, storage_path,
+                    created_at or now, now
+                )
+            )
+
+    def get(self, user_id: str, document_name: str) -> Optional[Dict[str, Any]]:
+        """Get a document row"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM documents WHERE user_id = ? AND document_name = ?",
+                (user_id, document_name)
+            ).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def list_for_user(self, user_id: str, with_pages: bool = False) -> List[Dict[str, Any]]:
+        """
+        List a user's documents, most recently ingested first
+
+        Args:
+            user_id: User identifier
+            with_pages: Include the per-page hashes and chunk ids
+        """
+        columns = "*" if with_pages else ", ".join(LISTING_COLUMNS)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {columns} FROM documents WHERE user_id = ? ORDER BY updated_at DESC",
+                (user_id,)
+            ).fetchall()
+
+        if with_pages:
+            return [self._row_to_dict(row) for row in rows]
+        return [dict(row) for row in rows]
+
+    def delete(self, user_id: str, document_name: str) -> bool:
+        """Remove a document row, returns whether it existed"""
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM documents WHERE user_id = ? AND document_name = ?",
+                (user_id, document_name)
+            )
+        return cursor.rowcount > 0
+
+    def delete_user(self, user_id: str):
+        """Remove all rows of a user"""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM documents WHERE user_id = ?", (user_id,))
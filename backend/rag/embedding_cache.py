@@ -0,0 +1,204 @@
+"""
+Embedding Cache Module
+On-disk embedding store keyed by model name and text hash
+"""
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from .metrics import EMBEDDINGS
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """Append-only float32 matrix (memory-mapped) + SQLite key index, one per model"""
+
+    def __init__(self, cache_directory: str, model_name: str):
+        """
+        Initialize embedding cache
+
+        Args:
+            cache_directory: Directory holding the cache files
+            model_name: Embedding model name (each model has its own store)
+        """
+        self.cache_directory = Path(cache_directory)
+        self.cache_directory.mkdir(parents=True, exist_ok=True)
+        self.model_name = model_name
+
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        self.vectors_path = self.cache_directory / f"{safe_name}.f32"
+        self.db_path = self.cache_directory / f"{safe_name}.sqlite"
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        self._conn.commit()
+
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'dimension'").fetchone()
+        self.dimension: Optional[int] = int(row[0]) if row else None
+        self._rows: Dict[str, int] = dict(self._conn.execute("SELECT key, row FROM entries"))
+
+        self._mmap: Optional[np.memmap] = None
+        self._mmap_rows = 0
+
+        logger.info(f"Embedding cache for '{model_name}' ready ({len(self._rows)} vectors)")
+
+    @staticmethod
+    def text_key(text: str) -> str:
+        """Cache key of a text"""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _vectors(self, min_rows: int) -> np.memmap:
+        """Memory-mapped matrix, remapped when rows were appended since"""
+        if self._mmap is None or self._mmap_rows < min_rows:
+            n_rows = self.vectors_path.stat().st_size // (4 * self.dimension)
+            self._mmap = np.memmap(
+                self.vectors_path, dtype=np.float32, mode="r", shape=(n_rows, self.dimension)
+            )
+            self._mmap_rows = n_rows
+        return self._mmap
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look up embeddings
+
+        Args:
+            texts: Texts to look up
+
+        Returns:
+            One float32 vector per text, None on a miss
+        """
+        keys = [self.text_key(text) for text in texts]
+        results: List[Optional[np.ndarray]] = [None] * len(keys)
+
+        with self._lock:
+            rows = [self._rows.get(key) for key in keys]
+            found = [row for row in rows if row is not None]
+            if found:
+                vectors = self._vectors(max(found) + 1)
+                for i, row in enumerate(rows):
+                    if row is not None:
+                        results[i] = np.array(vectors[row])
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+
+        return results
+
+    def put_many(self, texts: List[str], vectors) -> int:
+        """
+        Store embeddings (already cached texts are ignored)
+
+        Args:
+            texts: Embedded texts
+            vectors: One embedding per text
+
+        Returns:
+            Number of new vectors stored
+        """
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2 or len(matrix) != len(texts):
+            raise ValueError("Expected one embedding per text")
+
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = int(matrix.shape[1])
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('dimension', ?)",
+                    (str(self.dimension),)
+                )
+            elif matrix.shape[1] != self.dimension:
+                raise ValueError(
+                    f"Embedding dimension {matrix.shape[1]} != cached dimension {self.dimension}"
+                )
+
+            new_keys = []
+            new_rows = []
+            for text, vector in zip(texts, matrix):
+                key = self.text_key(text)
+                if key in self._rows or key in new_keys:
+                    continue
+                new_keys.append(key)
+                new_rows.append(vector)
+
+            if not new_keys:
+                return 0
+
+            # Drop a partially written row left by a crash before appending
+            row_bytes = 4 * self.dimension
+            size = self.vectors_path.stat().st_size if self.vectors_path.exists() else 0
+            start_row = size // row_bytes
+            if size % row_bytes:
+                os.truncate(self.vectors_path, start_row * row_bytes)
+
+            with open(self.vectors_path, "ab") as f:
+                f.write(np.ascontiguousarray(new_rows, dtype=np.float32).tobytes())
+
+            entries = [(key, start_row + i) for i, key in enumerate(new_keys)]
+            self._conn.executemany("INSERT OR IGNORE INTO entries (key, row) VALUES (?, ?)", entries)
+            self._conn.commit()
+            self._rows.update(entries)
+
+        return len(new_keys)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and size"""
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "entries": len(self._rows),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+class CachedEmbeddingFunction:
+    """Wraps an embedding function so only cache misses reach the model"""
+
+    def __init__(self, embedding_function, cache: EmbeddingCache):
+        """
+        Args:
+            embedding_function: Callable taking a list of texts (e.g. Chroma's
+                                SentenceTransformerEmbeddingFunction)
+            cache: EmbeddingCache for the same model
+        """
+        self.embedding_function = embedding_function
+        self.cache = cache
+
+    def __call__(self, input: List[str]) -> List[np.ndarray]:
+        """Embed texts, computing only the ones not cached yet"""
+        vectors = self.cache.get_many(input)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        EMBEDDINGS.labels(source="cache").inc(len(input) - len(missing))
+
+        if missing:
+            # Duplicate texts in a batch are embedded once
+            missing_texts = list(dict.fromkeys(input[i] for i in missing))
+            computed = self.embedding_function(missing_texts)
+            EMBEDDINGS.labels(source="model").inc(len(missing_texts))
+            self.cache.put_many(missing_texts, computed)
+            by_text = {
+                text: np.asarray(vector, dtype=np.float32)
+                for text, vector in zip(missing_texts, computed)
+            }
+            for i in missing:
+                vectors[i] = by_text[input[i]]
+
+        return vectors
@@ -3,14 +3,139 @@ Hybrid Search Module
 Combines semantic (vector) and lexical (BM25) search with fusion
 """
 
-from rank_bm25 import BM25Okapi
-from typing import List, Dict, Any, Tuple
+from collections import Counter
+from typing import List, Dict, Any, Tuple, Optional, Sequence
 import logging
 import numpy as np
+from scipy import sparse
+
+from .text_analysis import analyze
 
 logger = logging.getLogger(__name__)
 
 
+class SparseBM25:
+    """
+    BM25 over a CSR term-document matrix
+
+    Each row holds a term's postings with the full BM25 weight precomputed
+    (IDF x saturated, length-normalized term frequency), so scoring a batch of
+    queries is one sparse matrix product and top-k is an argpartition over the
+    non-zero scores only.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        Initialize an empty engine
+
+        Args:
+            k1: BM25 term frequency saturation
+            b: BM25 length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self.vocabulary: Dict[str, int] = {}
+        self.n_docs = 0
+        # (n_terms x n_docs) BM25 weights
+        self.matrix = sparse.csr_matrix((0, 0), dtype=np.float32)
+
+    def fit(self, tokenized_docs: Sequence[List[str]]) -> "SparseBM25":
+        """
+        Build the weight matrix
+
+        Args:
+            tokenized_docs: One token list per document
+
+        Returns:
+            self
+        """
+        vocabulary: Dict[str, int] = {}
+        term_ids: List[int] = []
+        term_freqs: List[int] = []
+        unique_terms = np.zeros(len(tokenized_docs), dtype=np.int64)
+        doc_lengths = np.zeros(len(tokenized_docs), dtype=np.float32)
+
+        for doc_idx, tokens in enumerate(tokenized_docs):
+            counts = Counter(tokens)
+            term_ids.extend(vocabulary.setdefault(term, len(vocabulary)) for term in counts)
+            term_freqs.extend(counts.values())
+            unique_terms[doc_idx] = len(counts)
+            doc_lengths[doc_idx] = len(tokens)
+
+        n_docs = len(tokenized_docs)
+        doc_ids = np.repeat(np.arange(n_docs), unique_terms)
+        tf_matrix = sparse.csr_matrix(
+            (np.asarray(term_freqs, dtype=np.float32), (np.asarray(term_ids, dtype=np.int64), doc_ids)),
+            shape=(len(vocabulary), n_docs)
+        )
+
+        # Non-negative IDF (Lucene variant) so common terms never penalize
+        df = np.diff(tf_matrix.indptr)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        avg_length = max(float(doc_lengths.mean()) if n_docs else 0.0, 1.0)
+        norms = self.k1 * (1 - self.b + self.b * doc_lengths / avg_length)
+
+        tf = tf_matrix.data
+        row_idf = np.repeat(idf, df)
+        tf_matrix.data = (row_idf * tf * (self.k1 + 1) / (tf + norms[tf_matrix.indices])).astype(np.float32)
+
+        self.vocabulary = vocabulary
+        self.n_docs = n_docs
+        self.matrix = tf_matrix
+        return self
+
+    def _query_matrix(self, tokenized_queries: Sequence[List[str]]) -> sparse.csr_matrix:
+        """(n_queries x n_terms) indicator of the known query terms"""
+        rows, cols = [], []
+        for query_idx, tokens in enumerate(tokenized_queries):
+            term_ids = {self.vocabulary[term] for term in tokens if term in self.vocabulary}
+            rows.extend([query_idx] * len(term_ids))
+            cols.extend(term_ids)
+        return sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+            shape=(len(tokenized_queries), len(self.vocabulary))
+        )
+
+    def get_scores(self, query_tokens: List[str]) -> np.ndarray:
+        """Dense BM25 scores of every document for one query"""
+        scores = self._query_matrix([query_tokens]) @ self.matrix
+        return scores.toarray().ravel()
+
+    def top_k(
+        self,
+        tokenized_queries: Sequence[List[str]],
+        k: int = 10
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        Best documents for a batch of queries
+
+        Args:
+            tokenized_queries: One token list per query
+            k: Results per query
+
+        Returns:
+            Per query, (document index, score) pairs by decreasing score
+            (documents sharing no term with the query are left out)
+        """
+        if not self.n_docs or k <= 0:
+            return [[] for _ in tokenized_queries]
+
+        scores = (self._query_matrix(tokenized_queries) @ self.matrix).tocsr()
+
+        results = []
+        for query_idx in range(scores.shape[0]):
+            start, end = scores.indptr[query_idx], scores.indptr[query_idx + 1]
+            doc_idx = scores.indices[start:end]
+            doc_scores = scores.data[start:end]
+            if len(doc_scores) > k:
+                best = np.argpartition(-doc_scores, k - 1)[:k]
+                doc_idx, doc_scores = doc_idx[best], doc_scores[best]
+            order = np.argsort(-doc_scores, kind="stable")
+            results.append([(int(doc_idx[i]), float(doc_scores[i])) for i in order])
+        return results
+
+
 class HybridSearcher:
     """Hybrid search combining vector similarity and BM25 keyword matching"""
     
@@ -47,10 +172,10 @@ class HybridSearcher:
         self.ids = ids
         
         # Tokenize documents for BM25
-        tokenized_docs = [doc.lower().split() for doc in documents]
+        tokenized_docs = [analyze(doc) for doc in documents]
         
         try:
-            self.bm25_index = BM25Okapi(tokenized_docs)
+            self.bm25_index = SparseBM25().fit(tokenized_docs)
             logger.info(f"BM25 index built with {len(documents)} documents")
         except Exception as e:
             logger.error(f"Error building BM25 index: {e}")
@@ -71,33 +196,42 @@ class HybridSearcher:
             logger.warning("BM25 index not built. Call index_documents first.")
             return []
         
-        # Tokenize query
-        tokenized_query = query.lower().split()
-        
-        # Get BM25 scores
-        scores = self.bm25_index.get_scores(tokenized_query)
-        
-        # Get top-k indices
-        top_indices = np.argsort(scores)[::-1][:top_k]
-        
-        results = []
-        for idx in top_indices:
-            if scores[idx] > 0:  # Only include non-zero scores
-                results.append((
-                    self.documents[idx],
-                    float(scores[idx]),
-                    self.metadatas[idx],
-                    self.ids[idx]
-                ))
-        
+        results = self.search_bm25_batch([query], top_k=top_k)[0]
         logger.info(f"BM25 search returned {len(results)} results")
         return results
     
+    def search_bm25_batch(
+        self,
+        queries: List[str],
+        top_k: int = 10
+    ) -> List[List[Tuple[str, float, Dict, str]]]:
+        """
+        BM25 search for several queries in one sparse product
+        
+        Args:
+            queries: Search queries
+            top_k: Number of results per query
+            
+        Returns:
+            Per query, list of (document, score, metadata, id) tuples
+        """
+        if not self.bm25_index:
+            logger.warning("BM25 index not built. Call index_documents first.")
+            return [[] for _ in queries]
+        
+        # Only documents sharing a term with the query (non-zero scores) are returned
+        top = self.bm25_index.top_k([analyze(query) for query in queries], k=top_k)
+        return [
+            [(self.documents[idx], score, self.metadatas[idx], self.ids[idx]) for idx, score in hits]
+            for hits in top
+        ]
+    
     def hybrid_search(
         self,
         query: str,
         vector_results: Dict[str, Any],
-        top_k: int = 5
+        top_k: int = 5,
+        bm25_results: Optional[List[Tuple[str, float, Dict, str]]] = None
     ) -> List[Dict[str, Any]]:
         """
         Combine vector search and BM25 using Reciprocal Rank Fusion (RRF)
@@ -106,6 +240,9 @@ class HybridSearcher:
             query: Search query
             vector_results: Results from ChromaDB vector search
             top_k: Final number of results to return
+            bm25_results: Keyword results over the whole collection
+                          (e.g. ChromaManager.search_lexical). If None, BM25 is
+                          computed over the vector results only.
             
         Returns:
             List of ranked results with scores
@@ -116,12 +253,14 @@ class HybridSearcher:
         vector_distances = vector_results['distances'][0] if vector_results['distances'] else []
         vector_ids = vector_results['ids'][0] if vector_results['ids'] else []
         
-        # Build index if not already done
-        if not self.bm25_index and vector_docs:
-            self.index_documents(vector_docs, vector_metas, vector_ids)
-        
-        # Get BM25 results
-        bm25_results = self.search_bm25(query, top_k=top_k * 2)
+        # Fall back to a throwaway index over the vector hits (never cached on
+        # self, since the searcher is shared between users)
+        if bm25_results is None:
+            bm25_results = []
+            if vector_docs:
+                transient = HybridSearcher(alpha=self.alpha)
+                transient.index_documents(vector_docs, vector_metas, vector_ids)
+                bm25_results = transient.search_bm25(query, top_k=top_k * 2)
         
         # Apply Reciprocal Rank Fusion (RRF)
         rrf_scores = {}
@@ -185,7 +324,8 @@ class HybridSearcher:
         query: str,
         vector_results: Dict[str, Any],
         filter_func=None,
-        top_k: int = 5
+        top_k: int = 5,
+        bm25_results: Optional[List[Tuple[str, float, Dict, str]]] = None
     ) -> List[Dict[str, Any]]:
         """
         Hybrid search with custom filtering
@@ -195,11 +335,14 @@ class HybridSearcher:
             vector_results: Vector search results
             filter_func: Function to filter results (takes metadata, returns bool)
             top_k: Number of results
+            bm25_results: Keyword results (see hybrid_search)
             
         Returns:
             Filtered and ranked results
         """
-        results = self.hybrid_search(query, vector_results, top_k=top_k * 2)
+        results = self.hybrid_search(
+            query, vector_results, top_k=top_k * 2, bm25_results=bm25_results
+        )
         
         if filter_func:
             results = [r for r in results if filter_func(r["metadata"])]
@@ -0,0 +1,553 @@
+"""
+Ingestion Pipeline Module
+PDF -> per-page text extraction (digital or OCR) -> chunking -> embedding -> indexing
+"""
+
+import hashlib
+import logging
+import time
+from io import BytesIO
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Callable
+
+from pypdf import PdfReader
+
+from .ocr_processor import iter_pdf_page_images, count_pdf_pages
+from .metrics import INGESTION_STAGE_SECONDS, PAGES_EXTRACTED
+from .text_analysis import analyze
+
+logger = logging.getLogger(__name__)
+
+# progress(stage, fraction) with fraction in [0, 1]
+ProgressCallback = Callable[[str, float], None]
+
+
+def document_fingerprint(file_content: bytes) -> str:
+    """SHA-256 of the raw PDF bytes"""
+    return hashlib.sha256(file_content).hexdigest()
+
+
+def page_fingerprint(page) -> str:
+    """
+    SHA-256 of a pypdf page's drawing instructions and embedded images
+
+    Computed without rendering or extracting text, so an unchanged page can
+    be recognized before any OCR work.
+    """
+    h = hashlib.sha256()
+    try:
+        h.update(str(page.mediabox).encode())
+        contents = page.get_contents()
+        if contents is not None:
+            h.update(contents.get_data())
+
+        resources = page.get("/Resources")
+        xobjects = resources.get_object().get("/XObject") if resources is not None else None
+        if xobjects is not None:
+            for name, ref in sorted(xobjects.get_object().items()):
+                xobject = ref.get_object()
+                h.update(name.encode())
+                # Raw (still encoded) stream: no need to decode images
+                h.update(getattr(xobject, "_data", None) or xobject.get_data())
+    except Exception as e:
+        logger.debug(f"Falling back to text fingerprint: {e}")
+        h.update((page.extract_text() or "").encode())
+    return h.hexdigest()
+
+
+def make_chunk_id(document_name: str, page_number: int, page_hash: str, chunk_index: int) -> str:
+    """Deterministic chunk id: same document page content -> same ids"""
+    name_key = hashlib.sha1(document_name.encode()).hexdigest()[:16]
+    return f"{name_key}-p{page_number}-{page_hash[:12]}-c{chunk_index}"
+
+
+class IngestionError(Exception):
+    """Ingestion failure carrying the HTTP status it should map to"""
+
+    def __init__(self, message: str, status_code: int = 500):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class IngestionPipeline:
+    """Runs the full document ingestion with per-stage timings"""
+
+    STAGES = ["extract", "chunk", "embed", "index", "store"]
+
+    def __init__(
+        self,
+        chroma_manager,
+        chunker,
+        ocr_processor,
+        ocr_engine=None,
+        pdf_storage_dir: Optional[str] = None,
+        ocr_dpi: int = 200,
+        render_window: int = 4,
+        min_digital_chars: int = 50,
+        embed_batch_size: int = 64
+    ):
+        """
+        Initialize ingestion pipeline
+
+        Args:
+            chroma_manager: ChromaManager used for embedding and indexing
+            chunker: SmartChunker used to split pages
+            ocr_processor: OCRProcessor used for scanned pages
+            ocr_engine: Optional ParallelOCREngine (pages OCR'd in a process pool)
+            pdf_storage_dir: Where to keep a copy of the PDF (None = don't store)
+            ocr_dpi: Rendering resolution for OCR
+            render_window: Pages rendered at once for OCR (bounds peak memory)
+            min_digital_chars: Below this, a page's embedded text is OCR'd instead
+            embed_batch_size: Number of chunks embedded per batch
+        """
+        self.chroma_manager = chroma_manager
+        self.chunker = chunker
+        self.ocr_processor = ocr_processor
+        self.ocr_engine = ocr_engine
+        self.pdf_storage_dir = Path(pdf_storage_dir) if pdf_storage_dir else None
+        self.ocr_dpi = ocr_dpi
+        self.render_window = render_window
+        self.min_digital_chars = min_digital_chars
+        self.embed_batch_size = embed_batch_size
+
+    def extract_pages(
+        self,
+        file_content: bytes,
+        progress: Optional[ProgressCallback] = None,
+        known_page_hashes: Optional[Dict[int, str]] = None
+    ) -> Tuple[List[Tuple[str, int]], str, Dict[int, str]]:
+        """
+        Extract text page by page, routing each page to digital extraction or OCR
+
+        Pages whose embedded text has at least min_digital_chars characters
+        keep it; only the other (scanned / image-only) pages are rendered and
+        OCR'd. If OCR finds nothing on a page, its short digital text is kept.
+        Pages whose fingerprint matches known_page_hashes are skipped.
+
+        Args:
+            file_content: Raw PDF bytes
+            progress: Optional progress callback
+            known_page_hashes: {page_number: hash} already indexed
+
+        Returns:
+            Tuple of ([(text, page_number)], method, {page_number: hash}) with
+            method "digital", "ocr", "hybrid" or "unchanged"; the hashes cover
+            every page of the document
+        """
+        known_page_hashes = known_page_hashes or {}
+        digital_text: Dict[int, str] = {}
+        ocr_page_numbers: List[int] = []
+        page_hashes: Dict[int, str] = {}
+        skipped = 0
+
+        try:
+            pdf_reader = PdfReader(BytesIO(file_content))
+            n_pages = len(pdf_reader.pages)
+            for page_num, page in enumerate(pdf_reader.pages, 1):
+                page_hashes[page_num] = page_fingerprint(page)
+                if known_page_hashes.get(page_num) == page_hashes[page_num]:
+                    skipped += 1
+                    continue
+
+                try:
+                    page_text = page.extract_text() or ""
+                except Exception as e:
+                    logger.warning(f"Digital extraction failed on page {page_num}: {e}")
+                    page_text = ""
+
+                if len(page_text.strip()) >= self.min_digital_chars:
+                    digital_text[page_num] = page_text
+                else:
+                    ocr_page_numbers.append(page_num)
+                    if page_text.strip():
+                        digital_text[page_num] = page_text
+        except Exception as e:
+            # Unparseable by pypdf: OCR every page, keyed by the whole-file hash
+            logger.warning(f"Digital extraction failed ({e}), OCR on every page")
+            n_pages = count_pdf_pages(file_content)
+            document_hash = document_fingerprint(file_content)
+            page_hashes = {page_num: document_hash for page_num in range(1, n_pages + 1)}
+            digital_text = {}
+            ocr_page_numbers = list(range(1, n_pages + 1))
+            skipped = 0
+
+        n_digital = n_pages - skipped - len(ocr_page_numbers)
+        PAGES_EXTRACTED.labels(method="unchanged").inc(skipped)
+        PAGES_EXTRACTED.labels(method="digital").inc(n_digital)
+        PAGES_EXTRACTED.labels(method="ocr").inc(len(ocr_page_numbers))
+        logger.info(
+            f"PDF has {n_pages} pages: {skipped} unchanged, {n_digital} digital, "
+            f"{len(ocr_page_numbers)} to OCR"
+        )
+        if progress:
+            progress("extract", (skipped + n_digital) / max(n_pages, 1))
+
+        ocr_text = {}
+        if ocr_page_numbers:
+            def ocr_progress(done: int):
+                if progress:
+                    progress("extract", (skipped + n_digital + done) / max(n_pages, 1))
+
+            ocr_text = self._extract_pages_ocr(file_content, ocr_page_numbers, ocr_progress)
+
+        pages_text = []
+        for page_num in range(1, n_pages + 1):
+            page_text = ocr_text.get(page_num) or digital_text.get(page_num)
+            if page_text and page_text.strip():
+                pages_text.append((page_text, page_num))
+
+        if skipped == n_pages:
+            method = "unchanged"
+        elif not ocr_page_numbers:
+            method = "digital"
+        elif n_digital == 0:
+            method = "ocr"
+        else:
+            method = "hybrid"
+        return pages_text, method, page_hashes
+
+    def _extract_pages_ocr(
+        self,
+        file_content: bytes,
+        page_numbers: List[int],
+        on_page_done: Optional[Callable[[int], None]] = None
+    ) -> Dict[int, str]:
+        """OCR the given pages (in parallel when an OCR engine is set)"""
+        try:
+            logger.info(f"Streaming {len(page_numbers)} pages to OCR ({self.render_window} per render)")
+
+            # Pages are rendered lazily, so peak memory is bounded by the window
+            pages = iter_pdf_page_images(
+                file_content,
+                dpi=self.ocr_dpi,
+                window=self.render_window,
+                page_numbers=page_numbers
+            )
+            if self.ocr_engine is not None:
+                results = self.ocr_engine.iter_pages(pages, preprocess=True)
+            else:
+                results = self.ocr_processor.iter_pdf_pages(pages, preprocess=True)
+
+            ocr_text = {}
+            for done, (page_num, page_text, confidence) in enumerate(results, 1):
+                if page_text:
+                    ocr_text[page_num] = page_text
+                    logger.info(
+                        f"Page {page_num}: {len(page_text)} chars, confidence: {confidence:.2f}"
+                    )
+                if on_page_done:
+                    on_page_done(done)
+
+            return ocr_text
+        except Exception as e:
+            raise IngestionError(f"Erreur OCR: {e}. Vérifiez les dépendances.", status_code=500)
+
+    def store_pdf(self, user_id: str, document_name: str, file_content: bytes) -> Optional[str]:
+        """
+        Save a copy of the PDF in local storage (non-blocking on failure)
+
+        Returns:
+            Relative storage path, or None if not stored
+        """
+        if self.pdf_storage_dir is None:
+            return None
+
+        try:
+            user_dir = self.pdf_storage_dir / user_id
+            user_dir.mkdir(parents=True, exist_ok=True)
+            with open(user_dir / document_name, "wb") as f:
+                f.write(file_content)
+            return f"{user_id}/{document_name}"
+        except Exception as e:
+            logger.warning(f"Could not store PDF locally (document stays indexed): {e}")
+            return None
+
+    def prepare(
+        self,
+        document_name: str,
+        file_content: bytes,
+        existing: Optional[Dict[str, Any]] = None,
+        progress: Optional[ProgressCallback] = None
+    ) -> Dict[str, Any]:
+        """
+        Extract and chunk a document without touching the vector store (safe
+        to call from worker processes)
+
+        Args:
+            document_name: File name used as document_name metadata
+            file_content: Raw PDF bytes
+            existing: Fingerprint of the indexed version
+                      (ChromaManager.get_document_fingerprint), None if new
+            progress: Optional progress callback
+
+        Returns:
+            Dict with the chunks, metadatas and ids to add, the stale ids to
+            delete, the kept ids, the manifest pages mapping, the extraction
+            method and the extract/chunk timings
+        """
+        timings = {}
+        document_hash = document_fingerprint(file_content)
+        existing_pages = existing["pages"] if existing else {}
+        known_page_hashes = {
+            page_num: page["page_hash"]
+            for page_num, page in existing_pages.items()
+            if page["page_hash"]
+        }
+
+        # --- Extraction (changed pages only) ---
+        start = time.perf_counter()
+        pages_text, method, page_hashes = self.extract_pages(
+            file_content, progress, known_page_hashes=known_page_hashes
+        )
+        timings["extract"] = time.perf_counter() - start
+
+        changed_pages = {
+            page_num for page_num, page_hash in page_hashes.items()
+            if known_page_hashes.get(page_num) != page_hash
+        }
+        stale_pages = changed_pages | (set(existing_pages) - set(page_hashes))
+        kept_ids = [
+            chunk_id
+            for page_num, page in existing_pages.items() if page_num not in stale_pages
+            for chunk_id in page["ids"]
+        ]
+        stale_ids = [
+            chunk_id
+            for page_num, page in existing_pages.items() if page_num in stale_pages
+            for chunk_id in page["ids"]
+        ]
+
+        if not pages_text and not kept_ids:
+            raise IngestionError("Aucun texte n'a pu être extrait du document.", status_code=400)
+
+        # Pages without text (failed OCR, blank scan) get no hash in the manifest, and
+        # the document no whole-file hash, so the next upload of this file retries them
+        empty_pages = changed_pages - {page_num for _, page_num in pages_text}
+        if empty_pages:
+            logger.warning(
+                f"'{document_name}': no text on pages {sorted(empty_pages)}, they will be retried on the next upload"
+            )
+        recorded_hash = None if empty_pages else document_hash
+
+        # --- Chunking ---
+        start = time.perf_counter()
+        try:
+            chunks_with_metadata = self.chunker.chunk_by_pages(
+                pages=pages_text,
+                document_name=document_name
+            )
+        except Exception as e:
+            raise IngestionError(f"Erreur lors du découpage: {e}", status_code=500)
+        timings["chunk"] = time.perf_counter() - start
+        if progress:
+            progress("chunk", 1.0)
+
+        if not chunks_with_metadata and not kept_ids:
+            raise IngestionError("Le document n'a pas pu être découpé.", status_code=400)
+
+        chunks = [item["content"] for item in chunks_with_metadata]
+        # BM25 terms, analyzed once here (in the worker process for bulk imports)
+        tokens = [analyze(chunk) for chunk in chunks]
+        metadatas = []
+        ids = []
+        for item in chunks_with_metadata:
+            metadata = item["metadata"]
+            page_hash = page_hashes[metadata["page_number"]]
+            if recorded_hash:
+                metadata["document_hash"] = recorded_hash
+            metadata["page_hash"] = page_hash
+            metadatas.append(metadata)
+            ids.append(make_chunk_id(document_name, metadata["page_number"], page_hash, metadata["chunk_index"]))
+
+        # Manifest entry: every page, with the chunk ids it will have once written
+        pages = {
+            page_num: {
+                "page_hash": None if page_num in empty_pages else page_hash,
+                "ids": [] if page_num in stale_pages else list(existing_pages.get(page_num, {}).get("ids", []))
+            }
+            for page_num, page_hash in page_hashes.items()
+        }
+        for chunk_id, metadata in zip(ids, metadatas):
+            pages[metadata["page_number"]]["ids"].append(chunk_id)
+
+        return {
+            "document_name": document_name,
+            "document_hash": recorded_hash,
+            "extraction_method": method,
+            "size_bytes": len(file_content),
+            "pages": pages,
+            "pages_processed": len(changed_pages),
+            "chunks": chunks,
+            "tokens": tokens,
+            "metadatas": metadatas,
+            "ids": ids,
+            "stale_ids": stale_ids,
+            "kept_ids": kept_ids,
+            "timings": timings
+        }
+
+    def embed_chunks(self, chunks: List[str], progress: Optional[ProgressCallback] = None) -> List[List[float]]:
+        """Embed chunks in batches of embed_batch_size"""
+        try:
+            embeddings = []
+            for i in range(0, len(chunks), self.embed_batch_size):
+                embeddings.extend(
+                    self.chroma_manager.embed_documents(chunks[i:i + self.embed_batch_size])
+                )
+                if progress:
+                    progress("embed", min(i + self.embed_batch_size, len(chunks)) / len(chunks))
+            return embeddings
+        except Exception as e:
+            raise IngestionError(f"Erreur d'indexation: {e}", status_code=500)
+
+    def write(
+        self,
+        user_id: str,
+        prepared_documents: List[Dict[str, Any]],
+        embeddings: List[List[float]]
+    ) -> Tuple[int, int]:
+        """
+        Write prepared documents to the vector store in one delete + one add
+
+        Args:
+            user_id: User identifier
+            prepared_documents: Results of prepare()
+            embeddings: Embeddings of all their chunks, in order
+
+        Returns:
+            (chunks added, chunks deleted)
+        """
+        stale_ids = [chunk_id for prepared in prepared_documents for chunk_id in prepared["stale_ids"]]
+        chunks = [chunk for prepared in prepared_documents for chunk in prepared["chunks"]]
+        tokens = [terms for prepared in prepared_documents for terms in prepared["tokens"]]
+        metadatas = [metadata for prepared in prepared_documents for metadata in prepared["metadatas"]]
+        ids = [chunk_id for prepared in prepared_documents for chunk_id in prepared["ids"]]
+
+        try:
+            deleted = self.chroma_manager.delete_chunks(user_id, stale_ids) if stale_ids else 0
+            count = 0
+            if chunks:
+                count = self.chroma_manager.add_documents(
+                    user_id=user_id,
+                    chunks=chunks,
+                    metadatas=metadatas,
+                    ids=ids,
+                    embeddings=embeddings,
+                    tokens=tokens
+                )
+            for prepared in prepared_documents:
+                # No whole-file hash while some pages still lack text
+                if prepared["kept_ids"] and prepared["document_hash"]:
+                    self.chroma_manager.update_metadatas(
+                        user_id, prepared["kept_ids"], {"document_hash": prepared["document_hash"]}
+                    )
+        except Exception as e:
+            raise IngestionError(f"Erreur d'indexation: {e}", status_code=500)
+        return count, deleted
+
+    def record(self, user_id: str, prepared: Dict[str, Any], storage_path: Optional[str] = None):
+        """Record a written document in the manifest"""
+        try:
+            self.chroma_manager.record_document(
+                user_id, prepared["document_name"], prepared["document_hash"], prepared["pages"],
+                extraction_method=prepared["extraction_method"],
+                size_bytes=prepared["size_bytes"],
+                storage_path=storage_path
+            )
+        except Exception as e:
+            raise IngestionError(f"Erreur d'indexation: {e}", status_code=500)
+
+    def run(
+        self,
+        user_id: str,
+        document_name: str,
+        file_content: bytes,
+        progress: Optional[ProgressCallback] = None
+    ) -> Dict[str, Any]:
+        """
+        Ingest one PDF for a user (incrementally if it was already indexed)
+
+        A byte-identical re-upload is a no-op, unless some pages produced no
+        text last time (they are extracted again). For an edited document only
+        the pages whose fingerprint changed are extracted, chunked and embedded;
+        chunks of changed or removed pages are replaced.
+
+        Args:
+            user_id: User identifier
+            document_name: File name used as document_name metadata
+            file_content: Raw PDF bytes
+            progress: Optional progress callback
+
+        Returns:
+            Dict with status ("indexed", "updated" or "unchanged"), page/chunk
+            counts, storage path and per-stage timings (seconds)
+        """
+        timings = {}
+        document_hash = document_fingerprint(file_content)
+        existing = self.chroma_manager.get_document_fingerprint(user_id, document_name)
+
+        # --- 0. Unchanged document: nothing to do ---
+        if existing and existing["document_hash"] == document_hash:
+            logger.info(f"'{document_name}' unchanged for user {user_id}, skipping ingestion")
+            start = time.perf_counter()
+            storage_path = self.store_pdf(user_id, document_name, file_content)
+            timings["store"] = time.perf_counter() - start
+            return {
+                "document_name": document_name,
+                "document_hash": document_hash,
+                "status": "unchanged",
+                "extraction_method": "unchanged",
+                "pages": len(existing["pages"]),
+                "pages_processed": 0,
+                "chunks_indexed": 0,
+                "chunks_deleted": 0,
+                "storage_path": storage_path,
+                "timings": timings
+            }
+
+        # --- 1-2. Extraction (changed pages only) + chunking ---
+        prepared = self.prepare(document_name, file_content, existing=existing, progress=progress)
+        timings.update(prepared["timings"])
+
+        # --- 3. Embedding ---
+        start = time.perf_counter()
+        embeddings = self.embed_chunks(prepared["chunks"], progress)
+        timings["embed"] = time.perf_counter() - start
+
+        # --- 4. Indexing (replace stale pages, refresh kept chunks) ---
+        start = time.perf_counter()
+        count, deleted = self.write(user_id, [prepared], embeddings)
+        timings["index"] = time.perf_counter() - start
+        if progress:
+            progress("index", 1.0)
+
+        # --- 5. Local PDF storage + manifest ---
+        start = time.perf_counter()
+        storage_path = self.store_pdf(user_id, document_name, file_content)
+        self.record(user_id, prepared, storage_path)
+        timings["store"] = time.perf_counter() - start
+        if progress:
+            progress("store", 1.0)
+
+        for stage, seconds in timings.items():
+            INGESTION_STAGE_SECONDS.labels(stage=stage).observe(seconds)
+
+        status = "updated" if existing else "indexed"
+        logger.info(
+            f"Ingested '{document_name}' for user {user_id} ({status}): "
+            f"{prepared['pages_processed']}/{len(prepared['pages'])} pages processed, "
+            f"+{count}/-{deleted} chunks ({prepared['extraction_method']}) in {sum(timings.values()):.2f}s"
+        )
+
+        return {
+            "document_name": document_name,
+            "document_hash": document_hash,
+            "status": status,
+            "extraction_method": prepared["extraction_method"],
+            "pages": len(prepared["pages"]),
+            "pages_processed": prepared["pages_processed"],
+            "chunks_indexed": count,
+            "chunks_deleted": deleted,
+            "storage_path": storage_path,
+            "timings": timings
+        }
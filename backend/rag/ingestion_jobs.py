@@ -0,0 +1,249 @@
+"""
+Ingestion Jobs Module
+Background ingestion queue with a SQLite job table that survives restarts
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Any, Iterator, Optional
+
+from .ingestion import IngestionPipeline, IngestionError
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionJobStore:
+    """SQLite-backed table of ingestion jobs"""
+
+    def __init__(self, db_path: str = "./ingestion_jobs.db"):
+        """
+        Initialize job store
+
+        Args:
+            db_path: Path of the SQLite database file
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ingestion_jobs (
+                    id TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    file_path TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    progress REAL NOT NULL DEFAULT 0,
+                    timings TEXT NOT NULL DEFAULT '{}',
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_user ON ingestion_jobs (user_id, created_at)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Connection committed on success (rolled back on error) and closed on exit"""
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["timings"] = json.loads(job["timings"] or "{}")
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def create(self, user_id: str, filename: str, file_path: str, job_id: Optional[str] = None) -> str:
+        """Insert a new queued job and return its id"""
+        job_id = job_id or str(uuid.uuid4())
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO ingestion_jobs
+                    (id, user_id, filename, file_path, status, created_at, updated_at)
+                VALUES (?, ?, ?, ?, 'queued', ?, ?)
+                """,
+                (job_id, user_id, filename, file_path, now, now)
+            )
+        return job_id
+
+    def update(self, job_id: str, **fields):
+        """Update job columns (timings/result are JSON-encoded)"""
+        for key in ("timings", "result"):
+            if key in fields and fields[key] is not None:
+                fields[key] = json.dumps(fields[key])
+        fields["updated_at"] = time.time()
+
+        columns = ", ".join(f"{key} = ?" for key in fields)
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                f"UPDATE ingestion_jobs SET {columns} WHERE id = ?",
+                (*fields.values(), job_id)
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job by id"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM ingestion_jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def list_for_user(self, user_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """List a user's most recent jobs"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM ingestion_jobs WHERE user_id = ? ORDER BY created_at DESC LIMIT ?",
+                (user_id, limit)
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def list_unfinished(self) -> List[Dict[str, Any]]:
+        """Jobs that were queued or running when the process stopped"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM ingestion_jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+
+class IngestionJobQueue:
+    """Local worker pool running IngestionPipeline jobs in the background"""
+
+    def __init__(
+        self,
+        pipeline: IngestionPipeline,
+        store: IngestionJobStore,
+        spool_dir: str = "./ingestion_spool",
+        max_workers: int = 2
+    ):
+        """
+        Initialize job queue
+
+        Args:
+            pipeline: Pipeline executed for each job
+            store: Job table
+            spool_dir: Where uploaded PDFs wait until their job completes
+            max_workers: Number of documents ingested in parallel
+        """
+        self.pipeline = pipeline
+        self.store = store
+        self.spool_dir = Path(spool_dir)
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+
+    def submit(self, user_id: str, filename: str, file_content: bytes) -> str:
+        """
+        Spool a PDF and queue its ingestion
+
+        Args:
+            user_id: User identifier
+            filename: Document name
+            file_content: Raw PDF bytes
+
+        Returns:
+            Job id
+        """
+        job_id = str(uuid.uuid4())
+        file_path = self.spool_dir / f"{job_id}.pdf"
+        with open(file_path, "wb") as f:
+            f.write(file_content)
+
+        self.store.create(user_id, filename, str(file_path), job_id=job_id)
+        self.executor.submit(self._run, job_id)
+        logger.info(f"Queued ingestion job {job_id} for '{filename}' (user {user_id})")
+        return job_id
+
+    def recover(self) -> int:
+        """
+        Re-queue jobs interrupted by a restart
+
+        Returns:
+            Number of jobs re-queued
+        """
+        recovered = 0
+        for job in self.store.list_unfinished():
+            if not Path(job["file_path"]).exists():
+                self.store.update(job["id"], status="failed", error="Fichier source perdu au redémarrage")
+                continue
+            self.store.update(job["id"], status="queued", stage=None, progress=0.0, timings={})
+            self.executor.submit(self._run, job["id"])
+            recovered += 1
+
+        if recovered:
+            logger.info(f"Recovered {recovered} unfinished ingestion jobs")
+        return recovered
+
+    def shutdown(self, wait: bool = False):
+        """Stop the worker pool (unfinished jobs are recovered on next start)"""
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, job_id: str):
+        """Worker entry point: run the pipeline and record progress"""
+        job = self.store.get(job_id)
+        if job is None or job["status"] not in ("queued", "running"):
+            return
+
+        file_path = Path(job["file_path"])
+        stage_index = {stage: i for i, stage in enumerate(IngestionPipeline.STAGES)}
+        n_stages = len(IngestionPipeline.STAGES)
+        stage_started = {"stage": None, "at": time.perf_counter()}
+        timings: Dict[str, float] = {}
+        last_update = {"at": 0.0}
+
+        def progress(stage: str, fraction: float):
+            now = time.perf_counter()
+            if stage != stage_started["stage"]:
+                if stage_started["stage"] is not None:
+                    timings[stage_started["stage"]] = now - stage_started["at"]
+                stage_started.update(stage=stage, at=now)
+            # Throttle SQLite writes to a few per second
+            if now - last_update["at"] < 0.25 and fraction < 1.0:
+                return
+            last_update["at"] = now
+            overall = (stage_index.get(stage, 0) + fraction) / n_stages
+            self.store.update(job_id, stage=stage, progress=round(overall, 4), timings=timings)
+
+        self.store.update(job_id, status="running", stage="extract", progress=0.0)
+        try:
+            file_content = file_path.read_bytes()
+            result = self.pipeline.run(
+                user_id=job["user_id"],
+                document_name=job["filename"],
+                file_content=file_content,
+                progress=progress
+            )
+            self.store.update(
+                job_id,
+                status="completed",
+                stage=None,
+                progress=1.0,
+                timings=result["timings"],
+                result=result
+            )
+            file_path.unlink(missing_ok=True)
+        except Exception as e:
+            logger.error(f"Ingestion job {job_id} failed: {e}")
+            error = str(e) if isinstance(e, IngestionError) else f"Erreur interne: {e}"
+            self.store.update(job_id, status="failed", error=error, timings=timings)
+            file_path.unlink(missing_ok=True)
@@ -0,0 +1,712 @@
+"""
+Lexical Index Module
+Persistent per-user BM25 index kept in sync with the vector store collections
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import List, Dict, Any, Tuple, Optional
+
+import numpy as np
+from scipy import sparse
+
+from .text_analysis import analyze, ANALYZER_VERSION
+
+logger = logging.getLogger(__name__)
+
+# The change log is folded into the snapshot once it exceeds both this size
+# and COMPACT_RATIO x the snapshot size (amortized O(1) rewrite per change)
+COMPACT_MIN_BYTES = 4 * 1024 * 1024
+COMPACT_RATIO = 0.5
+
+# Segment merging: the delta segments are folded into one past MAX_SEGMENTS,
+# and into the main segment once they hold MERGE_RATIO x its live chunks or
+# deletions leave more than MAX_DEAD_RATIO of its rows dead
+MAX_SEGMENTS = 8
+MERGE_RATIO = 0.25
+MAX_DEAD_RATIO = 0.25
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokenize text for BM25 (same analyzer as HybridSearcher)"""
+    return analyze(text)
+
+
+class _Segment:
+    """
+    Term frequencies of a batch of chunks (CSC matrix, one column per term)
+
+    Never modified once built, except `alive`, which deletions replace
+    instead of updating in place so searches keep a consistent view.
+    """
+
+    def __init__(self, ids: List[str], terms: List[str], tf: sparse.csc_matrix, lengths: np.ndarray):
+        self.ids = ids
+        self.terms = terms
+        self.vocabulary = {term: col for col, term in enumerate(terms)}
+        self.tf = tf
+        self.lengths = lengths
+        self.alive = np.ones(len(ids), dtype=bool)
+        self.live = len(ids)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_tokens(cls, ids: List[str], tokens: List[List[str]]) -> "_Segment":
+        vocabulary: Dict[str, int] = {}
+        rows, cols, counts = [], [], []
+        for row, doc_tokens in enumerate(tokens):
+            for term, count in Counter(doc_tokens).items():
+                rows.append(row)
+                cols.append(vocabulary.setdefault(term, len(vocabulary)))
+                counts.append(count)
+        tf = sparse.csc_matrix(
+            (np.asarray(counts, dtype=np.float32), (rows, cols)),
+            shape=(len(ids), len(vocabulary))
+        )
+        lengths = np.array([len(doc_tokens) for doc_tokens in tokens], dtype=np.float32)
+        return cls(list(ids), list(vocabulary), tf, lengths)
+
+    @classmethod
+    def merge(cls, segments: List["_Segment"], alive: List[np.ndarray]) -> "_Segment":
+        """Segment holding the rows of `segments` flagged in `alive`"""
+        vocabulary: Dict[str, int] = {}
+        ids: List[str] = []
+        rows, cols, counts, lengths = [], [], [], []
+        for segment, mask in zip(segments, alive):
+            kept = np.flatnonzero(mask)
+            if not len(kept):
+                continue
+            columns = np.array(
+                [vocabulary.setdefault(term, len(vocabulary)) for term in segment.terms],
+                dtype=np.int64
+            )
+            block = segment.tf[kept].tocoo()
+            rows.append(block.row + len(ids))
+            cols.append(columns[block.col])
+            counts.append(block.data)
+            lengths.append(segment.lengths[kept])
+            ids.extend(segment.ids[row] for row in kept)
+
+        if not ids:
+            return cls([], [], sparse.csc_matrix((0, 0), dtype=np.float32), np.zeros(0, dtype=np.float32))
+
+        tf = sparse.csc_matrix(
+            (np.concatenate(counts), (np.concatenate(rows), np.concatenate(cols))),
+            shape=(len(ids), len(vocabulary))
+        )
+        # Terms that only occurred in dead rows
+        used = np.flatnonzero(np.diff(tf.indptr))
+        terms = list(vocabulary)
+        if len(used) < len(terms):
+            tf = tf[:, used]
+            terms = [terms[col] for col in used]
+        return cls(ids, terms, tf, np.concatenate(lengths))
+
+    def postings(self, term: str, alive: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Live rows containing `term` and their term frequencies"""
+        col = self.vocabulary.get(term)
+        if col is None:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        start, end = self.tf.indptr[col], self.tf.indptr[col + 1]
+        rows, tf = self.tf.indices[start:end], self.tf.data[start:end]
+        kept = alive[rows]
+        return rows[kept], tf[kept]
+
+
+class LexicalIndex:
+    """
+    BM25 index over the chunks of a single collection
+
+    Chunks are stored as segments of raw term frequencies: each add becomes a
+    small delta segment, deletions only flag rows dead, and the document count
+    and total length are updated on both. Searches compute the BM25 weights of
+    the query terms' postings only, with the live document frequencies, so no
+    write leaves a matrix to refit on the query path. Delta segments are merged
+    into the main one by a background thread (see MAX_SEGMENTS, MERGE_RATIO).
+
+    Scores are the same as SparseBM25 fitted on the live chunks.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, background_merge: bool = True):
+        """
+        Initialize an empty index
+
+        Args:
+            k1: BM25 term frequency saturation
+            b: BM25 length normalization
+            background_merge: Merge segments in a background thread (else inline)
+        """
+        self.k1 = k1
+        self.b = b
+        self.background_merge = background_merge
+
+        # Main segment first, then the deltas in insertion order; the list is
+        # replaced (never modified) so searches can iterate their copy
+        self._segments: List[_Segment] = []
+        # doc_id -> (segment, row) of its live copy
+        self._locations: Dict[str, Tuple[_Segment, int]] = {}
+        self._doc_count = 0
+        self._total_length = 0.0
+        self._lock = threading.Lock()
+
+        # One merge at a time; ids removed while it runs are dropped from its result
+        self._merging = False
+        self._merge_done = threading.Condition(self._lock)
+        self._removed_during_merge: Optional[set] = None
+
+    def __len__(self) -> int:
+        return self._doc_count
+
+    @property
+    def segment_count(self) -> int:
+        """Number of segments (main + deltas not merged yet)"""
+        return len(self._segments)
+
+    def add(self, ids: List[str], tokens: List[List[str]]):
+        """
+        Add (or replace) documents in the index
+
+        Args:
+            ids: List of document IDs
+            tokens: Analyzed text of each document (see tokenize)
+        """
+        if not ids:
+            return
+        segment = _Segment.from_tokens(ids, tokens)
+
+        with self._lock:
+            self._remove_locked(ids)
+            rows = {doc_id: row for row, doc_id in enumerate(segment.ids)}
+            if len(rows) < len(segment):
+                # Repeated id in the batch: the last copy wins
+                segment.alive[[row for row, doc_id in enumerate(segment.ids) if rows[doc_id] != row]] = False
+                segment.live = len(rows)
+            for doc_id, row in rows.items():
+                self._locations[doc_id] = (segment, row)
+            self._doc_count += segment.live
+            self._total_length += float(segment.lengths[segment.alive].sum())
+            self._segments = self._segments + [segment]
+        self._maybe_merge()
+
+    def remove(self, ids: List[str]) -> int:
+        """
+        Remove documents from the index
+
+        Args:
+            ids: Document IDs to remove
+
+        Returns:
+            Number of documents removed
+        """
+        with self._lock:
+            removed = self._remove_locked(ids)
+        if removed:
+            self._maybe_merge()
+        return removed
+
+    def _remove_locked(self, ids: List[str]) -> int:
+        by_segment: Dict[_Segment, List[int]] = {}
+        for doc_id in ids:
+            location = self._locations.pop(doc_id, None)
+            if location is not None:
+                by_segment.setdefault(location[0], []).append(location[1])
+                if self._removed_during_merge is not None:
+                    self._removed_during_merge.add(doc_id)
+
+        for segment, rows in by_segment.items():
+            alive = segment.alive.copy()
+            alive[rows] = False
+            segment.alive = alive
+            segment.live -= len(rows)
+            self._doc_count -= len(rows)
+            self._total_length -= float(segment.lengths[rows].sum())
+        return sum(len(rows) for rows in by_segment.values())
+
+    def _merge_plan(self) -> Optional[List[_Segment]]:
+        """Segments to merge next (called with the lock held)"""
+        segments = self._segments
+        if not segments:
+            return None
+        main, deltas = segments[0], segments[1:]
+        if (
+            sum(len(segment) for segment in deltas) > MERGE_RATIO * main.live
+            or len(main) - main.live > MAX_DEAD_RATIO * len(main)
+        ):
+            return segments
+        if len(segments) > MAX_SEGMENTS:
+            return deltas
+        return None
+
+    def _maybe_merge(self):
+        with self._lock:
+            if self._merging or self._merge_plan() is None:
+                return
+            self._merging = True
+        if self.background_merge:
+            threading.Thread(target=self._run_merges, name="bm25-merge", daemon=True).start()
+        else:
+            self._run_merges()
+
+    def _run_merges(self):
+        try:
+            while True:
+                with self._lock:
+                    plan = self._merge_plan()
+                if plan is None:
+                    return
+                self._merge(plan)
+        except Exception as e:
+            logger.error(f"Lexical index merge failed: {e}")
+        finally:
+            with self._lock:
+                self._merging = False
+                self._merge_done.notify_all()
+
+    def _merge(self, plan: List[_Segment]):
+        """Replace the segments of `plan` by a single one (built outside the lock)"""
+        with self._lock:
+            alive = [segment.alive for segment in plan]
+            self._removed_during_merge = set()
+
+        try:
+            merged = _Segment.merge(plan, alive)
+            locations = {doc_id: (merged, row) for row, doc_id in enumerate(merged.ids)}
+        except Exception:
+            with self._lock:
+                self._removed_during_merge = None
+            raise
+
+        with self._lock:
+            removed = self._removed_during_merge
+            self._removed_during_merge = None
+            dead = [locations.pop(doc_id)[1] for doc_id in removed if doc_id in locations]
+            if dead:
+                merged.alive[dead] = False
+                merged.live -= len(dead)
+            self._locations.update(locations)
+
+            planned = {id(segment) for segment in plan}
+            segments = []
+            for segment in self._segments:
+                if segment is plan[0]:
+                    if len(merged):
+                        segments.append(merged)
+                elif id(segment) not in planned:
+                    segments.append(segment)
+            self._segments = segments
+        logger.debug(f"Merged {len(plan)} lexical segments ({len(merged)} chunks)")
+
+    def merge(self):
+        """Merge all segments into one now (waits for a running merge)"""
+        with self._lock:
+            while self._merging:
+                self._merge_done.wait()
+            self._merging = True
+            plan = list(self._segments)
+        try:
+            if len(plan) > 1 or (plan and plan[0].live < len(plan[0])):
+                self._merge(plan)
+        finally:
+            with self._lock:
+                self._merging = False
+                self._merge_done.notify_all()
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        """
+        Search the index with BM25 scoring
+
+        Args:
+            query: Search query
+            top_k: Number of results to return
+
+        Returns:
+            List of (id, score) pairs by decreasing score
+        """
+        return self.search_batch([query], top_k=top_k)[0]
+
+    def search_batch(self, queries: List[str], top_k: int = 10) -> List[List[Tuple[str, float]]]:
+        """
+        Search several queries against the same view of the index
+
+        Args:
+            queries: Search queries
+            top_k: Number of results per query
+
+        Returns:
+            Per query, list of (id, score) pairs by decreasing score
+            (chunks sharing no term with the query are left out)
+        """
+        with self._lock:
+            segments = [(segment, segment.alive) for segment in self._segments]
+            doc_count, total_length = self._doc_count, self._total_length
+        if not doc_count or top_k <= 0:
+            return [[] for _ in queries]
+        avg_length = max(total_length / doc_count, 1.0)
+
+        results = []
+        for query in queries:
+            # Per query term: idf and, per segment, the live rows holding it
+            terms = []
+            for term in set(tokenize(query)):
+                postings = [segment.postings(term, alive) for segment, alive in segments]
+                df = sum(len(rows) for rows, _ in postings)
+                if df:
+                    terms.append((np.log1p((doc_count - df + 0.5) / (df + 0.5)), postings))
+
+            scored_ids, scored = [], []
+            for position, (segment, _) in enumerate(segments):
+                rows, weights = [], []
+                for idf, postings in terms:
+                    term_rows, tf = postings[position]
+                    if len(term_rows):
+                        norms = self.k1 * (1 - self.b + self.b * segment.lengths[term_rows] / avg_length)
+                        rows.append(term_rows)
+                        weights.append(idf * tf * (self.k1 + 1) / (tf + norms))
+                if not rows:
+                    continue
+                unique_rows, inverse = np.unique(np.concatenate(rows), return_inverse=True)
+                scored.append(np.bincount(inverse, weights=np.concatenate(weights)))
+                scored_ids.extend(segment.ids[row] for row in unique_rows)
+
+            if not scored:
+                results.append([])
+                continue
+            scores = np.concatenate(scored)
+            if len(scores) > top_k:
+                best = np.argpartition(-scores, top_k - 1)[:top_k]
+            else:
+                best = np.arange(len(scores))
+            best = best[np.argsort(-scores[best], kind="stable")]
+            results.append([(scored_ids[i], float(scores[i])) for i in best])
+        return results
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Term statistics of the live chunks (no text), as saved in snapshots"""
+        with self._lock:
+            segments = list(self._segments)
+            alive = [segment.alive for segment in segments]
+        merged = _Segment.merge(segments, alive)
+        return {
+            "params": np.array([self.k1, self.b]),
+            "analyzer": np.array(ANALYZER_VERSION),
+            "ids": np.array(merged.ids, dtype=str),
+            "terms": np.array(merged.terms, dtype=str),
+            "lengths": merged.lengths,
+            "tf_data": merged.tf.data,
+            "tf_indices": merged.tf.indices,
+            "tf_indptr": merged.tf.indptr
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], **kwargs) -> "LexicalIndex":
+        """Restore an index saved with to_arrays"""
+        k1, b = (float(value) for value in arrays["params"])
+        index = cls(k1=k1, b=b, **kwargs)
+        ids = arrays["ids"].tolist()
+        if ids:
+            terms = arrays["terms"].tolist()
+            tf = sparse.csc_matrix(
+                (arrays["tf_data"], arrays["tf_indices"], arrays["tf_indptr"]),
+                shape=(len(ids), len(terms))
+            )
+            segment = _Segment(ids, terms, tf, arrays["lengths"])
+            index._segments = [segment]
+            index._locations = {doc_id: (segment, row) for row, doc_id in enumerate(ids)}
+            index._doc_count = len(ids)
+            index._total_length = float(segment.lengths.sum())
+        return index
+
+
+class LexicalIndexManager:
+    """
+    Manages one persistent LexicalIndex per user collection
+
+    Each index is stored as a snapshot of term statistics (NumPy .npz, no
+    chunk text: results are read back from the vector store) plus an
+    append-only JSON-lines log of the adds/deletes made since. Writes only
+    append to the log; the snapshot is rewritten (and the log emptied) when
+    the log grows past COMPACT_MIN_BYTES and COMPACT_RATIO x the snapshot size.
+
+    Files written by another analyzer version can't be re-analyzed without
+    the text: they are dropped and exists() reports the index missing, so
+    ChromaManager rebuilds it from the vector store.
+
+    Loads, writes and snapshots take a lock per user, so one tenant's large
+    index never blocks another's; searches take none (see LexicalIndex).
+    """
+
+    def __init__(
+        self,
+        persist_directory: str = "./chroma_db_bm25",
+        collection_name: str = "documents",
+        k1: float = 1.5,
+        b: float = 0.75
+    ):
+        """
+        Initialize lexical index manager
+
+        Args:
+            persist_directory: Directory where the indexes are saved
+            collection_name: Collection prefix (matches ChromaManager)
+            k1: BM25 term frequency saturation
+            b: BM25 length normalization
+        """
+        self.persist_directory = Path(persist_directory)
+        self.persist_directory.mkdir(parents=True, exist_ok=True)
+        self.collection_name = collection_name
+        self.k1 = k1
+        self.b = b
+
+        self._indexes: Dict[str, LexicalIndex] = {}
+        self._user_locks: Dict[str, threading.RLock] = {}
+        self._user_locks_lock = threading.Lock()
+
+        # Sizes of each user's snapshot and change log, to decide compaction
+        self._snapshot_bytes: Dict[str, int] = {}
+        self._log_bytes: Dict[str, int] = {}
+
+        logger.info(f"Lexical indexes stored at {self.persist_directory}")
+
+    def _user_lock(self, user_id: str) -> threading.RLock:
+        with self._user_locks_lock:
+            lock = self._user_locks.get(user_id)
+            if lock is None:
+                lock = self._user_locks[user_id] = threading.RLock()
+            return lock
+
+    def _index_path(self, user_id: str) -> Path:
+        return self.persist_directory / f"{self.collection_name}_{user_id}.npz"
+
+    def _legacy_index_path(self, user_id: str) -> Path:
+        # JSON snapshots with the chunk texts, written by earlier versions
+        return self.persist_directory / f"{self.collection_name}_{user_id}.json"
+
+    def _log_path(self, user_id: str) -> Path:
+        return self.persist_directory / f"{self.collection_name}_{user_id}.log"
+
+    def _paths(self, user_id: str) -> List[Path]:
+        return [self._index_path(user_id), self._legacy_index_path(user_id), self._log_path(user_id)]
+
+    def exists(self, user_id: str) -> bool:
+        """Check whether a usable index is loaded or persisted for this user (loads it)"""
+        if user_id in self._indexes:
+            return True
+        if not any(path.exists() for path in self._paths(user_id)):
+            return False
+        return self._load(user_id) is not None
+
+    def get_index(self, user_id: str) -> LexicalIndex:
+        """
+        Get the index for a user, loading it from disk on first access
+
+        Args:
+            user_id: User identifier
+
+        Returns:
+            LexicalIndex for the user's collection (empty if none is usable)
+        """
+        index = self._indexes.get(user_id)
+        if index is not None:
+            return index
+
+        with self._user_lock(user_id):
+            index = self._indexes.get(user_id) or self._load(user_id)
+            if index is None:
+                index = self._indexes[user_id] = LexicalIndex(k1=self.k1, b=self.b)
+            return index
+
+    def _load(self, user_id: str) -> Optional[LexicalIndex]:
+        """Load a user's snapshot and replay its log; None if missing or stale"""
+        with self._user_lock(user_id):
+            index = self._indexes.get(user_id)
+            if index is not None:
+                return index
+
+            try:
+                index = self._read_snapshot(user_id)
+                if index is not None:
+                    replayed = self._replay_log(user_id, index)
+            except Exception as e:
+                logger.error(f"Error loading lexical index of user {user_id}: {e}")
+                index = None
+            if index is None:
+                # Stale or unreadable: rebuilt from the vector store by the caller
+                self._remove_files(user_id)
+                return None
+
+            # Published once complete: searches read _indexes without the lock
+            self._indexes[user_id] = index
+            if not replayed or self._legacy_index_path(user_id).exists():
+                # Torn last line (crash during an append) or old format:
+                # fold what was read into a new snapshot
+                self.save(user_id)
+            return index
+
+    def _read_snapshot(self, user_id: str) -> Optional[LexicalIndex]:
+        """Index saved in the user's snapshot (empty if there is none, None if stale)"""
+        path = self._index_path(user_id)
+        legacy_path = self._legacy_index_path(user_id)
+        if path.exists():
+            with np.load(path, allow_pickle=False) as arrays:
+                if int(arrays["analyzer"]) != ANALYZER_VERSION:
+                    logger.info(f"Lexical index '{path.name}' built by another analyzer version")
+                    return None
+                index = LexicalIndex.from_arrays(arrays)
+            self._snapshot_bytes[user_id] = path.stat().st_size
+        elif legacy_path.exists():
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("analyzer") != ANALYZER_VERSION:
+                logger.info(f"Lexical index '{legacy_path.name}' built by another analyzer version")
+                return None
+            index = LexicalIndex(k1=data.get("k1", self.k1), b=data.get("b", self.b))
+            entries = data.get("entries", [])
+            index.add([e[0] for e in entries], [e[-1] for e in entries])
+            self._snapshot_bytes[user_id] = legacy_path.stat().st_size
+            path = legacy_path
+        else:
+            return LexicalIndex(k1=self.k1, b=self.b)
+        logger.info(f"Loaded lexical index '{path.name}' ({len(index)} chunks)")
+        return index
+
+    def _replay_log(self, user_id: str, index: LexicalIndex) -> bool:
+        """
+        Apply the change log on top of the loaded snapshot
+
+        Records are idempotent, so replaying changes already in the snapshot
+        (crash between a compaction and the log removal) is harmless.
+
+        Returns:
+            False if the log ends with an unreadable record
+
+        Raises:
+            ValueError: The log holds tokens of another analyzer version
+        """
+        path = self._log_path(user_id)
+        self._log_bytes[user_id] = 0
+        if not path.exists():
+            return True
+
+        replayed = 0
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Ignoring truncated record at the end of {path.name}")
+                    return False
+                if record["op"] == "add":
+                    if record.get("analyzer") != ANALYZER_VERSION:
+                        raise ValueError(f"{path.name} was written by another analyzer version")
+                    # [id, tokens] (earlier versions: [id, text, metadata, tokens])
+                    entries = record["entries"]
+                    index.add([e[0] for e in entries], [e[-1] for e in entries])
+                elif record["op"] == "delete":
+                    index.remove(record["ids"])
+                replayed += 1
+        self._log_bytes[user_id] = path.stat().st_size
+        if replayed:
+            logger.info(f"Replayed {replayed} lexical index changes from '{path.name}'")
+        return True
+
+    def _append_log(self, user_id: str, record: Dict[str, Any]):
+        """Append one change record, compacting once the log is large enough"""
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with open(self._log_path(user_id), "a", encoding="utf-8") as f:
+            f.write(line)
+        self._log_bytes[user_id] = self._log_bytes.get(user_id, 0) + len(line.encode("utf-8"))
+
+        threshold = max(COMPACT_MIN_BYTES, COMPACT_RATIO * self._snapshot_bytes.get(user_id, 0))
+        if self._log_bytes[user_id] > threshold:
+            self.save(user_id)
+
+    def save(self, user_id: str):
+        """Write a full snapshot of a user's index atomically and empty its change log"""
+        with self._user_lock(user_id):
+            index = self._indexes.get(user_id)
+            if index is None:
+                return
+
+            path = self._index_path(user_id)
+            tmp_path = path.with_suffix(".tmp.npz")
+            np.savez(tmp_path, **index.to_arrays())
+            os.replace(tmp_path, path)
+
+            for stale_path in (self._log_path(user_id), self._legacy_index_path(user_id)):
+                if stale_path.exists():
+                    stale_path.unlink()
+            self._snapshot_bytes[user_id] = path.stat().st_size
+            self._log_bytes[user_id] = 0
+
+    def add_documents(
+        self,
+        user_id: str,
+        chunks: List[str],
+        ids: List[str],
+        tokens: Optional[List[List[str]]] = None
+    ):
+        """Add chunks (optionally pre-analyzed) to a user's index and log the change"""
+        if tokens is None:
+            tokens = [tokenize(chunk) for chunk in chunks]
+        with self._user_lock(user_id):
+            index = self.get_index(user_id)
+            index.add(ids, tokens)
+            self._append_log(user_id, {
+                "op": "add",
+                "analyzer": ANALYZER_VERSION,
+                "entries": [list(entry) for entry in zip(ids, tokens)]
+            })
+        logger.info(f"Lexical index updated: +{len(ids)} chunks ({len(index)} total)")
+
+    def delete_documents(self, user_id: str, ids: List[str]) -> int:
+        """Remove chunks from a user's index and log the change"""
+        with self._user_lock(user_id):
+            index = self.get_index(user_id)
+            removed = index.remove(ids)
+            if removed:
+                self._append_log(user_id, {"op": "delete", "ids": list(ids)})
+        logger.info(f"Lexical index updated: -{removed} chunks ({len(index)} total)")
+        return removed
+
+    def replace_index(self, user_id: str, index: LexicalIndex):
+        """Install a freshly built index for a user and persist it"""
+        with self._user_lock(user_id):
+            self._indexes[user_id] = index
+            self.save(user_id)
+
+    def _remove_files(self, user_id: str):
+        for path in self._paths(user_id):
+            if path.exists():
+                path.unlink()
+
+    def reset(self, user_id: str):
+        """Drop a user's index from memory and disk"""
+        with self._user_lock(user_id):
+            self._indexes.pop(user_id, None)
+            self._snapshot_bytes.pop(user_id, None)
+            self._log_bytes.pop(user_id, None)
+            self._remove_files(user_id)
+
+    def search(
+        self,
+        user_id: str,
+        query: str,
+        top_k: int = 10
+    ) -> List[Tuple[str, float]]:
+        """Search a user's index, returns (id, score) pairs (see LexicalIndex.search)"""
+        return self.get_index(user_id).search(query, top_k=top_k)
+
+    def search_batch(
+        self,
+        user_id: str,
+        queries: List[str],
+        top_k: int = 10
+    ) -> List[List[Tuple[str, float]]]:
+        """Search a user's index with several queries (see LexicalIndex.search_batch)"""
+        return self.get_index(user_id).search_batch(queries, top_k=top_k)
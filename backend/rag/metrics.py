@@ -0,0 +1,127 @@
+"""
+Metrics Module
+Prometheus instrumentation of the RAG query path and the ingestion pipeline
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    from prometheus_client import Counter, Histogram, CONTENT_TYPE_LATEST, generate_latest
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    logger.warning("prometheus_client not installed, metrics disabled. Run: pip install prometheus-client")
+
+
+class _NoOpMetric:
+    """Stand-in for Counter/Histogram when prometheus_client is missing"""
+
+    def labels(self, *args, **kwargs) -> "_NoOpMetric":
+        return self
+
+    def observe(self, value: float):
+        pass
+
+    def inc(self, amount: float = 1):
+        pass
+
+
+def _histogram(name: str, documentation: str, labels: List[str], buckets: Tuple[float, ...]):
+    if not PROMETHEUS_AVAILABLE:
+        return _NoOpMetric()
+    return Histogram(name, documentation, labels, buckets=buckets)
+
+
+def _counter(name: str, documentation: str, labels: List[str]):
+    if not PROMETHEUS_AVAILABLE:
+        return _NoOpMetric()
+    return Counter(name, documentation, labels)
+
+
+# Query path: vector_query, bm25_fusion, rerank, llm, llm_first_token, citations
+RAG_STAGE_SECONDS = _histogram(
+    "rag_stage_duration_seconds",
+    "Duration of each RAG query stage",
+    ["stage"],
+    (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+RAG_QUERIES = _counter(
+    "rag_queries_total",
+    "RAG queries by endpoint and cache outcome",
+    ["endpoint", "cache"]
+)
+QUERY_CACHE_LOOKUPS = _counter(
+    "rag_query_cache_lookups_total",
+    "Query result cache lookups",
+    ["namespace", "result"]
+)
+RERANK_PAIRS = _counter(
+    "rag_rerank_pairs_total",
+    "Cross-encoder (query, chunk) pairs, scored by the model or served from cache",
+    ["source"]
+)
+MICRO_BATCH_SIZE = _histogram(
+    "rag_micro_batch_size",
+    "Inputs per micro-batched forward pass",
+    ["batcher"],
+    (1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+
+# Ingestion: extract, chunk, embed, index, store
+INGESTION_STAGE_SECONDS = _histogram(
+    "ingestion_stage_duration_seconds",
+    "Duration of each document ingestion stage",
+    ["stage"],
+    (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+)
+OCR_PAGE_SECONDS = _histogram(
+    "ocr_page_duration_seconds",
+    "OCR time of one PDF page (preprocessing + text recognition)",
+    ["engine"],
+    (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+)
+PAGES_EXTRACTED = _counter(
+    "ingestion_pages_total",
+    "PDF pages by extraction method",
+    ["method"]
+)
+CHUNKS_INDEXED = _counter(
+    "ingestion_chunks_total",
+    "Chunks written to or deleted from the vector store",
+    ["operation"]
+)
+EMBEDDINGS = _counter(
+    "embeddings_total",
+    "Texts embedded by the model or served from the embedding cache",
+    ["source"]
+)
+
+
+@contextmanager
+def time_stage(stage: str, timings: Optional[Dict[str, float]] = None) -> Iterator[None]:
+    """Observe the duration of a RAG query stage (also stored in timings[stage] if given)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        RAG_STAGE_SECONDS.labels(stage=stage).observe(elapsed)
+        if timings is not None:
+            timings[stage] = elapsed
+
+
+def render_latest() -> Tuple[bytes, str]:
+    """
+    Current metrics in the Prometheus text format
+
+    Returns:
+        (payload, content type)
+    """
+    if not PROMETHEUS_AVAILABLE:
+        return b"# prometheus_client not installed\n", "text/plain; charset=utf-8"
+    return generate_latest(), CONTENT_TYPE_LATEST
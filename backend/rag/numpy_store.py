@@ -0,0 +1,604 @@
+"""
+NumPy Vector Store
+VectorStore backend on memory-mapped float32 matrices, one shard per user,
+with exact search (NumPy dot products, or a FAISS flat index if installed)
+"""
+
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Sequence
+
+import numpy as np
+
+from .vector_store import VectorStore
+
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Same distances as ChromaDB: squared L2, 1 - cosine similarity, 1 - inner product
+SPACES = ("l2", "cosine", "ip")
+
+# Ids per SQLite "IN (...)" statement
+SQL_BATCH_SIZE = 500
+
+
+def _matches(metadata: Dict[str, Any], where: Dict[str, Any]) -> bool:
+    """ChromaDB-style metadata filter ($and/$or, $eq/$ne/$in/$nin/$gt/$gte/$lt/$lte)"""
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_matches(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(_matches(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for operator, operand in condition.items():
+                if operator == "$eq" and value != operand:
+                    return False
+                if operator == "$ne" and value == operand:
+                    return False
+                if operator == "$in" and value not in operand:
+                    return False
+                if operator == "$nin" and value in operand:
+                    return False
+                if operator in ("$gt", "$gte", "$lt", "$lte"):
+                    if value is None:
+                        return False
+                    if operator == "$gt" and not value > operand:
+                        return False
+                    if operator == "$gte" and not value >= operand:
+                        return False
+                    if operator == "$lt" and not value < operand:
+                        return False
+                    if operator == "$lte" and not value <= operand:
+                        return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+def _document_names(where: Dict[str, Any]) -> Optional[List[str]]:
+    """
+    Document names a filter restricts the results to (None if unrestricted):
+    document_name equality / $eq / $in, at the top level or in an $and
+    """
+    condition = where.get("document_name")
+    names = None
+    if isinstance(condition, dict):
+        if set(condition) == {"$eq"}:
+            names = [condition["$eq"]]
+        elif set(condition) == {"$in"}:
+            names = list(condition["$in"])
+    elif condition is not None:
+        names = [condition]
+
+    for clause in where.get("$and", []):
+        clause_names = _document_names(clause)
+        if clause_names is not None:
+            names = clause_names if names is None else [name for name in names if name in clause_names]
+    return names
+
+
+class _Shard:
+    """
+    One user's chunks: an append-only float32 matrix (memory-mapped) plus a
+    SQLite table mapping matrix rows to ids, texts and metadata
+
+    Replaced or deleted chunks leave dead rows in the matrix (masked at query
+    time) until compact() rewrites it.
+    """
+
+    def __init__(self, directory: Path, space: str, use_faiss: bool):
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.space = space
+        self.use_faiss = use_faiss
+        self.lock = threading.RLock()
+
+        self.conn = sqlite3.connect(str(directory / "chunks.db"), timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE,
+                document TEXT,
+                metadata TEXT NOT NULL,
+                document_name TEXT
+            )
+            """
+        )
+        columns = [column[1] for column in self.conn.execute("PRAGMA table_info(chunks)")]
+        if "document_name" not in columns:
+            # Shards written before the column existed
+            self.conn.execute("ALTER TABLE chunks ADD COLUMN document_name TEXT")
+            self.conn.execute("UPDATE chunks SET document_name = json_extract(metadata, '$.document_name')")
+        # Filters on document_name (per-document listing, deletes) read only that document's rows
+        self.conn.execute("CREATE INDEX IF NOT EXISTS chunks_document_name ON chunks (document_name)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.conn.commit()
+        self._load()
+
+    # --- Loading ---
+
+    def _info(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM info WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _load(self):
+        """Map the current vectors file and rebuild the row bookkeeping"""
+        dim = self._info("dim")
+        self.dim = int(dim) if dim else None
+        # Versioned file name: compaction switches files in the same SQLite commit
+        self.vectors_file = self._info("vectors_file") or "embeddings.0.f32"
+
+        # Leftovers of an interrupted compaction
+        for path in self.directory.glob("embeddings.*.f32"):
+            if path.name != self.vectors_file:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+        path = self.directory / self.vectors_file
+        n_rows = path.stat().st_size // (4 * self.dim) if self.dim and path.exists() else 0
+        self.matrix = self._map(n_rows)
+        self.sq_norms = np.einsum("ij,ij->i", self.matrix, self.matrix) if n_rows else np.zeros(0, np.float32)
+
+        self.alive = np.zeros(n_rows, dtype=bool)
+        self.row_ids: List[Optional[str]] = [None] * n_rows
+        self.rows: Dict[str, int] = {}
+        for row, chunk_id in self.conn.execute("SELECT row, id FROM chunks"):
+            if row < n_rows:
+                self.alive[row] = True
+                self.row_ids[row] = chunk_id
+                self.rows[chunk_id] = row
+
+        self._faiss_index = None
+
+    def _map(self, n_rows: int) -> np.ndarray:
+        if not n_rows:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return np.memmap(self.directory / self.vectors_file, dtype=np.float32, mode="r", shape=(n_rows, self.dim))
+
+    def _prepare_for_faiss(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.space == "cosine":
+            vectors = vectors.copy()
+            faiss.normalize_L2(vectors)
+        return vectors
+
+    def _get_faiss_index(self):
+        """
+        Flat FAISS index over all rows (dead rows included), built on first use
+
+        Queries search it outside the lock, so it is never modified once built:
+        upserts drop it and the next query builds a new one.
+        """
+        if self._faiss_index is None:
+            index = faiss.IndexFlatL2(self.dim) if self.space == "l2" else faiss.IndexFlatIP(self.dim)
+            if len(self.matrix):
+                index.add(self._prepare_for_faiss(self.matrix))
+            self._faiss_index = index
+        return self._faiss_index
+
+    # --- Writes ---
+
+    def _delete_rows(self, chunk_ids: List[str]):
+        for i in range(0, len(chunk_ids), SQL_BATCH_SIZE):
+            batch = chunk_ids[i:i + SQL_BATCH_SIZE]
+            self.conn.execute(f"DELETE FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch)
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        # Last occurrence wins for ids repeated in the batch
+        positions = list({chunk_id: i for i, chunk_id in enumerate(ids)}.values())
+        vectors = np.asarray(embeddings, dtype=np.float32)[positions]
+        ids = [ids[i] for i in positions]
+
+        with self.lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self.conn.execute("INSERT OR REPLACE INTO info VALUES ('dim', ?)", (str(self.dim),))
+                self.conn.execute("INSERT OR REPLACE INTO info VALUES ('vectors_file', ?)", (self.vectors_file,))
+                self.conn.commit()
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} != shard dimension {self.dim}")
+
+            # Vectors first: rows without a chunk entry are dead if we crash before the commit
+            start = len(self.matrix)
+            with open(self.directory / self.vectors_file, "ab") as f:
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            replaced = [chunk_id for chunk_id in ids if chunk_id in self.rows]
+            self._delete_rows(replaced)
+            self.conn.executemany(
+                "INSERT INTO chunks (row, id, document, metadata, document_name) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        start + offset, chunk_id, documents[i],
+                        json.dumps(metadatas[i] or {}, ensure_ascii=False),
+                        (metadatas[i] or {}).get("document_name")
+                    )
+                    for offset, (i, chunk_id) in enumerate(zip(positions, ids))
+                ]
+            )
+            self.conn.commit()
+
+            for chunk_id in replaced:
+                self.alive[self.rows[chunk_id]] = False
+                self.row_ids[self.rows[chunk_id]] = None
+            self.matrix = self._map(start + len(ids))
+            self.sq_norms = np.concatenate([self.sq_norms, np.einsum("ij,ij->i", vectors, vectors)])
+            self.alive = np.concatenate([self.alive, np.ones(len(ids), dtype=bool)])
+            self.row_ids.extend(ids)
+            for offset, chunk_id in enumerate(ids):
+                self.rows[chunk_id] = start + offset
+            self._faiss_index = None
+
+    def delete(self, ids):
+        with self.lock:
+            present = [chunk_id for chunk_id in ids if chunk_id in self.rows]
+            self._delete_rows(present)
+            self.conn.commit()
+            for chunk_id in present:
+                row = self.rows.pop(chunk_id)
+                self.alive[row] = False
+                self.row_ids[row] = None
+
+    def update_metadatas(self, ids, fields):
+        with self.lock:
+            updates = []
+            for i in range(0, len(ids), SQL_BATCH_SIZE):
+                batch = ids[i:i + SQL_BATCH_SIZE]
+                for chunk_id, metadata in self.conn.execute(
+                    f"SELECT id, metadata FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch
+                ):
+                    merged = {**json.loads(metadata), **fields}
+                    updates.append((json.dumps(merged, ensure_ascii=False), chunk_id))
+            if "document_name" in fields:
+                self.conn.executemany(
+                    "UPDATE chunks SET metadata = ?, document_name = ? WHERE id = ?",
+                    [(metadata, fields["document_name"], chunk_id) for metadata, chunk_id in updates]
+                )
+            else:
+                self.conn.executemany("UPDATE chunks SET metadata = ? WHERE id = ?", updates)
+            self.conn.commit()
+
+    def compact(self) -> int:
+        """Rewrite the matrix without dead rows, returns the number of rows dropped"""
+        with self.lock:
+            dead = len(self.matrix) - len(self.rows)
+            if dead == 0:
+                return 0
+
+            generation = int(self.vectors_file.split(".")[1]) + 1
+            new_file = f"embeddings.{generation}.f32"
+            live_rows = np.flatnonzero(self.alive)
+            with open(self.directory / new_file, "wb") as f:
+                for i in range(0, len(live_rows), 65536):
+                    f.write(np.asarray(self.matrix[live_rows[i:i + 65536]], dtype=np.float32).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            # Renumber rows and switch files in one transaction
+            new_rows = {int(old): new for new, old in enumerate(live_rows)}
+            entries = self.conn.execute("SELECT row, id, document, metadata, document_name FROM chunks").fetchall()
+            self.conn.execute("DELETE FROM chunks")
+            self.conn.executemany(
+                "INSERT INTO chunks (row, id, document, metadata, document_name) VALUES (?, ?, ?, ?, ?)",
+                [(new_rows[entry[0]], *entry[1:]) for entry in entries]
+            )
+            self.conn.execute("INSERT OR REPLACE INTO info VALUES ('vectors_file', ?)", (new_file,))
+            self.conn.commit()
+
+            old_file = self.vectors_file
+            self._load()
+            try:
+                (self.directory / old_file).unlink()
+            except OSError:
+                # Still mapped (Windows): removed on next load
+                pass
+            return dead
+
+    # --- Reads ---
+
+    def _fetch(self, ids: List[str]) -> Dict[str, tuple]:
+        """id -> (document, metadata) for chunks still present"""
+        found = {}
+        for i in range(0, len(ids), SQL_BATCH_SIZE):
+            batch = ids[i:i + SQL_BATCH_SIZE]
+            for chunk_id, document, metadata in self.conn.execute(
+                f"SELECT id, document, metadata FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch
+            ):
+                found[chunk_id] = (document, json.loads(metadata))
+        return found
+
+    def _select(self, columns: str, where) -> sqlite3.Cursor:
+        """
+        Chunks that may match `where`, in row order: only the rows of the
+        requested documents when the filter constrains document_name (indexed),
+        else all rows. Callers still apply the full filter.
+        """
+        names = _document_names(where) if where else None
+        if names is None:
+            return self.conn.execute(f"SELECT {columns} FROM chunks ORDER BY row")
+        if not names:
+            return self.conn.execute(f"SELECT {columns} FROM chunks WHERE 0")
+        return self.conn.execute(
+            f"SELECT {columns} FROM chunks WHERE document_name IN ({','.join('?' * len(names))}) ORDER BY row",
+            names
+        )
+
+    def _filtered_rows(self, where, where_document) -> Optional[np.ndarray]:
+        """Boolean mask of rows passing the filters (None if no filter)"""
+        if not where and not where_document:
+            return None
+        if where_document and set(where_document) != {"$contains"}:
+            raise ValueError("Only {'$contains': text} document filters are supported")
+
+        mask = np.zeros(len(self.matrix), dtype=bool)
+        for row, document, metadata in self._select("row, document, metadata", where):
+            if where_document and where_document["$contains"] not in (document or ""):
+                continue
+            if where and not _matches(json.loads(metadata), where):
+                continue
+            if row < len(mask):
+                mask[row] = True
+        return mask
+
+    def query(self, embedding, n_results, where=None, where_document=None):
+        empty = {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+        with self.lock:
+            if not self.rows or n_results <= 0:
+                return empty
+            # Snapshot: appends replace these arrays, they never modify them in place.
+            # compact() renumbers rows but installs a new row_ids list, so this
+            # one keeps mapping the snapshot's rows (appends only extend it,
+            # deletes set None)
+            matrix, sq_norms, mask = self.matrix, self.sq_norms, self.alive.copy()
+            row_ids = self.row_ids
+            filtered = self._filtered_rows(where, where_document)
+            faiss_index = self._get_faiss_index() if self.use_faiss else None
+        if filtered is not None:
+            mask &= filtered
+
+        k = min(n_results, int(mask.sum()))
+        if k == 0:
+            return empty
+        q = np.asarray(embedding, dtype=np.float32)
+        if q.shape != (self.dim,):
+            raise ValueError(f"Query dimension {q.shape} != shard dimension {self.dim}")
+
+        if faiss_index is not None:
+            # Search past the masked rows, then drop them
+            search_k = min(faiss_index.ntotal, k + faiss_index.ntotal - int(mask.sum()))
+            scores, rows = faiss_index.search(self._prepare_for_faiss(q[None, :]), search_k)
+            keep = [(row, score) for row, score in zip(rows[0], scores[0]) if 0 <= row < len(mask) and mask[row]][:k]
+            top = np.array([row for row, _ in keep], dtype=np.int64)
+            scores = np.array([score for _, score in keep], dtype=np.float32)
+            distances = scores if self.space == "l2" else 1.0 - scores
+        else:
+            dots = matrix @ q
+            if self.space == "l2":
+                distances = sq_norms - 2 * dots + float(q @ q)
+            elif self.space == "cosine":
+                norms = np.sqrt(sq_norms) * float(np.linalg.norm(q))
+                distances = 1.0 - dots / np.maximum(norms, 1e-12)
+            else:
+                distances = 1.0 - dots
+            distances = np.where(mask, distances, np.inf)
+            top = np.argpartition(distances, k - 1)[:k] if k < len(distances) else np.arange(len(distances))
+            top = top[np.argsort(distances[top], kind="stable")]
+            distances = distances[top]
+
+        with self.lock:
+            top_ids = [row_ids[int(row)] for row in top]
+            found = self._fetch([chunk_id for chunk_id in top_ids if chunk_id is not None])
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for chunk_id, distance in zip(top_ids, distances):
+            entry = found.get(chunk_id) if chunk_id is not None else None
+            if entry is None:  # Deleted meanwhile
+                continue
+            results["ids"].append(chunk_id)
+            results["documents"].append(entry[0])
+            results["metadatas"].append(entry[1])
+            results["distances"].append(float(max(distance, 0.0)) if self.space == "l2" else float(distance))
+        return {key: [values] for key, values in results.items()}
+
+    def get(self, where=None, include=("documents", "metadatas"), ids=None):
+        with self.lock:
+            if ids is None:
+                entries = self._select("id, document, metadata", where).fetchall()
+            else:
+                entries = []
+                for i in range(0, len(ids), SQL_BATCH_SIZE):
+                    batch = ids[i:i + SQL_BATCH_SIZE]
+                    entries.extend(self.conn.execute(
+                        f"SELECT id, document, metadata FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch
+                    ))
+        results = {"ids": []}
+        for field in include:
+            results[field] = []
+        for chunk_id, document, metadata in entries:
+            metadata = json.loads(metadata)
+            if where and not _matches(metadata, where):
+                continue
+            results["ids"].append(chunk_id)
+            if "documents" in results:
+                results["documents"].append(document)
+            if "metadatas" in results:
+                results["metadatas"].append(metadata)
+            if "embeddings" in results:
+                results["embeddings"].append(self.matrix[self.rows[chunk_id]].tolist())
+        return results
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Per-user shards of memory-mapped float32 vectors with exact search
+
+    Each shard lives in <persist_directory>/<collection_name>_<user_id>/ with
+    its own SQLite table, so concurrent ingestion for different users never
+    waits on a shared write lock. Search is an exact dot-product scan over
+    the memory-mapped matrix (pages stay in the OS cache), or a FAISS flat
+    index (in RAM, SIMD) when use_faiss is set and faiss is installed.
+    Suited to small and medium tenants (up to a few hundred thousand chunks).
+    """
+
+    name = "numpy"
+
+    def __init__(
+        self,
+        persist_directory: str = "./vector_store",
+        collection_name: str = "documents",
+        space: str = "l2",
+        use_faiss: bool = False
+    ):
+        """
+        Initialize NumPy backend
+
+        Args:
+            persist_directory: Directory holding one sub-directory per user
+            collection_name: Shard prefix (shards are <prefix>_<user_id>)
+            space: Distance, as ChromaDB's hnsw:space (l2, cosine or ip)
+            use_faiss: Search with a FAISS flat index instead of NumPy
+        """
+        if space not in SPACES:
+            raise ValueError(f"Unknown space '{space}' (expected one of {SPACES})")
+        if use_faiss and not FAISS_AVAILABLE:
+            logger.warning("faiss is not installed, using NumPy exact search")
+            use_faiss = False
+
+        self.persist_directory = Path(persist_directory)
+        self.persist_directory.mkdir(parents=True, exist_ok=True)
+        self.collection_name = collection_name
+        self.space = space
+        self.use_faiss = use_faiss
+        if use_faiss:
+            self.name = "faiss"
+
+        self._shards: Dict[str, _Shard] = {}
+        self._shards_lock = threading.Lock()
+        logger.info(f"{self.name} vector store at {self.persist_directory} (space={space})")
+
+    def _shard_directory(self, user_id: str) -> Path:
+        return self.persist_directory / f"{self.collection_name}_{user_id}"
+
+    def _shard(self, user_id: str, create: bool = False) -> Optional[_Shard]:
+        """
+        A user's shard, opened on first access
+
+        Args:
+            user_id: User identifier
+            create: Create the shard if it doesn't exist (writes only: reads
+                    of unknown users must not leave empty shards behind)
+
+        Returns:
+            The shard, or None if it doesn't exist and create is False
+        """
+        shard = self._shards.get(user_id)
+        if shard is not None:
+            return shard
+        with self._shards_lock:
+            shard = self._shards.get(user_id)
+            if shard is None:
+                directory = self._shard_directory(user_id)
+                if not create and not (directory / "chunks.db").exists():
+                    return None
+                shard = _Shard(directory, self.space, self.use_faiss)
+                self._shards[user_id] = shard
+            return shard
+
+    def upsert(self, user_id, ids, embeddings, documents, metadatas):
+        self._shard(user_id, create=True).upsert(ids, embeddings, documents, metadatas)
+
+    def query(self, user_id, embedding, n_results, where=None, where_document=None):
+        shard = self._shard(user_id)
+        if shard is None:
+            return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+        return shard.query(embedding, n_results, where=where, where_document=where_document)
+
+    def get(self, user_id, where=None, include: Sequence[str] = ("documents", "metadatas"), ids=None):
+        shard = self._shard(user_id)
+        if shard is None:
+            return {"ids": [], **{field: [] for field in include}}
+        return shard.get(where=where, include=include, ids=ids)
+
+    def delete(self, user_id, ids):
+        shard = self._shard(user_id)
+        if shard is not None:
+            shard.delete(ids)
+
+    def update_metadatas(self, user_id, ids, fields):
+        shard = self._shard(user_id)
+        if shard is not None:
+            shard.update_metadatas(ids, fields)
+
+    def count(self, user_id):
+        shard = self._shard(user_id)
+        return len(shard.rows) if shard is not None else 0
+
+    def drop(self, user_id):
+        with self._shards_lock:
+            shard = self._shards.pop(user_id, None)
+            if shard is not None:
+                shard.close()
+            shutil.rmtree(self._shard_directory(user_id), ignore_errors=True)
+
+    def list_user_ids(self):
+        prefix = f"{self.collection_name}_"
+        return [
+            path.name[len(prefix):]
+            for path in sorted(self.persist_directory.iterdir())
+            if path.name.startswith(prefix) and (path / "chunks.db").exists()
+        ]
+
+    def compact(self):
+        """Rewrite every shard that has dead rows"""
+        for user_id in self.list_user_ids():
+            shard = self._shard(user_id)
+            if shard is None:
+                continue
+            dropped = shard.compact()
+            if dropped:
+                logger.info(f"Compacted shard of user {user_id}: -{dropped} dead rows")
+
+    def index_config(self, user_id):
+        shard = self._shard(user_id)
+        rows = len(shard.matrix) if shard is not None else 0
+        return {
+            "space": self.space,
+            "engine": self.name,
+            "rows": rows,
+            "dead_rows": rows - len(shard.rows) if shard is not None else 0,
+        }
+
+    def rebuild(self, user_id, config=None, batch_size=1000):
+        """Compact a user's shard (HNSW settings don't apply to exact search)"""
+        ignored = {key: value for key, value in (config or {}).items() if key != "space"}
+        if ignored:
+            logger.info(f"{self.name} store: ignoring HNSW settings {ignored} (exact search)")
+        if config and config.get("space") not in (None, self.space):
+            raise ValueError(f"The {self.name} store uses space '{self.space}' for all users")
+        shard = self._shard(user_id)
+        if shard is None:
+            return 0
+        shard.compact()
+        return self.count(user_id)
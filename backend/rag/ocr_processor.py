@@ -7,14 +7,85 @@ import cv2
 import numpy as np
 import easyocr
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Iterable, Iterator
 import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from PIL import Image
 import io
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+from .metrics import OCR_PAGE_SECONDS
 
 logger = logging.getLogger(__name__)
 
 
+def iter_pdf_page_images(
+    file_content: bytes,
+    dpi: int = 200,
+    window: int = 4,
+    page_numbers: Optional[Iterable[int]] = None
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Render PDF pages lazily, a bounded window of pages at a time
+    
+    Only `window` page images are alive at once, so peak memory does not
+    depend on the document length.
+    
+    Args:
+        file_content: Raw PDF bytes
+        dpi: Rendering resolution
+        window: Number of pages rendered per pdf2image call
+        page_numbers: 1-indexed pages to render (default: all pages)
+        
+    Yields:
+        (page_number, image) tuples, image as RGB numpy array
+    """
+    # Written once; every window is rendered from the same file by poppler
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+        tmp.write(file_content)
+        pdf_path = tmp.name
+    
+    try:
+        if page_numbers is None:
+            page_count = int(pdfinfo_from_path(pdf_path)["Pages"])
+            page_numbers = range(1, page_count + 1)
+        
+        # Group consecutive pages into windows
+        runs = []
+        for page_number in sorted(set(page_numbers)):
+            if runs and page_number == runs[-1][1] + 1 and runs[-1][1] - runs[-1][0] + 1 < window:
+                runs[-1][1] = page_number
+            else:
+                runs.append([page_number, page_number])
+        
+        for first_page, last_page in runs:
+            images = convert_from_path(pdf_path, dpi=dpi, first_page=first_page, last_page=last_page)
+            for offset in range(len(images)):
+                image = images[offset]
+                images[offset] = None  # Release the PIL image as soon as it is converted
+                yield first_page + offset, np.array(image)
+    finally:
+        os.unlink(pdf_path)
+
+
+def count_pdf_pages(file_content: bytes) -> int:
+    """Number of pages of a PDF (via poppler's pdfinfo)"""
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+        tmp.write(file_content)
+        pdf_path = tmp.name
+    try:
+        return int(pdfinfo_from_path(pdf_path)["Pages"])
+    finally:
+        os.unlink(pdf_path)
+
+
 class OCRProcessor:
     """Advanced OCR processor with image preprocessing"""
     
@@ -226,6 +297,27 @@ class OCRProcessor:
             logger.error(f"Error during PDF page OCR: {e}")
             return "", 0.0
     
+    def iter_pdf_pages(
+        self,
+        pages: Iterable[Tuple[int, np.ndarray]],
+        preprocess: bool = True
+    ) -> Iterator[Tuple[int, str, float]]:
+        """
+        OCR a stream of rendered pages one by one (see iter_pdf_page_images)
+        
+        Args:
+            pages: Iterable of (page_number, image) tuples
+            preprocess: Apply preprocessing
+            
+        Yields:
+            (page_number, text, average_confidence) tuples
+        """
+        for page_number, image in pages:
+            start = time.perf_counter()
+            text, confidence = self.extract_text_from_pdf_page(image, preprocess=preprocess)
+            OCR_PAGE_SECONDS.labels(engine="sequential").observe(time.perf_counter() - start)
+            yield page_number, text, confidence
+    
     def validate_ocr_quality(
         self,
         results: List[Dict[str, Any]],
@@ -298,3 +390,186 @@ class OCRProcessor:
                 logger.error(f"Fallback OCR failed: {e}")
         
         return text, metadata
+
+
+# --- Process pool workers (one EasyOCR reader per process) ---
+_worker_processor: Optional[OCRProcessor] = None
+
+
+def _init_ocr_worker(languages: List[str], gpu: bool, threads_per_worker: int):
+    """Load one OCRProcessor per worker process"""
+    global _worker_processor
+    
+    # Avoid oversubscription: each process only gets its share of the cores
+    cv2.setNumThreads(threads_per_worker)
+    try:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+    except ImportError:
+        pass
+    
+    _worker_processor = OCRProcessor(languages=languages, gpu=gpu)
+
+
+def _ocr_page_worker(page_number: int, image: np.ndarray, preprocess: bool) -> Tuple[int, str, float, float]:
+    """Preprocess + readtext for one page inside a worker process (returns its OCR time)"""
+    start = time.perf_counter()
+    text, confidence = _worker_processor.extract_text_from_pdf_page(image, preprocess=preprocess)
+    return page_number, text, confidence, time.perf_counter() - start
+
+
+class ParallelOCREngine:
+    """Page-parallel OCR spread over a process pool"""
+    
+    def __init__(
+        self,
+        languages: List[str] = ['fr', 'en'],
+        gpu: bool = False,
+        max_workers: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+        max_restarts: int = 1
+    ):
+        """
+        Initialize parallel OCR engine (workers start on first use)
+        
+        Workers use the "spawn" start method, which re-imports the launching
+        script in every process: start the API with `uvicorn main:app` or
+        `python serve.py`, not a script with heavy module-level setup.
+        
+        Args:
+            languages: Languages for OCR (default: French + English)
+            gpu: Use GPU acceleration if available
+            max_workers: Number of OCR processes (default: CPU count)
+            max_in_flight: Max pages submitted but not yet returned
+                           (default: 2 x max_workers)
+            max_restarts: Pool restarts allowed per page when a worker dies
+                          (e.g. OOM-killed) before the error is raised
+        """
+        self.languages = languages
+        self.gpu = gpu
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_in_flight = max_in_flight or 2 * self.max_workers
+        self.max_restarts = max_restarts
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                threads_per_worker = max(1, (os.cpu_count() or 1) // self.max_workers)
+                # spawn: torch/OpenCV thread pools do not survive fork()
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_ocr_worker,
+                    initargs=(self.languages, self.gpu, threads_per_worker)
+                )
+                logger.info(f"Started {self.max_workers} OCR worker processes")
+            return self._executor
+    
+    def _discard_executor(self, executor: ProcessPoolExecutor):
+        """Drop a broken pool (unless another thread already replaced it)"""
+        with self._executor_lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _submit(self, page_number: int, image: np.ndarray, preprocess: bool) -> list:
+        """Pending entry [page_number, image, executor, future]"""
+        executor = self._get_executor()
+        try:
+            future = executor.submit(_ocr_page_worker, page_number, image, preprocess)
+        except BrokenProcessPool:
+            # A worker died since the last collected page: pages already pending on
+            # this pool are resubmitted by _collect
+            self._discard_executor(executor)
+            executor = self._get_executor()
+            future = executor.submit(_ocr_page_worker, page_number, image, preprocess)
+        return [page_number, image, executor, future]
+    
+    def iter_pages(
+        self,
+        pages: Iterable[Tuple[int, np.ndarray]],
+        preprocess: bool = True
+    ) -> Iterator[Tuple[int, str, float]]:
+        """
+        OCR pages in parallel, yielding results in input order
+        
+        Args:
+            pages: Iterable of (page_number, image) tuples
+            preprocess: Apply preprocessing
+            
+        Yields:
+            (page_number, text, average_confidence) tuples
+        """
+        pending = deque()
+        
+        for page_number, image in pages:
+            pending.append(self._submit(page_number, image, preprocess))
+            # Bound the number of page images held in memory / in the queue
+            if len(pending) >= self.max_in_flight:
+                yield self._collect(pending, preprocess)
+        
+        while pending:
+            yield self._collect(pending, preprocess)
+    
+    def _collect(self, pending: deque, preprocess: bool) -> Tuple[int, str, float]:
+        """
+        Result of the oldest pending page
+        
+        A dead worker breaks the whole pool: it is restarted and every pending
+        page resubmitted. Raises BrokenProcessPool if the same page keeps
+        killing workers.
+        """
+        page_number = pending[0][0]
+        for attempt in range(self.max_restarts + 1):
+            executor, future = pending[0][2], pending[0][3]
+            try:
+                _, text, confidence, elapsed = future.result()
+                break
+            except BrokenProcessPool:
+                if attempt == self.max_restarts:
+                    pending.popleft()
+                    logger.error(f"OCR worker pool crashed again on page {page_number}, giving up")
+                    raise
+                logger.error(f"OCR worker pool crashed on page {page_number} (worker killed?), restarting it")
+                self._discard_executor(executor)
+                for entry in pending:
+                    if entry[2] is executor:
+                        entry[:] = self._submit(entry[0], entry[1], preprocess)
+            except Exception as e:
+                pending.popleft()
+                logger.error(f"Error during parallel OCR of page {page_number}: {e}")
+                return page_number, "", 0.0
+        
+        pending.popleft()
+        # Timed in the worker: metrics of spawned processes are not collected
+        OCR_PAGE_SECONDS.labels(engine="parallel").observe(elapsed)
+        return page_number, text, confidence
+    
+    def extract_pages(
+        self,
+        images: List[np.ndarray],
+        preprocess: bool = True
+    ) -> List[Tuple[str, float]]:
+        """
+        OCR a list of page images in parallel
+        
+        Args:
+            images: Page images (numpy arrays), in page order
+            preprocess: Apply preprocessing
+            
+        Returns:
+            List of (text, average_confidence), same order as images
+        """
+        return [
+            (text, confidence)
+            for _, text, confidence in self.iter_pages(enumerate(images, 1), preprocess)
+        ]
+    
+    def shutdown(self, wait: bool = True):
+        """Stop the worker processes"""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
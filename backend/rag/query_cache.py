@@ -0,0 +1,133 @@
+"""
+Query Cache Module
+Per-user LRU + TTL cache of RAG retrieval results, invalidated on ingest/delete
+"""
+
+import copy
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from .metrics import QUERY_CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+
+class QueryResultCache:
+    """Caches retrieval (and optionally answer) results per user and normalized query"""
+
+    def __init__(self, max_entries_per_user: int = 256, ttl_seconds: float = 600.0):
+        """
+        Initialize query cache
+
+        Args:
+            max_entries_per_user: LRU capacity of each user's cache
+            ttl_seconds: Entry lifetime
+        """
+        self.max_entries_per_user = max_entries_per_user
+        self.ttl_seconds = ttl_seconds
+
+        # user_id -> OrderedDict[(namespace, query), (expires_at, value)]
+        self._entries: Dict[str, "OrderedDict[Tuple[str, str], Tuple[float, Any]]"] = {}
+        # Bumped on every invalidation, so results computed before it are not stored
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Case, Unicode form, whitespace and trailing punctuation insensitive key"""
+        query = unicodedata.normalize("NFKC", query).lower()
+        query = re.sub(r"\s+", " ", query).strip()
+        return query.rstrip(" ?!.")
+
+    def version(self, user_id: str) -> int:
+        """Current invalidation version of a user's cache"""
+        with self._lock:
+            return self._versions.get(user_id, 0)
+
+    def get(self, user_id: str, namespace: str, query: str) -> Optional[Any]:
+        """
+        Get a cached value
+
+        Args:
+            user_id: User identifier
+            namespace: Kind of value (e.g. "retrieval", "answer")
+            query: Raw query (normalized here)
+
+        Returns:
+            Copy of the cached value, or None on miss/expiry
+        """
+        key = (namespace, self.normalize_query(query))
+        with self._lock:
+            entries = self._entries.get(user_id)
+            entry = entries.get(key) if entries else None
+
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del entries[key]
+                self.misses += 1
+                QUERY_CACHE_LOOKUPS.labels(namespace=namespace, result="miss").inc()
+                return None
+
+            entries.move_to_end(key)
+            self.hits += 1
+            QUERY_CACHE_LOOKUPS.labels(namespace=namespace, result="hit").inc()
+            value = entry[1]
+
+        return copy.deepcopy(value)
+
+    def set(
+        self,
+        user_id: str,
+        namespace: str,
+        query: str,
+        value: Any,
+        version: Optional[int] = None
+    ):
+        """
+        Store a value
+
+        Args:
+            user_id: User identifier
+            namespace: Kind of value
+            query: Raw query (normalized here)
+            value: Value to cache
+            version: version(user_id) read before computing the value; the
+                     value is dropped if the cache was invalidated meanwhile
+        """
+        key = (namespace, self.normalize_query(query))
+        with self._lock:
+            if version is not None and version != self._versions.get(user_id, 0):
+                return
+
+            entries = self._entries.setdefault(user_id, OrderedDict())
+            entries[key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(value))
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries_per_user:
+                entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        """Drop all cached results of a user (their documents changed)"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+        logger.debug(f"Query cache invalidated for user {user_id}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and size"""
+        with self._lock:
+            entries = sum(len(e) for e in self._entries.values())
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
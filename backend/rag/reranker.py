@@ -4,34 +4,194 @@ Provides precision re-ranking of search results
 """
 
 from sentence_transformers import CrossEncoder
-from typing import List, Dict, Any
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+import hashlib
 import logging
+import threading
+
+from .batching import MicroBatcher
+from .metrics import RERANK_PAIRS
+from .query_cache import QueryResultCache
 
 logger = logging.getLogger(__name__)
 
+# Quantized ONNX export shipped with the ms-marco cross-encoders on the HF Hub
+DEFAULT_ONNX_QUANTIZED_FILE = "onnx/model_qint8_avx512_vnni.onnx"
+
 
 class CrossEncoderReranker:
     """Rerank search results using cross-encoder model"""
     
-    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"):
+    def __init__(
+        self,
+        model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        batch_size: int = 32,
+        backend: str = "torch",
+        quantize: bool = False,
+        onnx_file: Optional[str] = None,
+        cache_size: int = 4096,
+        batch_window_ms: float = 0.0
+    ):
         """
         Initialize cross-encoder reranker
         
         Args:
             model_name: HuggingFace model for reranking
+            batch_size: Pairs per forward pass
+            backend: "torch" or "onnx" (ONNX Runtime, CPU-friendly)
+            quantize: Use int8 weights (quantized ONNX file, or dynamic
+                      quantization of the Linear layers with torch)
+            onnx_file: ONNX file inside the model repo (defaults to the
+                       int8 export when quantize=True)
+            cache_size: Max (normalized query, chunk id) scores kept (0 disables the cache)
+            batch_window_ms: Micro-batching window merging the pairs of
+                             concurrent rerank calls (0 = one predict per call)
         """
         self.model_name = model_name
+        self.batch_size = batch_size
+        self.backend = backend
+        self.quantize = quantize
+        self.onnx_file = onnx_file
         self.model = None
+
+        self.cache_size = cache_size
+        self._score_cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
         self._load_model()
+
+        self.batcher = None
+        if batch_window_ms > 0:
+            self.batcher = MicroBatcher(
+                self._predict,
+                max_batch_size=max(batch_size * 4, 64),
+                max_wait_ms=batch_window_ms,
+                name="rerank-batcher"
+            )
     
     def _load_model(self):
         """Load cross-encoder model"""
         try:
-            self.model = CrossEncoder(self.model_name)
-            logger.info(f"Loaded cross-encoder model: {self.model_name}")
+            if self.backend == "onnx":
+                self.model = self._load_onnx_model()
+            else:
+                self.model = CrossEncoder(self.model_name)
+                if self.quantize:
+                    self._quantize_torch_model()
+            logger.info(
+                f"Loaded cross-encoder model: {self.model_name} "
+                f"(backend={self.backend}, quantize={self.quantize})"
+            )
         except Exception as e:
             logger.error(f"Error loading cross-encoder: {e}")
             raise
+
+    def _load_onnx_model(self) -> CrossEncoder:
+        """Load the ONNX Runtime variant, falling back to torch if unsupported"""
+        onnx_file = self.onnx_file or (DEFAULT_ONNX_QUANTIZED_FILE if self.quantize else None)
+        model_kwargs = {"file_name": onnx_file} if onnx_file else {}
+        try:
+            return CrossEncoder(self.model_name, backend="onnx", model_kwargs=model_kwargs)
+        except Exception as e:
+            # Older sentence-transformers (no backend argument) or missing onnxruntime/optimum
+            logger.warning(f"ONNX backend unavailable ({e}), falling back to torch")
+            self.backend = "torch"
+            self.model = CrossEncoder(self.model_name)
+            if self.quantize:
+                self._quantize_torch_model()
+            return self.model
+
+    def _quantize_torch_model(self):
+        """Dynamic int8 quantization of the Linear layers (CPU only)"""
+        import torch
+
+        if str(getattr(self.model, "device", "cpu")) != "cpu":
+            logger.warning("Dynamic quantization is CPU-only, keeping float weights")
+            return
+        self.model.model = torch.quantization.quantize_dynamic(
+            self.model.model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+
+    def _predict(self, pairs: List[List[str]]) -> List[float]:
+        """One batched cross-encoder forward pass"""
+        scores = self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+        return [float(score) for score in scores]
+
+    @staticmethod
+    def _candidate_key(candidate: Dict[str, Any]) -> str:
+        """Chunk id of a candidate (text hash when the id is missing)"""
+        chunk_id = candidate.get("id")
+        if chunk_id:
+            return str(chunk_id)
+        return hashlib.sha1(candidate["document"].encode("utf-8")).hexdigest()
+
+    def score_pairs(self, query: str, candidates: List[Dict[str, Any]]) -> List[float]:
+        """
+        Cross-encoder scores of candidates, reusing cached (query, chunk id) scores
+        
+        Args:
+            query: Search query
+            candidates: Candidate documents ("document" text, optional "id")
+            
+        Returns:
+            One score per candidate
+        """
+        # Same query key as QueryResultCache, so variants of a query it treats
+        # as equal ("Pompe ?" / "pompe") share their scores too
+        query_key = QueryResultCache.normalize_query(query)
+        keys = [(query_key, self._candidate_key(c)) for c in candidates]
+        scores: List[Optional[float]] = [None] * len(candidates)
+
+        if self.cache_size:
+            with self._cache_lock:
+                for i, key in enumerate(keys):
+                    score = self._score_cache.get(key)
+                    if score is not None:
+                        self._score_cache.move_to_end(key)
+                        scores[i] = score
+                hits = sum(score is not None for score in scores)
+                self.cache_hits += hits
+                self.cache_misses += len(keys) - hits
+
+        missing = [i for i, score in enumerate(scores) if score is None]
+        RERANK_PAIRS.labels(source="cache").inc(len(scores) - len(missing))
+        RERANK_PAIRS.labels(source="model").inc(len(missing))
+        if missing:
+            pairs = [[query, candidates[i]["document"]] for i in missing]
+            if self.batcher is not None:
+                predicted = self.batcher.submit(pairs)
+            else:
+                predicted = self._predict(pairs)
+            for i, score in zip(missing, predicted):
+                scores[i] = score
+
+            if self.cache_size:
+                with self._cache_lock:
+                    for i in missing:
+                        self._score_cache[keys[i]] = scores[i]
+                        self._score_cache.move_to_end(keys[i])
+                    while len(self._score_cache) > self.cache_size:
+                        self._score_cache.popitem(last=False)
+
+        return scores
+
+    def clear_cache(self):
+        """Drop cached scores (e.g. after re-indexing chunks under the same ids)"""
+        with self._cache_lock:
+            self._score_cache.clear()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of the score cache"""
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "entries": len(self._score_cache),
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": self.cache_hits / lookups if lookups else 0.0
+        }
     
     def rerank(
         self,
@@ -53,15 +213,9 @@ class CrossEncoderReranker:
         if not candidates:
             return []
         
-        # Extract document texts
-        texts = [c["document"] for c in candidates]
-        
-        # Create query-document pairs
-        pairs = [[query, text] for text in texts]
-        
         try:
-            # Get cross-encoder scores
-            scores = self.model.predict(pairs)
+            # Get cross-encoder scores (batched, cached per chunk id)
+            scores = self.score_pairs(query, candidates)
             
             # Update candidates with new scores
             reranked = []
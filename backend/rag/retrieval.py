@@ -0,0 +1,70 @@
+"""
+Retrieval Module
+Candidate retrieval of the RAG query path (vector search + BM25 fusion)
+"""
+
+import logging
+from typing import List, Dict, Any, Tuple, Optional
+
+from .metrics import time_stage
+
+logger = logging.getLogger(__name__)
+
+
+def retrieve_candidates(
+    chroma_manager,
+    hybrid_searcher,
+    user_id: str,
+    query: str,
+    vector_candidates: int = 10,
+    bm25_candidates: int = 20,
+    fusion_top_k: int = 10,
+    timings: Optional[Dict[str, float]] = None
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Stages 1-2 of /api/v1/rag/query: vector search, then RRF fusion with the
+    user's BM25 index (no result cache, see QueryResultCache)
+
+    Args:
+        chroma_manager: ChromaManager of the user collections
+        hybrid_searcher: HybridSearcher doing the fusion (holds alpha)
+        user_id: User identifier
+        query: Query string
+        vector_candidates: Vector results fetched (RAG_VECTOR_CANDIDATES)
+        bm25_candidates: BM25 results fetched (RAG_BM25_CANDIDATES)
+        fusion_top_k: Fused candidates returned (RAG_FUSION_TOP_K)
+        timings: Filled with the seconds spent in "vector_query" and "bm25_fusion"
+
+    Returns:
+        (vector_results, hybrid_results); hybrid_results is empty when the
+        vector search found nothing
+    """
+    with time_stage("vector_query", timings):
+        vector_results = chroma_manager.query(
+            user_id=user_id,
+            query_text=query,
+            n_results=vector_candidates
+        )
+
+    if not vector_results['documents'][0]:
+        return vector_results, []
+
+    # BM25 over the user's whole corpus (persistent lexical index)
+    with time_stage("bm25_fusion", timings):
+        bm25_results = chroma_manager.search_lexical(
+            user_id=user_id,
+            query_text=query,
+            n_results=bm25_candidates
+        )
+        hybrid_results = hybrid_searcher.hybrid_search(
+            query=query,
+            vector_results=vector_results,
+            top_k=fusion_top_k,
+            bm25_results=bm25_results
+        )
+
+    logger.info(
+        f"Retrieved {len(vector_results['documents'][0])} vector results, "
+        f"{len(hybrid_results)} fused candidates"
+    )
+    return vector_results, hybrid_results
@@ -0,0 +1,102 @@
+"""
+Store Lock Module
+Exclusive lock file held by the single process allowed to write a RAG store
+"""
+
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:  # Windows
+    import msvcrt
+    FCNTL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class StoreLockedError(RuntimeError):
+    """Another process already holds the store lock"""
+
+
+class StoreLock:
+    """
+    Non-blocking exclusive lock on a file next to the store
+
+    The API and the bulk ingestion script both write the vector store, BM25
+    snapshots/logs and manifest of the same directory; each keeps its own
+    in-memory state, so two writers overwrite or corrupt each other's files.
+    The OS releases the lock when the holder exits, even after a crash.
+    """
+
+    def __init__(self, lock_path: str):
+        """
+        Initialize store lock
+
+        Args:
+            lock_path: Path of the lock file (created if missing)
+        """
+        self.lock_path = Path(lock_path)
+        self._file = None
+
+    def _holder(self) -> Optional[str]:
+        try:
+            return self.lock_path.read_text(encoding="utf-8").strip() or None
+        except OSError:
+            return None
+
+    def acquire(self, owner: str = ""):
+        """
+        Take the lock or raise StoreLockedError
+
+        Args:
+            owner: Description written in the file (shown to the next process)
+        """
+        if self._file is not None:
+            return
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.lock_path, "a+", encoding="utf-8")
+        try:
+            if FCNTL_AVAILABLE:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            lock_file.close()
+            holder = self._holder()
+            raise StoreLockedError(
+                f"{self.lock_path} is locked by another process"
+                + (f" ({holder})" if holder else "")
+            )
+
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(f"pid {os.getpid()} {owner}".strip())
+        lock_file.flush()
+        self._file = lock_file
+        logger.info(f"Store lock acquired: {self.lock_path}")
+
+    def release(self):
+        """Release the lock (no-op if not held)"""
+        if self._file is None:
+            return
+        try:
+            if FCNTL_AVAILABLE:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "StoreLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
@@ -0,0 +1,84 @@
+"""
+Text Analysis Module
+Lexical analyzer shared by BM25 indexing and querying (French-aware)
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List, Optional
+
+# Bump when analyze() output changes: persisted token lists are recomputed
+ANALYZER_VERSION = 1
+
+# Ligatures that NFKD does not decompose
+_LIGATURES = str.maketrans({"œ": "oe", "æ": "ae", "ß": "ss"})
+
+# After folding: letters/digits runs ("l'arrêt" -> "l", "arret")
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Accent-folded French stopwords (+ a few English ones: manuals are often bilingual)
+FRENCH_STOPWORDS = frozenset("""
+a ai aie aient aies ait alors as au aucun aucune aupres aussi autre autres aux avaient avais avait avant avec avez
+aviez avions avoir avons ayant ayez ayons c ca car ce ceci cela celle celles celui ces cet cette ceux chaque chez
+ci comme comment d dans de des deja depuis donc dont du elle elles en encore entre es est et etaient etais etait
+etant ete etes etiez etions etre eu eue eues eurent eus eut eux faire fait fois font ici il ils j je l la le les
+leur leurs lui m ma mais me meme memes mes moi mon n ne ni nos notre nous on ont ou par parce pas peu peut plus pour
+pourquoi quand que quel quelle quelles quels qu qui quoi s sa sans se selon ses si soi soient sois soit sommes son
+sont sous suis sur t ta te tes toi ton tous tout toute toutes tres tu un une unes uns vers via vos votre vous y
+an and are as at be by for from has have in is it its of on or that the this to was were will with
+""".split())
+
+
+def fold(text: str) -> str:
+    """Lower-case and strip accents ("Arrêt" -> "arret")"""
+    decomposed = unicodedata.normalize("NFKD", text.lower().translate(_LIGATURES))
+    return decomposed.encode("ascii", "ignore").decode("ascii")
+
+
+def stem_fr(token: str) -> str:
+    """
+    Light French stemmer: plural and feminine endings only
+    ("pompes" -> "pomp", "pompe" -> "pomp", "chevaux" -> "cheval")
+
+    Args:
+        token: Folded token
+
+    Returns:
+        Stem (tokens with digits and short tokens are kept as is)
+    """
+    if len(token) < 4 or not token.isalpha():
+        return token
+    if token.endswith("aux") and len(token) > 5:
+        return token[:-3] + "al"
+    if token[-1] in "sx":
+        token = token[:-1]
+    if token.endswith("e") and len(token) > 4:
+        token = token[:-1]
+    return token
+
+
+@lru_cache(maxsize=200_000)
+def _analyze_token(token: str) -> Optional[str]:
+    """Stopword filter + stemming, cached per distinct folded token"""
+    if token in FRENCH_STOPWORDS:
+        return None
+    return stem_fr(token)
+
+
+def analyze(text: str) -> List[str]:
+    """
+    Tokens of a text for BM25: folded, stopwords removed, light-stemmed
+
+    Args:
+        text: Chunk or query text
+
+    Returns:
+        List of terms, in order (repeats kept for term frequencies)
+    """
+    terms = []
+    for token in _TOKEN_PATTERN.findall(fold(text)):
+        term = _analyze_token(token)
+        if term:
+            terms.append(term)
+    return terms
@@ -0,0 +1,92 @@
+"""
+Vector Store Module
+Storage backend interface used by ChromaManager (one shard/collection per user)
+"""
+
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Sequence
+
+
+class VectorStore(ABC):
+    """
+    Per-user storage of chunk embeddings, texts and metadata
+
+    Results use ChromaDB's layout so callers don't depend on the backend:
+    query() -> {"ids": [[...]], "documents": [[...]], "metadatas": [[...]], "distances": [[...]]}
+    get()   -> {"ids": [...], "documents": [...], "metadatas": [...]} (requested fields only)
+    """
+
+    # Written in logs and /api/v1/rag/stats
+    name = "base"
+
+    # Directory of the store's files; ChromaManager keeps the BM25 index,
+    # manifest and embedding cache next to it
+    persist_directory: Path
+
+    @abstractmethod
+    def upsert(
+        self,
+        user_id: str,
+        ids: List[str],
+        embeddings: List[List[float]],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]]
+    ):
+        """Insert chunks, replacing those with the same ids"""
+
+    @abstractmethod
+    def query(
+        self,
+        user_id: str,
+        embedding: List[float],
+        n_results: int,
+        where: Optional[Dict[str, Any]] = None,
+        where_document: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Nearest chunks of one query embedding (smallest distance first)"""
+
+    @abstractmethod
+    def get(
+        self,
+        user_id: str,
+        where: Optional[Dict[str, Any]] = None,
+        include: Sequence[str] = ("documents", "metadatas"),
+        ids: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """All chunks (ids + included fields), optionally filtered on metadata or restricted to ids (unknown ids are skipped)"""
+
+    @abstractmethod
+    def delete(self, user_id: str, ids: List[str]):
+        """Delete chunks by id (unknown ids are ignored)"""
+
+    @abstractmethod
+    def update_metadatas(self, user_id: str, ids: List[str], fields: Dict[str, Any]):
+        """Set metadata fields on existing chunks (other fields are kept)"""
+
+    @abstractmethod
+    def count(self, user_id: str) -> int:
+        """Number of chunks of a user"""
+
+    @abstractmethod
+    def drop(self, user_id: str):
+        """Delete all of a user's chunks"""
+
+    @abstractmethod
+    def list_user_ids(self) -> List[str]:
+        """Users that have stored chunks (or an empty shard)"""
+
+    def warmup(self, user_id: str, embedding: List[float]):
+        """Load a user's index into memory (default: one dummy query)"""
+        self.query(user_id, embedding, n_results=1)
+
+    def compact(self):
+        """Reclaim space left by deleted chunks (no-op by default)"""
+
+    def index_config(self, user_id: str) -> Dict[str, Any]:
+        """Index settings of a user's shard"""
+        return {}
+
+    def rebuild(self, user_id: str, config: Optional[Dict[str, Any]] = None, batch_size: int = 1000) -> int:
+        """Rebuild a user's index with new settings, returns the chunk count"""
+        raise NotImplementedError(f"{self.name} backend cannot rebuild indexes")
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Bulk PDF ingestion into the RAG vector store (site onboarding)
+
+Walks a directory of maintenance PDFs and indexes them for one user, like
+/api/v1/ocr/upload does file by file:
+- extraction (digital text or OCR) and chunking run in a process pool,
+  one OCR reader per worker, created only if a page needs OCR
+- chunks of several documents are embedded and written together
+  (--write-batch chunks per ChromaDB upsert / BM25 index save)
+- a SQLite checkpoint records every written file: re-running the same
+  command after a crash skips them and resumes with the rest
+- progress (files, pages/s, chunks) is printed after each write
+
+Documents already indexed with the same content are skipped, edited ones
+are re-indexed incrementally (changed pages only).
+
+Usage:
+  python scripts/bulk_ingest_pdfs.py --path /data/manuels --user-id <uuid>
+  python scripts/bulk_ingest_pdfs.py --path /data/manuels --user-id <uuid> --workers 8 --write-batch 1024
+  python scripts/bulk_ingest_pdfs.py --path /data/manuels --user-id <uuid> --retry-failed
+
+Run from backend/ so the default ChromaDB / PDF storage paths match the API.
+Stop the API first: the script and the API each keep their own BM25 index,
+manifest and vector shards in memory, so two writers overwrite each other's
+files. Both take the store's writer.lock, and the script exits if the API
+(or another ingestion) holds it.
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# Allow importing the rag package from backend/
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+from rag.ingestion import IngestionPipeline, IngestionError, document_fingerprint
+from rag.store_lock import StoreLock, StoreLockedError
+
+
+# --- Checkpoint ---
+
+class Checkpoint:
+    """Files already written, keyed by (user, path) and validated by size/mtime"""
+
+    def __init__(self, db_path: str):
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS bulk_ingest_files (
+                user_id TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                status TEXT NOT NULL,
+                pages INTEGER,
+                chunks INTEGER,
+                error TEXT,
+                finished_at REAL NOT NULL,
+                PRIMARY KEY (user_id, path)
+            )
+            """
+        )
+        self.conn.commit()
+
+    def status(self, user_id: str, path: Path):
+        """'done' / 'failed' if this exact file version was processed, else None"""
+        stat = path.stat()
+        row = self.conn.execute(
+            "SELECT status, size, mtime FROM bulk_ingest_files WHERE user_id = ? AND path = ?",
+            (user_id, str(path))
+        ).fetchone()
+        if row and row[1] == stat.st_size and row[2] == stat.st_mtime:
+            return row[0]
+        return None
+
+    def mark(self, user_id: str, path: Path, status: str, pages: int = 0, chunks: int = 0, error: str = None):
+        stat = path.stat()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO bulk_ingest_files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (user_id, str(path), stat.st_size, stat.st_mtime, status, pages, chunks, error, time.time())
+        )
+
+    def commit(self):
+        self.conn.commit()
+
+
+# --- Worker processes (extraction + chunking) ---
+
+_worker_pipeline = None
+
+
+class _LazyOCRProcessor:
+    """Loads EasyOCR in the worker on the first page that needs OCR"""
+
+    def __init__(self, languages):
+        self.languages = languages
+        self.processor = None
+
+    def iter_pdf_pages(self, pages, preprocess=True):
+        if self.processor is None:
+            from rag.ocr_processor import OCRProcessor
+            self.processor = OCRProcessor(languages=self.languages, gpu=False)
+        return self.processor.iter_pdf_pages(pages, preprocess=preprocess)
+
+
+def _init_worker(ocr_dpi: int, render_window: int, threads_per_worker: int, segmentation: str):
+    global _worker_pipeline
+    try:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+    except ImportError:
+        pass
+
+    from rag.chunking import SmartChunker
+    _worker_pipeline = IngestionPipeline(
+        chroma_manager=None,
+        chunker=SmartChunker(chunk_size=800, chunk_overlap=100, language='fr', segmentation=segmentation),
+        ocr_processor=_LazyOCRProcessor(['fr', 'en']),
+        ocr_dpi=ocr_dpi,
+        render_window=render_window
+    )
+
+
+def _prepare_file(path: str, existing):
+    """Returns (status, prepared_or_error, seconds)"""
+    start = time.perf_counter()
+    try:
+        file_content = Path(path).read_bytes()
+        if existing and existing["document_hash"] == document_fingerprint(file_content):
+            return "unchanged", None, time.perf_counter() - start
+        prepared = _worker_pipeline.prepare(Path(path).name, file_content, existing=existing)
+        return "prepared", prepared, time.perf_counter() - start
+    except IngestionError as e:
+        return "failed", str(e), time.perf_counter() - start
+    except Exception as e:
+        return "failed", f"Erreur interne: {e}", time.perf_counter() - start
+
+
+# --- Parent process (embedding + writes) ---
+
+class BulkIngestor:
+    def __init__(self, args):
+        from rag.chroma_manager import ChromaManager
+
+        self.args = args
+        self.user_id = args.user_id
+        self.checkpoint = Checkpoint(args.checkpoint)
+        vector_store = None
+        if args.vector_backend != "chroma":
+            from rag.numpy_store import NumpyVectorStore
+            vector_store = NumpyVectorStore(
+                persist_directory=args.vector_dir,
+                use_faiss=args.vector_backend == "faiss"
+            )
+        chroma_manager = ChromaManager(
+            persist_directory=args.chroma_dir,
+            embedding_model=args.embedding_model,
+            embedding_cache_directory=args.embedding_cache_dir,
+            vector_store=vector_store
+        )
+        # The API must not run on the same store meanwhile (raises StoreLockedError)
+        self.store_lock = StoreLock(str(chroma_manager.lock_path))
+        self.store_lock.acquire(owner="bulk_ingest_pdfs")
+        self.writer = IngestionPipeline(
+            chroma_manager=chroma_manager,
+            chunker=None,
+            ocr_processor=None,
+            pdf_storage_dir=None if args.no_store else args.storage_dir,
+            embed_batch_size=args.embed_batch
+        )
+
+        self.buffer = []  # (path, prepared)
+        self.buffered_chunks = 0
+        self.stats = {"done": 0, "unchanged": 0, "failed": 0, "pages": 0, "chunks": 0}
+        self.started_at = time.perf_counter()
+
+    def collect_files(self):
+        """PDFs to process (first occurrence of each file name, checkpointed ones skipped)"""
+        files, seen, skipped = [], set(), 0
+        for path in sorted(Path(self.args.path).rglob("*")):
+            if path.suffix.lower() != ".pdf" or not path.is_file():
+                continue
+            if path.name in seen:
+                print(f"⚠️  Nom en double ignoré (document_name = nom du fichier): {path}")
+                continue
+            seen.add(path.name)
+            status = self.checkpoint.status(self.user_id, path)
+            if status == "done" or (status == "failed" and not self.args.retry_failed):
+                skipped += 1
+                continue
+            files.append(path)
+        return files, skipped
+
+    def handle(self, path: Path, status: str, payload, seconds: float):
+        if status == "failed":
+            self.stats["failed"] += 1
+            self.checkpoint.mark(self.user_id, path, "failed", error=payload)
+            self.checkpoint.commit()
+            print(f"❌ {path.name}: {payload}")
+            return
+        if status == "unchanged":
+            self.stats["unchanged"] += 1
+            self.checkpoint.mark(self.user_id, path, "done")
+            self.checkpoint.commit()
+            return
+
+        self.buffer.append((path, payload))
+        self.buffered_chunks += len(payload["chunks"])
+        if self.buffered_chunks >= self.args.write_batch:
+            self.flush()
+
+    def flush(self):
+        """Embed and write the buffered documents, then checkpoint them"""
+        if not self.buffer:
+            return
+        prepared_documents = [prepared for _, prepared in self.buffer]
+        chunks = [chunk for prepared in prepared_documents for chunk in prepared["chunks"]]
+
+        embeddings = self.writer.embed_chunks(chunks)
+        count, _ = self.writer.write(self.user_id, prepared_documents, embeddings)
+
+        for path, prepared in self.buffer:
+            storage_path = None
+            if not self.args.no_store:
+                storage_path = self.writer.store_pdf(self.user_id, path.name, path.read_bytes())
+            self.writer.record(self.user_id, prepared, storage_path)
+            self.checkpoint.mark(
+                self.user_id, path, "done",
+                pages=prepared["pages_processed"], chunks=len(prepared["chunks"])
+            )
+            self.stats["done"] += 1
+            self.stats["pages"] += prepared["pages_processed"]
+        self.checkpoint.commit()
+        self.stats["chunks"] += count
+
+        self.buffer = []
+        self.buffered_chunks = 0
+        self.report()
+
+    def report(self, final: bool = False):
+        elapsed = time.perf_counter() - self.started_at
+        s = self.stats
+        processed = s["done"] + s["unchanged"] + s["failed"]
+        print(
+            f"{'✅ Terminé' if final else '…'} {processed}/{self.total} fichiers "
+            f"(indexés {s['done']}, inchangés {s['unchanged']}, échecs {s['failed']}) | "
+            f"{s['pages']} pages, {s['chunks']} chunks | "
+            f"{s['pages'] / max(elapsed, 1e-9):.1f} pages/s | {elapsed:.0f}s"
+        )
+
+    def run(self):
+        files, skipped = self.collect_files()
+        self.total = len(files)
+        print(f"📂 {len(files)} PDF à traiter ({skipped} déjà faits d'après le checkpoint)")
+        if not files:
+            return
+
+        workers = self.args.workers
+        threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+        max_in_flight = 2 * workers
+        pending = deque()
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.args.dpi, self.args.render_window, threads_per_worker, self.args.segmentation)
+        ) as executor:
+            for path in files:
+                existing = self.writer.chroma_manager.get_document_fingerprint(self.user_id, path.name)
+                pending.append((path, executor.submit(_prepare_file, str(path), existing)))
+                # Bound the prepared documents held in memory
+                if len(pending) >= max_in_flight:
+                    path_done, future = pending.popleft()
+                    self.handle(path_done, *future.result())
+            while pending:
+                path_done, future = pending.popleft()
+                self.handle(path_done, *future.result())
+
+        self.flush()
+        self.report(final=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk PDF ingestion (RAG)")
+    parser.add_argument("--path", required=True, help="Directory of PDFs (searched recursively)")
+    parser.add_argument("--user-id", required=True, help="Supabase user id owning the documents")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Extraction/OCR processes")
+    parser.add_argument("--write-batch", type=int, default=512,
+                        help="Chunks accumulated before one embedding + write pass")
+    parser.add_argument("--embed-batch", type=int, default=64, help="Chunks per embedding call")
+    parser.add_argument("--dpi", type=int, default=200, help="OCR rendering resolution")
+    parser.add_argument("--segmentation", choices=["full", "fast", "rules"],
+                        default=os.environ.get("RAG_SEGMENTATION", "full"),
+                        help="Sentence splitting of the chunker (as RAG_SEGMENTATION of the API)")
+    parser.add_argument("--render-window", type=int, default=4, help="Pages rendered at once for OCR")
+    parser.add_argument("--chroma-dir", default="./chroma_db", help="ChromaDB directory (chroma backend)")
+    parser.add_argument("--vector-backend", choices=["chroma", "numpy", "faiss"], default="chroma",
+                        help="Vector store (as RAG_VECTOR_BACKEND of the API)")
+    parser.add_argument("--vector-dir", default="./vector_store",
+                        help="NumPy/FAISS store directory (BM25 index and manifest next to it)")
+    parser.add_argument("--embedding-model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--embedding-cache-dir", default=os.environ.get("RAG_EMBEDDING_CACHE_DIR"),
+                        help="Embedding cache shared by all backends (default: <chroma-dir>_embeddings)")
+    parser.add_argument("--storage-dir", default="./pdf_storage", help="Local PDF storage (as the API)")
+    parser.add_argument("--no-store", action="store_true", help="Do not copy PDFs to the storage directory")
+    parser.add_argument("--checkpoint", default="./bulk_ingest_checkpoint.db", help="Checkpoint SQLite file")
+    parser.add_argument("--retry-failed", action="store_true", help="Retry files that failed in a previous run")
+    args = parser.parse_args()
+
+    if not Path(args.path).is_dir():
+        parser.error(f"{args.path} is not a directory")
+
+    try:
+        ingestor = BulkIngestor(args)
+    except StoreLockedError as e:
+        print(f"❌ {e}")
+        print("   Arrêtez l'API (ou l'autre ingestion) qui utilise ce stockage puis relancez la commande.")
+        sys.exit(1)
+    ingestor.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Rebuild ChromaDB collections with new HNSW settings
+
+ChromaDB fixes the distance space, construction_ef and M when a collection
+is created. This copies a user's chunks (with their stored embeddings, no
+re-embedding) into a collection created with the new settings and swaps it
+in place of the original. Chunk ids are kept, so the BM25 index and the
+document manifest stay valid.
+
+Stop the API / ingestion while rebuilding: chunks written to a collection
+by another process during its copy would be lost, so the script takes the
+store's writer.lock (see rag.store_lock) and exits if it is held (--show
+only reads). An interrupted rebuild is finished (or restarted) by running
+the command again.
+
+Usage:
+  python scripts/rebuild_vector_index.py --user-id <uuid> --space cosine --m 32 --construction-ef 200
+  python scripts/rebuild_vector_index.py --all --search-ef 100
+  python scripts/rebuild_vector_index.py --all --show
+
+Run from backend/ so the default ChromaDB path matches the API.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Allow importing the rag package from backend/
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+from rag.chroma_manager import ChromaManager
+from rag.store_lock import StoreLock, StoreLockedError
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild ChromaDB collections with new HNSW settings")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--user-id", action="append", help="User whose collection is rebuilt (repeatable)")
+    target.add_argument("--all", action="store_true", help="Rebuild every user collection")
+    parser.add_argument("--space", choices=["l2", "cosine", "ip"], help="Distance space")
+    parser.add_argument("--construction-ef", type=int, help="HNSW ef at construction")
+    parser.add_argument("--search-ef", type=int, help="HNSW ef at query time")
+    parser.add_argument("--m", type=int, help="HNSW M (neighbours per node)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Chunks copied per batch")
+    parser.add_argument("--chroma-dir", default="./chroma_db", help="ChromaDB directory")
+    parser.add_argument("--embedding-model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--show", action="store_true", help="Only print the current settings")
+    args = parser.parse_args()
+
+    hnsw_config = {
+        "space": args.space,
+        "construction_ef": args.construction_ef,
+        "search_ef": args.search_ef,
+        "M": args.m,
+    }
+    hnsw_config = {key: value for key, value in hnsw_config.items() if value is not None}
+    if not hnsw_config and not args.show:
+        parser.error("nothing to change: pass --space, --construction-ef, --search-ef or --m (or --show)")
+
+    chroma_manager = ChromaManager(
+        persist_directory=args.chroma_dir,
+        embedding_model=args.embedding_model,
+        use_embedding_cache=False
+    )
+    if not args.show:
+        try:
+            StoreLock(str(chroma_manager.lock_path)).acquire(owner="rebuild_vector_index")
+        except StoreLockedError as e:
+            print(f"❌ {e}")
+            print("   Arrêtez l'API (ou l'ingestion) qui utilise ce stockage puis relancez la commande.")
+            sys.exit(1)
+    existing = chroma_manager.list_user_ids()
+    user_ids = existing if args.all else args.user_id
+
+    for user_id in user_ids:
+        if user_id not in existing:
+            print(f"❌ {user_id}: aucune collection")
+            continue
+        before = chroma_manager.get_index_config(user_id)
+        if args.show:
+            print(f"{user_id}: {chroma_manager.count_documents(user_id)} chunks, {before or 'ChromaDB defaults'}")
+            continue
+
+        start = time.perf_counter()
+        try:
+            copied = chroma_manager.rebuild_collection(user_id, hnsw_config, batch_size=args.batch_size)
+        except Exception as e:
+            print(f"❌ {user_id}: {e}")
+            continue
+        print(
+            f"✅ {user_id}: {copied} chunks en {time.perf_counter() - start:.1f}s | "
+            f"{before or 'défauts'} -> {chroma_manager.get_index_config(user_id)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
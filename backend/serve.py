@@ -0,0 +1,20 @@
+"""
+Point d'entrée du serveur : python serve.py
+
+Ce fichier ne fait qu'importer uvicorn. Les workers OCR (multiprocessing en mode
+"spawn") ré-exécutent le script de lancement dans chaque processus : il doit rester
+léger. L'application (modèles, clients Supabase/Mistral, ChromaDB) est importée une
+seule fois par uvicorn via "main:app".
+
+Rechargement automatique (développement uniquement) : SERVE_RELOAD=true python serve.py
+
+En production : uvicorn main:app --host 0.0.0.0 --port 8000
+"""
+import os
+
+import uvicorn
+
+if __name__ == "__main__":
+    # Port 8000 par défaut ; --reload seulement si demandé (surveille les fichiers, relance le serveur)
+    reload = os.environ.get("SERVE_RELOAD", "false").lower() == "true"
+    uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=reload)
@@ -0,0 +1,122 @@
+"""
+Tests of rag.batching.MicroBatcher
+"""
+import threading
+
+import pytest
+
+from rag.batching import MicroBatcher
+
+
+class Doubler:
+    """batch_fn recording the size of each call"""
+
+    def __init__(self, started=None, release=None):
+        self.batches = []
+        self.started = started
+        self.release = release
+
+    def __call__(self, inputs):
+        self.batches.append(len(inputs))
+        if self.started is not None:
+            self.started.set()
+            self.release.wait(5)
+        return [x * 2 for x in inputs]
+
+
+def submit_concurrently(batcher, requests):
+    results = [None] * len(requests)
+
+    def run(i):
+        results[i] = batcher.submit(requests[i])
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(requests))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_single_request():
+    batcher = MicroBatcher(Doubler(), max_wait_ms=1)
+    try:
+        assert batcher.submit([1, 2, 3]) == [2, 4, 6]
+        assert batcher.submit([]) == []
+    finally:
+        batcher.shutdown()
+
+
+def test_concurrent_requests_share_a_batch():
+    # The first call blocks until the other requests are queued, so they
+    # are all collected into the next batch
+    started, release = threading.Event(), threading.Event()
+    batch_fn = Doubler(started, release)
+    batcher = MicroBatcher(batch_fn, max_batch_size=64, max_wait_ms=50)
+    try:
+        first = threading.Thread(target=batcher.submit, args=([0],))
+        first.start()
+        assert started.wait(5)
+
+        requests = [[i, i + 100] for i in range(1, 9)]
+        threading.Timer(0.2, release.set).start()
+        results = submit_concurrently(batcher, requests)
+        first.join(5)
+    finally:
+        batcher.shutdown()
+
+    # Each caller gets its own slice, in order
+    assert results == [[2 * i, 2 * (i + 100)] for i in range(1, 9)]
+    assert batch_fn.batches[0] == 1
+    assert sum(batch_fn.batches) == 17
+    assert len(batch_fn.batches) < 9
+    stats = batcher.stats()
+    assert stats["requests"] == 9 and stats["items"] == 17
+
+
+def test_batch_closes_at_max_batch_size():
+    started, release = threading.Event(), threading.Event()
+    batch_fn = Doubler(started, release)
+    batcher = MicroBatcher(batch_fn, max_batch_size=4, max_wait_ms=100)
+    try:
+        first = threading.Thread(target=batcher.submit, args=([0],))
+        first.start()
+        assert started.wait(5)
+        threading.Timer(0.2, release.set).start()
+        results = submit_concurrently(batcher, [[i] for i in range(1, 9)])
+        first.join(5)
+    finally:
+        batcher.shutdown()
+
+    assert results == [[2 * i] for i in range(1, 9)]
+    # A batch stops collecting once it holds max_batch_size inputs
+    assert max(batch_fn.batches) <= 4
+
+
+def test_errors_reach_every_caller_of_the_batch():
+    def failing(inputs):
+        raise RuntimeError("model crashed")
+
+    batcher = MicroBatcher(failing, max_wait_ms=1)
+    try:
+        with pytest.raises(RuntimeError, match="model crashed"):
+            batcher.submit([1])
+    finally:
+        batcher.shutdown()
+
+
+def test_wrong_output_count_is_an_error():
+    batcher = MicroBatcher(lambda inputs: inputs[:-1], max_wait_ms=1)
+    try:
+        with pytest.raises(ValueError):
+            batcher.submit([1, 2])
+    finally:
+        batcher.shutdown()
+
+
+def test_restarts_after_shutdown():
+    batcher = MicroBatcher(Doubler(), max_wait_ms=1)
+    assert batcher.submit([1]) == [2]
+    batcher.shutdown()
+    assert batcher.submit([2]) == [4]
+    batcher.shutdown()
@@ -0,0 +1,38 @@
+"""
+Tests of rag.chunking.SmartChunker segmentation modes that need no spaCy model
+"""
+import pytest
+
+pytest.importorskip("spacy")
+from rag.chunking import SmartChunker  # noqa: E402
+
+PAGE = (
+    "La pompe hydraulique alimente le circuit principal. "
+    "Vérifier la pression de la pompe avant chaque démarrage. "
+    "Remplacer le filtre de la pompe tous les six mois."
+)
+
+
+def test_fast_mode_runs_tokenizer_and_sentencizer_only():
+    chunker = SmartChunker(chunk_size=60, chunk_overlap=0, segmentation="fast")
+    assert chunker.keyword_nlp is None
+    assert chunker.nlp.pipe_names == ["sentencizer"]
+
+    chunks = chunker.chunk_by_pages([(PAGE, 1)], document_name="doc.pdf")
+    assert [chunk["content"] for chunk in chunks] == [
+        "La pompe hydraulique alimente le circuit principal.",
+        "Vérifier la pression de la pompe avant chaque démarrage.",
+        "Remplacer le filtre de la pompe tous les six mois.",
+    ]
+    # Keywords come from the untagged tokens (stopwords and short words left out)
+    assert chunks[0]["metadata"]["keywords"].split(", ")[0] == "pompe"
+    assert "avant" not in chunks[1]["metadata"]["keywords"].split(", ")
+
+
+def test_rules_mode_needs_no_spacy_pipeline():
+    chunker = SmartChunker(chunk_size=60, chunk_overlap=0, segmentation="rules")
+    assert chunker.nlp is None and chunker.keyword_nlp is None
+
+    chunks = chunker.chunk_by_pages([(PAGE, 1)], document_name="doc.pdf")
+    assert len(chunks) == 3
+    assert "pompe" in chunks[2]["metadata"]["keywords"].split(", ")
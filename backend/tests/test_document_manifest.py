@@ -0,0 +1,82 @@
+"""
+Tests of rag.document_manifest.DocumentManifest
+"""
+import sqlite3
+
+import pytest
+
+from rag import document_manifest
+from rag.document_manifest import DocumentManifest
+
+PAGES = {1: {"page_hash": "p1", "ids": ["c1", "c2"]}, 2: {"page_hash": None, "ids": []}}
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    """Every connection opened by the manifest"""
+    opened = []
+    connect = sqlite3.connect
+
+    def tracking_connect(*args, **kwargs):
+        conn = connect(*args, **kwargs)
+        opened.append(conn)
+        return conn
+
+    monkeypatch.setattr(document_manifest.sqlite3, "connect", tracking_connect)
+    return opened
+
+
+def test_upsert_get_list_delete(tmp_path):
+    manifest = DocumentManifest(str(tmp_path / "manifest.db"))
+    manifest.upsert("u", "a.pdf", "h1", PAGES, extraction_method="digital", size_bytes=10)
+
+    document = manifest.get("u", "a.pdf")
+    assert document["document_hash"] == "h1"
+    assert document["pages"] == PAGES
+    assert (document["page_count"], document["chunk_count"]) == (2, 2)
+
+    listing = manifest.list_for_user("u")
+    assert [row["document_name"] for row in listing] == ["a.pdf"]
+    assert "pages" not in listing[0]
+    assert manifest.list_for_user("u", with_pages=True)[0]["pages"] == PAGES
+    assert manifest.list_for_user("v") == []
+
+    assert manifest.delete("u", "a.pdf")
+    assert not manifest.delete("u", "a.pdf")
+    assert manifest.get("u", "a.pdf") is None
+
+
+def test_synced_users_and_delete_user(tmp_path):
+    manifest = DocumentManifest(str(tmp_path / "manifest.db"))
+    assert not manifest.is_synced("u")
+    manifest.mark_synced("u")
+    assert manifest.is_synced("u")
+
+    manifest.upsert("u", "a.pdf", "h1", PAGES)
+    manifest.upsert("v", "a.pdf", "h1", PAGES)
+    manifest.delete_user("u")
+    assert manifest.list_for_user("u") == []
+    assert len(manifest.list_for_user("v")) == 1
+
+
+def test_connections_are_closed(tmp_path, connections):
+    manifest = DocumentManifest(str(tmp_path / "manifest.db"))
+    manifest.upsert("u", "a.pdf", "h1", PAGES)
+    manifest.get("u", "a.pdf")
+    manifest.list_for_user("u")
+    manifest.delete("u", "a.pdf")
+
+    assert len(connections) == 5
+    for conn in connections:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+
+
+def test_failed_write_is_rolled_back(tmp_path):
+    manifest = DocumentManifest(str(tmp_path / "manifest.db"))
+    manifest.upsert("u", "a.pdf", "h1", PAGES)
+    with pytest.raises(ZeroDivisionError):
+        with manifest._connect() as conn:
+            conn.execute("DELETE FROM documents")
+            1 / 0
+    assert manifest.get("u", "a.pdf") is not None
@@ -0,0 +1,89 @@
+"""
+Tests of rag.embedding_cache (EmbeddingCache, CachedEmbeddingFunction)
+"""
+import numpy as np
+import pytest
+
+from rag.embedding_cache import EmbeddingCache, CachedEmbeddingFunction
+
+
+class FakeModel:
+    """Embedding function recording the texts it embeds"""
+
+    def __init__(self, offset=0.0):
+        self.offset = offset
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)) + self.offset, 1.0] for text in texts]
+
+
+def test_hit_and_miss_counters(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model-a")
+    assert cache.get_many(["a", "bb"]) == [None, None]
+    assert cache.put_many(["a", "bb", "a"], [[1, 2], [3, 4], [1, 2]]) == 2
+
+    a, missing, bb = cache.get_many(["a", "ccc", "bb"])
+    np.testing.assert_array_equal(a, [1, 2])
+    assert missing is None
+    np.testing.assert_array_equal(bb, [3, 4])
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 3, 2)
+    assert stats["hit_rate"] == pytest.approx(2 / 5)
+    # Already cached texts are not stored twice
+    assert cache.put_many(["a"], [[9, 9]]) == 0
+
+
+def test_keyed_by_model_name(tmp_path):
+    first = EmbeddingCache(str(tmp_path), "sentence-transformers/model-a")
+    second = EmbeddingCache(str(tmp_path), "model-b")
+    first.put_many(["texte"], [[1, 2]])
+
+    assert second.get_many(["texte"]) == [None]
+    second.put_many(["texte"], [[5, 6, 7]])
+    np.testing.assert_array_equal(first.get_many(["texte"])[0], [1, 2])
+    np.testing.assert_array_equal(second.get_many(["texte"])[0], [5, 6, 7])
+
+
+def test_persisted_and_dimension_checked(tmp_path):
+    EmbeddingCache(str(tmp_path), "model-a").put_many(["a", "b"], [[1, 2], [3, 4]])
+
+    reopened = EmbeddingCache(str(tmp_path), "model-a")
+    assert len(reopened) == 2 and reopened.dimension == 2
+    np.testing.assert_array_equal(reopened.get_many(["b"])[0], [3, 4])
+    with pytest.raises(ValueError):
+        reopened.put_many(["c"], [[1, 2, 3]])
+    with pytest.raises(ValueError):
+        reopened.put_many(["c", "d"], [[1, 2]])
+
+
+def test_torn_row_dropped_before_append(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model-a")
+    cache.put_many(["a"], [[1, 2]])
+    # Crash in the middle of an append
+    with open(cache.vectors_path, "ab") as f:
+        f.write(b"\x00\x01")
+
+    reopened = EmbeddingCache(str(tmp_path), "model-a")
+    reopened.put_many(["b"], [[3, 4]])
+    np.testing.assert_array_equal(reopened.get_many(["a"])[0], [1, 2])
+    np.testing.assert_array_equal(reopened.get_many(["b"])[0], [3, 4])
+
+
+def test_cached_function_only_embeds_misses(tmp_path):
+    model = FakeModel()
+    embed = CachedEmbeddingFunction(model, EmbeddingCache(str(tmp_path), "model-a"))
+
+    first = embed(["a", "bb", "a"])
+    assert model.calls == [["a", "bb"]]
+    np.testing.assert_array_equal(first[0], first[2])
+
+    second = embed(["bb", "ccc"])
+    assert model.calls[-1] == ["ccc"]
+    np.testing.assert_array_equal(second[0], first[1])
+    np.testing.assert_array_equal(second[1], [3, 1])
+
+    embed(["a", "ccc"])
+    assert len(model.calls) == 2
@@ -0,0 +1,66 @@
+"""
+Tests of rag.hybrid_search.SparseBM25 against hand-computed BM25 scores
+"""
+import numpy as np
+import pytest
+
+from rag.hybrid_search import SparseBM25
+
+# 3 documents, average length (2 + 4 + 1) / 3 = 7/3
+DOCS = [
+    ["pomp", "vann"],
+    ["pomp", "pomp", "moteur", "huil"],
+    ["moteur"],
+]
+
+# k1 = 1.5, b = 0.75
+# "pomp":   df = 2, idf = ln(1 + (3 - 2 + 0.5) / (2 + 0.5)) = ln(1.6) = 0.470004
+#   doc 0:  tf = 1, norm = 1.5 * (0.25 + 0.75 * 2 / (7/3)) = 1.339286
+#           0.470004 * 1 * 2.5 / (1 + 1.339286) = 0.502294
+#   doc 1:  tf = 2, norm = 1.5 * (0.25 + 0.75 * 4 / (7/3)) = 2.303571
+#           0.470004 * 2 * 2.5 / (2 + 2.303571) = 0.546062
+# "moteur": df = 2, idf = 0.470004 (terms of doc 1 and 2)
+#   doc 1:  0.470004 * 1 * 2.5 / (1 + 2.303571) = 0.355678
+#   doc 2:  tf = 1, norm = 1.5 * (0.25 + 0.75 * 1 / (7/3)) = 0.857143
+#           0.470004 * 1 * 2.5 / (1 + 0.857143) = 0.632697
+POMP = [0.502294, 0.546062, 0.0]
+MOTEUR = [0.0, 0.355678, 0.632697]
+
+
+@pytest.fixture
+def engine():
+    return SparseBM25(k1=1.5, b=0.75).fit(DOCS)
+
+
+def test_scores_match_hand_computed_example(engine):
+    np.testing.assert_allclose(engine.get_scores(["pomp"]), POMP, rtol=1e-5)
+    np.testing.assert_allclose(engine.get_scores(["moteur"]), MOTEUR, rtol=1e-5)
+    # Multi-term queries add the per-term scores
+    np.testing.assert_allclose(
+        engine.get_scores(["pomp", "moteur"]), np.add(POMP, MOTEUR), rtol=1e-5
+    )
+
+
+def test_repeated_and_unknown_query_terms(engine):
+    # A repeated query term counts once, unknown terms score nothing
+    np.testing.assert_allclose(engine.get_scores(["pomp", "pomp", "turbin"]), POMP, rtol=1e-5)
+    assert not engine.get_scores(["turbin"]).any()
+
+
+def test_top_k_batch(engine):
+    pomp, moteur, both, unknown = engine.top_k(
+        [["pomp"], ["moteur"], ["pomp", "moteur"], ["turbin"]], k=2
+    )
+    assert [doc for doc, _ in pomp] == [1, 0]
+    assert [score for _, score in pomp] == pytest.approx([0.546062, 0.502294], rel=1e-5)
+    assert [doc for doc, _ in moteur] == [2, 1]
+    assert [doc for doc, _ in both] == [1, 2]
+    # Documents sharing no term with the query are left out
+    assert unknown == []
+    assert len(engine.top_k([["pomp"]], k=10)[0]) == 2
+
+
+def test_empty_engine():
+    engine = SparseBM25().fit([])
+    assert engine.top_k([["pomp"]], k=5) == [[]]
+    assert SparseBM25().top_k([["pomp"]], k=5) == [[]]
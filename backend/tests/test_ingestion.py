@@ -0,0 +1,220 @@
+"""
+Tests of the incremental re-ingestion of rag.ingestion.IngestionPipeline
+(fake PDF pages, chunker and vector store)
+"""
+import copy
+import hashlib
+import json
+
+import pytest
+
+# rag.ingestion imports pypdf and the OCR stack (cv2, easyocr, pdf2image)
+pytest.importorskip("rag.ingestion")
+from rag.ingestion import IngestionPipeline, IngestionError, make_chunk_id, document_fingerprint  # noqa: E402
+
+
+def make_pdf(*pages):
+    """Fake PDF: the text of each page (chunks separated by '|')"""
+    return json.dumps(list(pages)).encode("utf-8")
+
+
+class FakeExtractionPipeline(IngestionPipeline):
+    """Reads fake PDFs; pages in ocr_failures produce no text"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.ocr_failures = set()
+        self.extracted_pages = []
+
+    def extract_pages(self, file_content, progress=None, known_page_hashes=None):
+        known_page_hashes = known_page_hashes or {}
+        page_hashes, pages_text = {}, []
+        for page_num, text in enumerate(json.loads(file_content), 1):
+            page_hashes[page_num] = hashlib.sha256(text.encode("utf-8")).hexdigest()
+            if known_page_hashes.get(page_num) == page_hashes[page_num]:
+                continue
+            self.extracted_pages.append(page_num)
+            if page_num not in self.ocr_failures and text:
+                pages_text.append((text, page_num))
+        method = "digital" if pages_text else "unchanged"
+        return pages_text, method, page_hashes
+
+
+class FakeChunker:
+    def chunk_by_pages(self, pages, document_name):
+        return [
+            {
+                "content": content,
+                "metadata": {"document_name": document_name, "page_number": page_num, "chunk_index": index}
+            }
+            for text, page_num in pages
+            for index, content in enumerate(text.split("|"))
+        ]
+
+
+class FakeChromaManager:
+    """Vector store + manifest of one user, as used by IngestionPipeline"""
+
+    def __init__(self):
+        self.chunks = {}
+        self.manifest = {}
+        self.added = []
+        self.deleted = []
+
+    def embed_documents(self, texts):
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def get_document_fingerprint(self, user_id, document_name):
+        document = self.manifest.get(document_name)
+        return copy.deepcopy(document)
+
+    def add_documents(self, user_id, chunks, metadatas, ids, embeddings, tokens=None):
+        assert len(chunks) == len(metadatas) == len(ids) == len(embeddings) == len(tokens)
+        for chunk, metadata, chunk_id in zip(chunks, metadatas, ids):
+            self.chunks[chunk_id] = (chunk, dict(metadata))
+        self.added.extend(ids)
+        return len(chunks)
+
+    def delete_chunks(self, user_id, ids):
+        for chunk_id in ids:
+            self.chunks.pop(chunk_id, None)
+        self.deleted.extend(ids)
+        return len(ids)
+
+    def update_metadatas(self, user_id, ids, fields):
+        for chunk_id in ids:
+            self.chunks[chunk_id][1].update(fields)
+
+    def record_document(self, user_id, document_name, document_hash, pages, **kwargs):
+        self.manifest[document_name] = copy.deepcopy({"document_hash": document_hash, "pages": pages})
+
+
+@pytest.fixture
+def store():
+    return FakeChromaManager()
+
+
+@pytest.fixture
+def pipeline(store):
+    return FakeExtractionPipeline(store, FakeChunker(), ocr_processor=None)
+
+
+def page_ids(store, document_name="doc.pdf"):
+    return {page: set(entry["ids"]) for page, entry in store.manifest[document_name]["pages"].items()}
+
+
+def test_make_chunk_id_is_deterministic():
+    chunk_id = make_chunk_id("doc.pdf", 3, "a" * 64, 1)
+    assert chunk_id == make_chunk_id("doc.pdf", 3, "a" * 64, 1)
+    assert len({
+        chunk_id,
+        make_chunk_id("autre.pdf", 3, "a" * 64, 1),
+        make_chunk_id("doc.pdf", 4, "a" * 64, 1),
+        make_chunk_id("doc.pdf", 3, "b" * 64, 1),
+        make_chunk_id("doc.pdf", 3, "a" * 64, 2),
+    }) == 5
+
+
+def test_first_ingestion_indexes_every_page(pipeline, store):
+    pdf = make_pdf("pompe|vanne", "moteur")
+    result = pipeline.run("u", "doc.pdf", pdf)
+
+    assert result["status"] == "indexed"
+    assert result["chunks_indexed"] == 3 and result["chunks_deleted"] == 0
+    pages = store.manifest["doc.pdf"]["pages"]
+    assert set(pages) == {1, 2}
+    assert store.manifest["doc.pdf"]["document_hash"] == document_fingerprint(pdf)
+    assert pages[1]["ids"] == [make_chunk_id("doc.pdf", 1, pages[1]["page_hash"], i) for i in range(2)]
+    assert sorted(store.chunks) == sorted(pages[1]["ids"] + pages[2]["ids"])
+    for chunk, metadata in store.chunks.values():
+        assert metadata["document_hash"] == document_fingerprint(pdf)
+        assert metadata["page_hash"] == pages[metadata["page_number"]]["page_hash"]
+
+
+def test_identical_upload_is_a_no_op(pipeline, store):
+    pdf = make_pdf("pompe|vanne", "moteur")
+    pipeline.run("u", "doc.pdf", pdf)
+    store.added.clear()
+    pipeline.extracted_pages.clear()
+
+    result = pipeline.run("u", "doc.pdf", pdf)
+    assert result["status"] == "unchanged"
+    assert store.added == [] and store.deleted == []
+    assert pipeline.extracted_pages == []
+
+
+def test_edited_document_replaces_changed_and_removed_pages_only(pipeline, store):
+    pipeline.run("u", "doc.pdf", make_pdf("pompe|vanne", "moteur", "annexe"))
+    before = page_ids(store)
+    store.added.clear()
+    pipeline.extracted_pages.clear()
+
+    # Page 1 unchanged, page 2 edited, page 3 removed
+    new_pdf = make_pdf("pompe|vanne", "moteur revise|joint")
+    result = pipeline.run("u", "doc.pdf", new_pdf)
+    after = page_ids(store)
+
+    assert result["status"] == "updated"
+    assert result["pages_processed"] == 1
+    assert pipeline.extracted_pages == [2]
+    # Unchanged page: same chunks, refreshed document hash
+    assert after[1] == before[1]
+    for chunk_id in after[1]:
+        assert store.chunks[chunk_id][1]["document_hash"] == document_fingerprint(new_pdf)
+    # Changed page: old chunks deleted, new ones added
+    assert not after[2] & before[2]
+    assert set(store.added) == after[2]
+    assert set(store.deleted) == before[2] | before[3]
+    # Removed page: gone from the manifest and the store
+    assert set(after) == {1, 2}
+    assert set(store.chunks) == after[1] | after[2]
+    assert sorted(store.chunks[chunk_id][0] for chunk_id in after[2]) == ["joint", "moteur revise"]
+
+
+def test_pages_without_text_are_retried(pipeline, store):
+    pdf = make_pdf("pompe", "scan illisible")
+    pipeline.ocr_failures = {2}
+    result = pipeline.run("u", "doc.pdf", pdf)
+
+    # No page hash for the empty page and no whole-file hash
+    assert result["status"] == "indexed"
+    assert store.manifest["doc.pdf"]["document_hash"] is None
+    assert store.manifest["doc.pdf"]["pages"][2] == {"page_hash": None, "ids": []}
+    assert all("document_hash" not in metadata for _, metadata in store.chunks.values())
+
+    # Same bytes again: not skipped, only the empty page is extracted
+    pipeline.ocr_failures = set()
+    pipeline.extracted_pages.clear()
+    result = pipeline.run("u", "doc.pdf", pdf)
+    assert result["status"] == "updated"
+    assert pipeline.extracted_pages == [2]
+    assert store.manifest["doc.pdf"]["document_hash"] == document_fingerprint(pdf)
+    assert len(page_ids(store)[2]) == 1
+    assert all(metadata["document_hash"] == document_fingerprint(pdf) for _, metadata in store.chunks.values())
+
+    # Now complete: the next identical upload is skipped
+    assert pipeline.run("u", "doc.pdf", pdf)["status"] == "unchanged"
+
+
+def test_document_without_any_text_is_rejected(pipeline, store):
+    pipeline.ocr_failures = {1}
+    with pytest.raises(IngestionError) as error:
+        pipeline.run("u", "doc.pdf", make_pdf("scan"))
+    assert error.value.status_code == 400
+    assert store.manifest == {} and store.chunks == {}
+
+
+def test_prepare_and_write_batch_of_documents(pipeline, store):
+    prepared = [
+        pipeline.prepare("a.pdf", make_pdf("pompe|vanne")),
+        pipeline.prepare("b.pdf", make_pdf("moteur")),
+    ]
+    # prepare() never touches the store
+    assert store.chunks == {}
+
+    embeddings = pipeline.embed_chunks([chunk for p in prepared for chunk in p["chunks"]])
+    assert pipeline.write("u", prepared, embeddings) == (3, 0)
+    for p in prepared:
+        pipeline.record("u", p)
+    assert set(store.chunks) == {chunk_id for p in prepared for chunk_id in p["ids"]}
+    assert set(store.manifest) == {"a.pdf", "b.pdf"}
@@ -0,0 +1,236 @@
+"""
+Tests of rag.lexical_index: incremental segments against a SparseBM25 refit,
+snapshot + change log persistence and crash recovery
+"""
+import json
+import random
+import threading
+
+import numpy as np
+import pytest
+
+from rag import lexical_index
+from rag.hybrid_search import SparseBM25
+from rag.lexical_index import LexicalIndex, LexicalIndexManager, tokenize
+from rag.text_analysis import ANALYZER_VERSION
+
+WORDS = "pompe vanne moteur roulement joint filtre capteur courroie palier turbine huile graissage".split()
+
+
+def make_chunks(rng, n, prefix="c"):
+    return {f"{prefix}{i}": " ".join(rng.choices(WORDS, k=rng.randint(3, 30))) for i in range(n)}
+
+
+def reference_scores(chunks, query):
+    """id -> score of a SparseBM25 fitted from scratch on `chunks`"""
+    ids = list(chunks)
+    engine = SparseBM25().fit([tokenize(chunks[doc_id]) for doc_id in ids])
+    return {ids[idx]: score for idx, score in engine.top_k([tokenize(query)], k=len(ids))[0]}
+
+
+def assert_same_as_refit(index, chunks, queries=("pompe", "vanne moteur", "huile graissage palier")):
+    assert len(index) == len(chunks)
+    for query in queries:
+        expected = reference_scores(chunks, query)
+        hits = index.search(query, top_k=len(chunks) + 5)
+        assert {doc_id for doc_id, _ in hits} == set(expected)
+        for doc_id, score in hits:
+            assert score == pytest.approx(expected[doc_id], rel=1e-5)
+        scores = [score for _, score in hits]
+        assert scores == sorted(scores, reverse=True)
+
+
+def add(index, chunks):
+    ids = list(chunks)
+    index.add(ids, [tokenize(chunks[doc_id]) for doc_id in ids])
+
+
+def test_scores_match_refit_after_adds_replaces_and_deletes():
+    rng = random.Random(0)
+    index = LexicalIndex(background_merge=False)
+    chunks = {}
+    for batch in range(20):
+        new = make_chunks(rng, 15, prefix=f"b{batch}_")
+        # Replace a few existing chunks in the same batch
+        for doc_id in rng.sample(sorted(chunks), min(3, len(chunks))):
+            new[doc_id] = " ".join(rng.choices(WORDS, k=5))
+        add(index, new)
+        chunks.update(new)
+        removed = rng.sample(sorted(chunks), 4)
+        assert index.remove(removed + ["inconnu"]) == 4
+        for doc_id in removed:
+            del chunks[doc_id]
+        assert_same_as_refit(index, chunks)
+    assert index.segment_count <= lexical_index.MAX_SEGMENTS
+
+
+def test_top_k_and_empty_results():
+    index = LexicalIndex()
+    assert index.search("pompe") == []
+    add(index, {"a": "pompe vanne", "b": "pompe pompe moteur", "c": "moteur"})
+    hits = index.search("pompe", top_k=1)
+    assert len(hits) == 1 and hits[0][0] == "b"
+    assert index.search("turbine") == []
+    assert index.search("pompe", top_k=0) == []
+
+
+def test_repeated_id_in_batch_keeps_last_copy():
+    index = LexicalIndex()
+    index.add(["a", "b", "a"], [["pomp"], ["vann"], ["moteur"]])
+    assert len(index) == 2
+    assert index.search("moteur") and index.search("moteur")[0][0] == "a"
+    assert index.search("pompe") == []
+
+
+def test_merge_keeps_writes_made_during_the_merge(monkeypatch):
+    rng = random.Random(1)
+    index = LexicalIndex(background_merge=False)
+    chunks = {}
+    for batch in range(5):
+        new = make_chunks(rng, 10, prefix=f"b{batch}_")
+        add(index, new)
+        chunks.update(new)
+
+    # Delete, replace and add chunks while the merged segment is being built
+    merge = lexical_index._Segment.merge
+    late = {"b0_1": "turbine", "nouveau": "vanne vanne"}
+
+    def merge_with_concurrent_writes(segments, alive):
+        merged = merge(segments, alive)
+        index.remove(["b1_2", "b2_3"])
+        add(index, late)
+        return merged
+
+    monkeypatch.setattr(lexical_index._Segment, "merge", merge_with_concurrent_writes)
+    index.merge()
+    monkeypatch.setattr(lexical_index._Segment, "merge", merge)
+
+    del chunks["b1_2"], chunks["b2_3"]
+    chunks.update(late)
+    assert_same_as_refit(index, chunks, queries=("turbine", "vanne", "pompe moteur"))
+    index.merge()
+    assert index.segment_count == 1
+    assert_same_as_refit(index, chunks, queries=("turbine", "vanne", "pompe moteur"))
+
+
+def test_background_merge_with_concurrent_searches():
+    rng = random.Random(2)
+    index = LexicalIndex()
+    chunks = make_chunks(rng, 300)
+    add(index, chunks)
+    errors = []
+    done = threading.Event()
+
+    def search():
+        while not done.is_set():
+            try:
+                for doc_id, score in index.search("pompe vanne", top_k=5):
+                    assert score > 0
+            except Exception as e:  # pragma: no cover - reported below
+                errors.append(e)
+
+    searcher = threading.Thread(target=search)
+    searcher.start()
+    for batch in range(50):
+        new = make_chunks(rng, 5, prefix=f"n{batch}_")
+        add(index, new)
+        chunks.update(new)
+    done.set()
+    searcher.join()
+    assert not errors
+
+    index.merge()
+    assert index.segment_count == 1
+    assert_same_as_refit(index, chunks)
+
+
+def make_manager(tmp_path):
+    return LexicalIndexManager(persist_directory=str(tmp_path / "bm25"))
+
+
+def test_snapshot_and_log_replay(tmp_path):
+    manager = make_manager(tmp_path)
+    manager.add_documents("u", ["pompe vanne", "moteur"], ["a", "b"])
+    manager.save("u")
+    manager.add_documents("u", ["pompe pompe"], ["c"])
+    manager.delete_documents("u", ["b"])
+
+    snapshot = manager._index_path("u")
+    assert snapshot.exists() and manager._log_path("u").exists()
+    # Snapshot and log hold term statistics only, not the chunk text
+    with np.load(snapshot, allow_pickle=False) as arrays:
+        assert "pompe vanne" not in arrays["terms"].tolist()
+    assert "pompe pompe" not in manager._log_path("u").read_text(encoding="utf-8")
+
+    reopened = make_manager(tmp_path)
+    assert reopened.exists("u")
+    assert {doc_id for doc_id, _ in reopened.search("u", "pompe moteur")} == {"a", "c"}
+    assert reopened.search("u", "pompe") == manager.search("u", "pompe")
+
+
+def test_log_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(lexical_index, "COMPACT_MIN_BYTES", 200)
+    manager = make_manager(tmp_path)
+    for i in range(20):
+        manager.add_documents("u", [f"pompe {i}"], [f"c{i}"])
+    manager.delete_documents("u", ["c0"])
+
+    log_path = manager._log_path("u")
+    assert manager._index_path("u").exists()
+    threshold = max(200, lexical_index.COMPACT_RATIO * manager._index_path("u").stat().st_size)
+    assert not log_path.exists() or log_path.stat().st_size <= threshold
+
+    reopened = make_manager(tmp_path)
+    assert len(reopened.get_index("u")) == 19
+    assert "c0" not in {doc_id for doc_id, _ in reopened.search("u", "pompe", top_k=50)}
+
+
+def test_replay_after_crash_with_torn_log(tmp_path):
+    manager = make_manager(tmp_path)
+    manager.add_documents("u", ["pompe", "vanne"], ["a", "b"])
+    manager.delete_documents("u", ["a"])
+    # Crash in the middle of an append
+    with open(manager._log_path("u"), "a", encoding="utf-8") as f:
+        f.write('{"op": "add", "analyzer": 1, "entries": [["c", ["tur')
+
+    reopened = make_manager(tmp_path)
+    index = reopened.get_index("u")
+    assert len(index) == 1
+    assert reopened.search("u", "vanne")[0][0] == "b"
+    # The readable records were folded into a new snapshot
+    assert reopened._index_path("u").exists()
+    assert not reopened._log_path("u").exists()
+    reopened.add_documents("u", ["turbine"], ["c"])
+    assert len(make_manager(tmp_path).get_index("u")) == 2
+
+
+def test_legacy_json_snapshot_is_converted(tmp_path):
+    manager = make_manager(tmp_path)
+    legacy = manager._legacy_index_path("u")
+    legacy.write_text(json.dumps({
+        "k1": 1.5, "b": 0.75, "analyzer": ANALYZER_VERSION,
+        "entries": [["a", "pompe vanne", {"document_name": "x.pdf"}, tokenize("pompe vanne")]]
+    }), encoding="utf-8")
+
+    assert manager.exists("u")
+    assert manager.search("u", "vanne")[0][0] == "a"
+    assert not legacy.exists() and manager._index_path("u").exists()
+
+
+def test_stale_analyzer_reports_index_missing(tmp_path):
+    manager = make_manager(tmp_path)
+    with open(manager._log_path("u"), "w", encoding="utf-8") as f:
+        f.write(json.dumps({"op": "add", "analyzer": ANALYZER_VERSION + 1, "entries": [["a", ["x"]]]}) + "\n")
+
+    assert not manager.exists("u")
+    assert not manager._log_path("u").exists()
+    assert len(manager.get_index("u")) == 0
+
+
+def test_reset_removes_files(tmp_path):
+    manager = make_manager(tmp_path)
+    manager.add_documents("u", ["pompe"], ["a"])
+    manager.save("u")
+    manager.reset("u")
+    assert not manager.exists("u")
+    assert not any((tmp_path / "bm25").iterdir())
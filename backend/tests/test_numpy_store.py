@@ -0,0 +1,235 @@
+"""
+Tests of rag.numpy_store.NumpyVectorStore against a brute-force search
+"""
+import sqlite3
+import threading
+
+import numpy as np
+import pytest
+
+from rag.numpy_store import NumpyVectorStore, FAISS_AVAILABLE
+
+DIM = 8
+N_CHUNKS = 200
+
+ENGINES = [False] + ([True] if FAISS_AVAILABLE else [])
+
+
+def make_corpus(rng, n=N_CHUNKS):
+    vectors = rng.standard_normal((n, DIM)).astype(np.float32)
+    ids = [f"c{i}" for i in range(n)]
+    documents = [f"texte {i}" for i in range(n)]
+    metadatas = [{"document_name": f"doc{i % 4}.pdf", "page_number": i % 5} for i in range(n)]
+    return vectors, ids, documents, metadatas
+
+
+def brute_force(vectors, ids, query, k, space, allowed=None):
+    """Ids and distances of the k nearest chunks, as ChromaDB defines the distances"""
+    if space == "l2":
+        distances = ((vectors - query) ** 2).sum(axis=1)
+    elif space == "cosine":
+        distances = 1 - vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    else:
+        distances = 1 - vectors @ query
+    order = [i for i in np.argsort(distances, kind="stable") if allowed is None or ids[i] in allowed]
+    return [ids[i] for i in order[:k]], [float(distances[i]) for i in order[:k]]
+
+
+def assert_matches_brute_force(store, vectors, ids, query, k, space, where=None, allowed=None):
+    result = store.query("u", query.tolist(), k, where=where)
+    expected_ids, expected_distances = brute_force(vectors, ids, query, k, space, allowed)
+    assert result["ids"][0] == expected_ids
+    np.testing.assert_allclose(result["distances"][0], expected_distances, rtol=1e-4, atol=1e-4)
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+
+@pytest.mark.parametrize("use_faiss", ENGINES)
+@pytest.mark.parametrize("space", ["l2", "cosine", "ip"])
+def test_query_matches_brute_force(tmp_path, rng, space, use_faiss):
+    vectors, ids, documents, metadatas = make_corpus(rng)
+    store = NumpyVectorStore(str(tmp_path), space=space, use_faiss=use_faiss)
+    store.upsert("u", ids, vectors.tolist(), documents, metadatas)
+
+    for _ in range(5):
+        assert_matches_brute_force(store, vectors, ids, rng.standard_normal(DIM).astype(np.float32), 7, space)
+
+    result = store.query("u", vectors[3].tolist(), 1)
+    nearest = ids.index(brute_force(vectors, ids, vectors[3], 1, space)[0][0])
+    assert result["documents"][0] == [documents[nearest]]
+    assert result["metadatas"][0] == [metadatas[nearest]]
+
+
+@pytest.mark.parametrize("use_faiss", ENGINES)
+def test_upsert_replaces_existing_ids(tmp_path, rng, use_faiss):
+    vectors, ids, documents, metadatas = make_corpus(rng)
+    store = NumpyVectorStore(str(tmp_path), use_faiss=use_faiss)
+    store.upsert("u", ids, vectors.tolist(), documents, metadatas)
+
+    replacement = rng.standard_normal((10, DIM)).astype(np.float32)
+    vectors[:10] = replacement
+    store.upsert("u", ids[:10], replacement.tolist(), ["nouveau"] * 10, metadatas[:10])
+
+    assert store.count("u") == N_CHUNKS
+    assert store.index_config("u")["dead_rows"] == 10
+    assert_matches_brute_force(store, vectors, ids, replacement[0], 5, "l2")
+    assert store.query("u", replacement[0].tolist(), 1)["documents"][0] == ["nouveau"]
+
+
+def test_delete_and_update_metadatas(tmp_path, rng):
+    vectors, ids, documents, metadatas = make_corpus(rng)
+    store = NumpyVectorStore(str(tmp_path))
+    store.upsert("u", ids, vectors.tolist(), documents, metadatas)
+
+    store.delete("u", ids[:50] + ["absent"])
+    assert store.count("u") == N_CHUNKS - 50
+    query = rng.standard_normal(DIM).astype(np.float32)
+    assert_matches_brute_force(store, vectors, ids, query, 10, "l2", allowed=set(ids[50:]))
+
+    store.update_metadatas("u", ids[50:60], {"document_name": "renamed.pdf", "document_hash": "h"})
+    renamed = store.get("u", where={"document_name": "renamed.pdf"})
+    assert renamed["ids"] == ids[50:60]
+    assert all(meta["document_hash"] == "h" and "page_number" in meta for meta in renamed["metadatas"])
+    assert not set(ids[50:60]) & set(store.get("u", where={"document_name": "doc2.pdf"})["ids"])
+
+
+@pytest.mark.parametrize("use_faiss", ENGINES)
+def test_compact_keeps_id_to_row_mapping(tmp_path, rng, use_faiss):
+    vectors, ids, documents, metadatas = make_corpus(rng)
+    store = NumpyVectorStore(str(tmp_path), use_faiss=use_faiss)
+    store.upsert("u", ids, vectors.tolist(), documents, metadatas)
+    replacement = rng.standard_normal((5, DIM)).astype(np.float32)
+    vectors[1:6] = replacement
+    store.upsert("u", ids[1:6], replacement.tolist(), documents[1:6], metadatas[1:6])
+    store.delete("u", ids[::3])
+    alive = [chunk_id for i, chunk_id in enumerate(ids) if i % 3]
+
+    store.compact()
+
+    config = store.index_config("u")
+    assert config["dead_rows"] == 0 and config["rows"] == len(alive)
+    stored = store.get("u", include=["embeddings", "documents"])
+    assert sorted(stored["ids"]) == sorted(alive)
+    for chunk_id, embedding, document in zip(stored["ids"], stored["embeddings"], stored["documents"]):
+        i = ids.index(chunk_id)
+        np.testing.assert_allclose(embedding, vectors[i])
+        assert document == documents[i]
+    query = rng.standard_normal(DIM).astype(np.float32)
+    assert_matches_brute_force(store, vectors, ids, query, 10, "l2", allowed=set(alive))
+
+
+def test_filters(tmp_path, rng):
+    vectors, ids, documents, metadatas = make_corpus(rng)
+    store = NumpyVectorStore(str(tmp_path))
+    store.upsert("u", ids, vectors.tolist(), documents, metadatas)
+    query = rng.standard_normal(DIM).astype(np.float32)
+
+    def allowed(predicate):
+        return {chunk_id for chunk_id, meta in zip(ids, metadatas) if predicate(meta)}
+
+    filters = [
+        ({"document_name": "doc1.pdf"}, lambda m: m["document_name"] == "doc1.pdf"),
+        ({"document_name": {"$in": ["doc0.pdf", "doc3.pdf"]}}, lambda m: m["document_name"] in ("doc0.pdf", "doc3.pdf")),
+        (
+            {"$and": [{"document_name": "doc2.pdf"}, {"page_number": {"$gte": 3}}]},
+            lambda m: m["document_name"] == "doc2.pdf" and m["page_number"] >= 3
+        ),
+        (
+            {"$or": [{"document_name": "doc1.pdf"}, {"page_number": 0}]},
+            lambda m: m["document_name"] == "doc1.pdf" or m["page_number"] == 0
+        ),
+        ({"page_number": {"$nin": [1, 2]}}, lambda m: m["page_number"] not in (1, 2)),
+        ({"document_name": "absent.pdf"}, lambda m: False),
+    ]
+    for where, predicate in filters:
+        expected = allowed(predicate)
+        assert set(store.get("u", where=where, include=[])["ids"]) == expected
+        assert_matches_brute_force(store, vectors, ids, query, 5, "l2", where=where, allowed=expected)
+
+    result = store.query("u", query.tolist(), 5, where_document={"$contains": "texte 1"})
+    assert result["ids"][0] and all("texte 1" in document for document in result["documents"][0])
+
+
+def test_reopen_from_disk(tmp_path, rng):
+    vectors, ids, documents, metadatas = make_corpus(rng)
+    store = NumpyVectorStore(str(tmp_path), space="cosine")
+    store.upsert("u", ids, vectors.tolist(), documents, metadatas)
+    store.delete("u", ids[:20])
+    store.update_metadatas("u", ids[20:30], {"document_name": "renamed.pdf"})
+
+    reopened = NumpyVectorStore(str(tmp_path), space="cosine")
+    assert reopened.list_user_ids() == ["u"]
+    assert reopened.count("u") == N_CHUNKS - 20
+    assert reopened.get("u", where={"document_name": "renamed.pdf"})["ids"] == ids[20:30]
+    query = rng.standard_normal(DIM).astype(np.float32)
+    assert_matches_brute_force(reopened, vectors, ids, query, 8, "cosine", allowed=set(ids[20:]))
+
+
+def test_shard_without_document_name_column_is_migrated(tmp_path, rng):
+    vectors, ids, documents, metadatas = make_corpus(rng, 20)
+    NumpyVectorStore(str(tmp_path)).upsert("u", ids, vectors.tolist(), documents, metadatas)
+    conn = sqlite3.connect(str(tmp_path / "documents_u" / "chunks.db"))
+    conn.execute("DROP INDEX chunks_document_name")
+    conn.execute("ALTER TABLE chunks DROP COLUMN document_name")
+    conn.commit()
+    conn.close()
+
+    reopened = NumpyVectorStore(str(tmp_path))
+    expected = [chunk_id for chunk_id, meta in zip(ids, metadatas) if meta["document_name"] == "doc1.pdf"]
+    assert reopened.get("u", where={"document_name": "doc1.pdf"}, include=[])["ids"] == expected
+
+
+def test_reads_do_not_create_shards(tmp_path):
+    store = NumpyVectorStore(str(tmp_path))
+
+    assert store.count("ghost") == 0
+    assert store.query("ghost", [0.0] * DIM, 3)["ids"] == [[]]
+    assert store.get("ghost", include=["documents"]) == {"ids": [], "documents": []}
+    store.delete("ghost", ["x"])
+    store.warmup("ghost", [0.0] * DIM)
+    assert store.index_config("ghost")["rows"] == 0
+
+    assert store.list_user_ids() == []
+    assert not (tmp_path / "documents_ghost").exists()
+
+
+@pytest.mark.skipif(not FAISS_AVAILABLE, reason="faiss not installed")
+def test_faiss_concurrent_upserts_and_queries(tmp_path, rng):
+    vectors, ids, documents, metadatas = make_corpus(rng, 2000)
+    store = NumpyVectorStore(str(tmp_path), use_faiss=True)
+    store.upsert("u", ids[:100], vectors[:100].tolist(), documents[:100], metadatas[:100])
+    queries = rng.standard_normal((50, DIM)).astype(np.float32)
+    errors = []
+
+    def write():
+        try:
+            for start in range(100, 2000, 50):
+                store.upsert("u", ids[start:start + 50], vectors[start:start + 50].tolist(),
+                             documents[start:start + 50], metadatas[start:start + 50])
+        except Exception as e:
+            errors.append(e)
+
+    def read():
+        try:
+            for query in queries:
+                result = store.query("u", query.tolist(), 5)
+                # Every hit is a chunk that was written, with its own distance
+                for chunk_id, distance in zip(result["ids"][0], result["distances"][0]):
+                    i = ids.index(chunk_id)
+                    assert abs(float(((vectors[i] - query) ** 2).sum()) - distance) < 1e-3
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write)] + [threading.Thread(target=read) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert store.count("u") == 2000
+    for query in queries[:5]:
+        assert_matches_brute_force(store, vectors, ids, query, 5, "l2")
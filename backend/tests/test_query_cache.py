@@ -0,0 +1,120 @@
+"""
+Tests of rag.query_cache.QueryResultCache (TTL, LRU, invalidation, copies)
+"""
+import pytest
+
+from rag import query_cache
+from rag.query_cache import QueryResultCache
+
+
+class Clock:
+    """Replaces time.monotonic in rag.query_cache"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(query_cache.time, "monotonic", clock)
+    return clock
+
+
+def test_hit_on_normalized_query():
+    cache = QueryResultCache()
+    cache.set("u", "retrieval", "Pompe  hydraulique ?", {"ids": [1]})
+    assert cache.get("u", "retrieval", "pompe hydraulique") == {"ids": [1]}
+    assert QueryResultCache.normalize_query(" Pompe\nhydraulique ?! ") == "pompe hydraulique"
+    # Namespaces and users are separate
+    assert cache.get("u", "answer", "pompe hydraulique") is None
+    assert cache.get("v", "retrieval", "pompe hydraulique") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_ttl_expiry(clock):
+    cache = QueryResultCache(ttl_seconds=60)
+    cache.set("u", "retrieval", "q", "value")
+    clock.now += 59
+    assert cache.get("u", "retrieval", "q") == "value"
+    clock.now += 2
+    assert cache.get("u", "retrieval", "q") is None
+    # Expired entries are dropped on lookup
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_eviction_per_user():
+    cache = QueryResultCache(max_entries_per_user=2)
+    cache.set("u", "retrieval", "a", 1)
+    cache.set("u", "retrieval", "b", 2)
+    cache.set("v", "retrieval", "a", 1)
+    # "a" becomes the most recently used, so "b" is evicted
+    assert cache.get("u", "retrieval", "a") == 1
+    cache.set("u", "retrieval", "c", 3)
+    assert cache.get("u", "retrieval", "b") is None
+    assert cache.get("u", "retrieval", "a") == 1
+    assert cache.get("u", "retrieval", "c") == 3
+    # Other users' entries don't count against the capacity
+    assert cache.get("v", "retrieval", "a") == 1
+
+
+def test_invalidate_drops_entries_and_stale_results():
+    cache = QueryResultCache()
+    cache.set("u", "retrieval", "q", 1)
+    cache.set("v", "retrieval", "q", 1)
+
+    version = cache.version("u")
+    cache.invalidate("u")
+    assert cache.version("u") == version + 1
+    assert cache.get("u", "retrieval", "q") is None
+    assert cache.get("v", "retrieval", "q") == 1
+
+    # A result computed before the invalidation is not stored
+    cache.set("u", "retrieval", "q", "stale", version=version)
+    assert cache.get("u", "retrieval", "q") is None
+    cache.set("u", "retrieval", "q", "fresh", version=cache.version("u"))
+    assert cache.get("u", "retrieval", "q") == "fresh"
+
+
+def test_values_are_copied():
+    cache = QueryResultCache()
+    value = {"documents": [["a"]]}
+    cache.set("u", "retrieval", "q", value)
+    value["documents"][0].append("mutated after set")
+
+    first = cache.get("u", "retrieval", "q")
+    assert first == {"documents": [["a"]]}
+    first["documents"][0].append("mutated after get")
+    assert cache.get("u", "retrieval", "q") == {"documents": [["a"]]}
+
+
+def test_chroma_manager_invalidates_on_add_and_delete(tmp_path, monkeypatch):
+    pytest.importorskip("chromadb")
+    from rag import chroma_manager
+    from rag.numpy_store import NumpyVectorStore
+
+    # No SentenceTransformer download: embeddings are passed explicitly
+    monkeypatch.setattr(
+        chroma_manager.embedding_functions, "SentenceTransformerEmbeddingFunction",
+        lambda model_name: (lambda texts: [[1.0, 0.0] for _ in texts])
+    )
+    cache = QueryResultCache()
+    manager = chroma_manager.ChromaManager(
+        persist_directory=str(tmp_path / "db"),
+        use_embedding_cache=False,
+        query_cache=cache,
+        vector_store=NumpyVectorStore(str(tmp_path / "vectors"))
+    )
+
+    cache.set("u", "retrieval", "q", 1)
+    cache.set("v", "retrieval", "q", 1)
+    manager.add_documents("u", ["pompe"], [{"document_name": "a.pdf"}], ids=["c1"], embeddings=[[1.0, 0.0]])
+    assert cache.get("u", "retrieval", "q") is None
+    assert cache.get("v", "retrieval", "q") == 1
+
+    cache.set("u", "retrieval", "q", 1)
+    manager.delete_chunks("u", ["c1"])
+    assert cache.get("u", "retrieval", "q") is None